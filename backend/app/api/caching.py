@@ -0,0 +1,66 @@
+import hashlib
+from datetime import date
+from typing import Callable, Type
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from app.db.database import db
+
+
+def volatile(endpoint: Callable) -> Callable:
+    """Mark an endpoint whose output drifts with the clock, not only with the data"""
+    endpoint.etag_enabled = False
+    return endpoint
+
+
+def compute_etag(request: Request, version: int) -> str:
+    """Strong ETag from the data version, the current date, the path and the query"""
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.query_params.multi_items()))
+    # Date is part of the key because "today" figures roll over without a reload
+    key = f'{request.url.path}?{query}|{date.today().isoformat()}'
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'"v{version}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so a W/ prefix still counts as a match
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or any(tag.replace('W/', '', 1) == etag for tag in candidates)
+
+
+def conditional_route(cache_control: str = 'no-cache') -> Type[APIRoute]:
+    """APIRoute class adding ETag / If-None-Match handling to GET routes.
+
+    The ETag is computed and compared before the endpoint runs, so a
+    revalidation that hits answers 304 without touching any service. Pass
+    the result as ``route_class`` to an APIRouter to set its Cache-Control.
+    """
+
+    class ConditionalRoute(APIRoute):
+        def get_route_handler(self) -> Callable:
+            handler = super().get_route_handler()
+            if not getattr(self.endpoint, 'etag_enabled', True):
+                return handler
+
+            async def conditional_handler(request: Request) -> Response:
+                if request.method != 'GET':
+                    return await handler(request)
+
+                # Read the version first: the content can only be as new or newer
+                etag = compute_etag(request, db.version)
+                headers = {'ETag': etag, 'Cache-Control': cache_control}
+                if etag_matches(request, etag):
+                    return Response(status_code=304, headers=headers)
+
+                response = await handler(request)
+                if response.status_code == 200:
+                    for name, value in headers.items():
+                        if name.lower() not in response.headers:
+                            response.headers[name] = value
+                return response
+
+            return conditional_handler
+
+    return ConditionalRoute
@@ -0,0 +1,152 @@
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+from app.db.database import db
+from app.api.offload import single_flight
+from app.services.cache import service_cache
+from app.utils.metrics import SIZE_BUCKETS, collect_stages, registry, stage_seconds
+
+# Requests that matched no route share one label, so scanners cannot blow up cardinality
+UNMATCHED = 'unmatched'
+
+request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to answer HTTP requests, by route template',
+    ['method', 'route', 'status'])
+response_bytes = registry.histogram(
+    'http_response_size_bytes', 'Size of HTTP response bodies', ['method', 'route'], SIZE_BUCKETS)
+requests_in_flight = registry.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled')
+
+dataset_rows = registry.gauge('dataset_rows', 'Rows per table in the current snapshot', ['table'])
+dataset_bytes = registry.gauge('dataset_memory_bytes', 'In-memory size per table of the current snapshot', ['table'])
+dataset_version = registry.gauge('dataset_version', 'Version of the current snapshot')
+dataset_loaded = registry.gauge('dataset_loaded_timestamp_seconds', 'When the current snapshot was built')
+
+cache_lookups = registry.counter('service_cache_lookups_total', 'Service cache lookups by result', ['result'])
+cache_evictions = registry.counter('service_cache_evictions_total', 'Service cache entries evicted for space')
+cache_invalidations = registry.counter('service_cache_invalidations_total', 'Service cache clears on publish')
+cache_entries = registry.gauge('service_cache_entries', 'Entries in the service cache')
+cache_bytes = registry.gauge('service_cache_bytes', 'Estimated size of the service cache')
+cache_hit_ratio = registry.gauge('service_cache_hit_ratio', 'Service cache hits over lookups since start')
+
+offloaded_calls = registry.counter('offload_calls_total', 'Offloaded endpoint calls, run or coalesced', ['result'])
+sales_log_batches = registry.counter('sales_log_commits_total', 'Group commits of the sales write-ahead log')
+sales_log_records = registry.counter('sales_log_records_total', 'Sales written to the write-ahead log')
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request.
+
+    Latency, response size and in-flight count are labelled with the full
+    route template (``/api/products/brands/{brand}``) rather than the raw
+    path.
+    Stage timings recorded while the request runs, including on offload
+    worker threads, are summed per stage and attributed to the same route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            with collect_stages() as stages:
+                await self.app(scope, receive, send_and_measure)
+        finally:
+            elapsed = time.perf_counter() - started
+            requests_in_flight.dec()
+            method = scope['method']
+            route = _route_label(scope)
+            request_seconds.observe(elapsed, method=method, route=route, status=status)
+            response_bytes.observe(size, method=method, route=route)
+            for stage, seconds in _sum_stages(stages).items():
+                stage_seconds.observe(seconds, route=route, stage=stage)
+
+
+def _route_label(scope) -> str:
+    """Template of the matched route including the prefixes it is mounted under"""
+    route = scope.get('route')
+    template = getattr(route, 'path_format', None)
+    if template is None:
+        return UNMATCHED
+    path = scope.get('path', '')
+    # Depending on the router, the template covers the whole path or only
+    # what follows the include prefix; the matched prefix is a static one
+    for cut in (position for position, char in enumerate(path) if char == '/'):
+        if route.path_regex.match(path[cut:]):
+            return path[:cut] + template
+    return scope.get('root_path', '') + template
+
+
+def _sum_stages(stages) -> Dict[str, float]:
+    totals: Dict[str, float] = defaultdict(float)
+    for stage, seconds in list(stages):
+        totals[stage] += seconds
+    return totals
+
+
+_memory: Tuple[int, Dict[str, int]] = (-1, {})
+
+
+def _table_bytes(snapshot) -> Dict[str, int]:
+    # Deep sizes walk object columns, so only measure each snapshot once
+    global _memory
+    if _memory[0] != snapshot.version:
+        _memory = (snapshot.version, {
+            'products': int(snapshot.products.memory_usage(index=True, deep=True).sum()),
+            'sales': int(snapshot.sales.memory_usage(index=True, deep=True).sum()),
+            'sales_cube': int(snapshot.sales_cube.base.memory_usage(index=True, deep=True).sum()),
+        })
+    return _memory[1]
+
+
+def collect_dataset():
+    snapshot = db.snapshot
+    dataset_version.set(snapshot.version)
+    dataset_loaded.set(snapshot.loaded_at.timestamp())
+    dataset_rows.set(len(snapshot.products), table='products')
+    dataset_rows.set(len(snapshot.sales), table='sales')
+    dataset_rows.set(len(snapshot.sales_cube.base), table='sales_cube')
+    for table, size in _table_bytes(snapshot).items():
+        dataset_bytes.set(size, table=table)
+
+
+def collect_counters():
+    stats = service_cache.stats()
+    cache_lookups.set_total(stats['hits'], result='hit')
+    cache_lookups.set_total(stats['misses'], result='miss')
+    cache_evictions.set_total(stats['evictions'])
+    cache_invalidations.set_total(stats['invalidations'])
+    cache_entries.set(stats['entries'])
+    cache_bytes.set(stats['bytes'])
+    cache_hit_ratio.set(stats['hit_ratio'])
+
+    offloaded_calls.set_total(single_flight.started, result='run')
+    offloaded_calls.set_total(single_flight.coalesced, result='coalesced')
+    sales_log_batches.set_total(db.sales_log.batches)
+    sales_log_records.set_total(db.sales_log.records)
+
+
+registry.add_collector(collect_dataset)
+registry.add_collector(collect_counters)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text format"""
+    return registry.render()
@@ -0,0 +1,83 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Tuple
+from fastapi import Response
+from app.db.database import db
+from app.services.cache import freeze
+from app.utils.profiling import active, attached
+
+# Threads running service calls and response encoding off the event loop
+WORKER_THREADS = int(os.getenv('API_WORKER_THREADS', str(min(4, os.cpu_count() or 1))))
+
+executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='api-worker')
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one execution on the executor.
+
+    The first caller for a key starts the work; callers arriving while it
+    is still running await the same future instead of starting their own.
+    Nothing is kept once the call completes, that is the service cache's job.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Result of func(), and whether it was shared with an earlier caller"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().run_in_executor(executor, func)
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        self.started += 1
+        # Shielded so one client disconnecting does not fail the others
+        return await asyncio.shield(future), False
+
+
+single_flight = SingleFlight()
+
+
+def offload(endpoint: Callable[..., Response]) -> Callable:
+    """Run a synchronous endpoint on the worker pool, coalescing identical requests.
+
+    The endpoint builds its whole response (service call and JSON encoding)
+    on a worker thread, so the event loop stays free for cheap requests.
+    Concurrent requests with the same arguments against the same data
+    version share one execution and each get their own copy of the response.
+    """
+    name = endpoint.__qualname__
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        key = (name, db.version, freeze(kwargs))
+        if active() is not None:
+            # A profiled request must do its own work rather than wait on someone else's
+            key = (key, object())
+        # Run in a copy of the request's context so stage timings reach its
+        # metrics and a profiled request is followed onto the worker thread
+        call = functools.partial(contextvars.copy_context().run, _run_attached, endpoint, kwargs)
+        response, shared = await single_flight.run(key, call)
+        return _copy_response(response) if shared else response
+
+    return wrapper
+
+
+def _run_attached(endpoint: Callable[..., Response], kwargs: Dict) -> Response:
+    with attached():
+        return endpoint(**kwargs)
+
+
+def _copy_response(response: Response) -> Response:
+    # Routes add headers to the response they return, so never hand one out twice
+    copy = Response(content=response.body, status_code=response.status_code)
+    copy.raw_headers = list(response.raw_headers)
+    return copy
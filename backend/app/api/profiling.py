@@ -0,0 +1,54 @@
+import hmac
+from typing import Optional
+from app.utils.profiling import PROFILING_TOKEN, SamplingProfiler, profile_store, profiling
+
+PROFILE_HEADER = 'x-profile-token'
+PROFILE_ID_HEADER = b'x-profile-id'
+
+
+def token_matches(token: Optional[str]) -> bool:
+    """Whether token unlocks profiling (never true while PROFILING_TOKEN is unset)"""
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def requested_token(scope) -> Optional[str]:
+    # Header only: a query parameter would leak the token into access and proxy logs
+    for name, value in scope['headers']:
+        if name == PROFILE_HEADER.encode():
+            return value.decode('latin-1')
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling single requests on demand.
+
+    Only active when PROFILING_TOKEN is set, and only for requests that
+    present it in the X-Profile-Token header. The request runs under a
+    SamplingProfiler that also follows it onto offload worker threads; the profile is kept in the rolling
+    profile store and its id returned in the X-Profile-Id header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not PROFILING_TOKEN or not token_matches(requested_token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler()
+        profile_id = profile_store.new_id()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = list(message.get('headers', [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        try:
+            with profiling(profiler):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            profile_store.add(profile_id, scope['method'], scope['path'], status, profiler)
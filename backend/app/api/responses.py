@@ -0,0 +1,14 @@
+from typing import Any
+from fastapi.responses import JSONResponse
+from app.utils.json_encoder import encode_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by the columnar encoder.
+
+    Route handlers return this directly, which also skips FastAPI's
+    jsonable_encoder pass over the payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
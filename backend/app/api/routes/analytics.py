@@ -1,46 +1,144 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Optional
 from app.services.analytics_service import analytics_service
+from app.api.responses import FastJSONResponse
+from app.api.offload import offload
+from app.api.caching import conditional_route
 
-router = APIRouter(prefix="/analytics", tags=["analytics"])
+router = APIRouter(prefix="/analytics", tags=["analytics"],
+                   default_response_class=FastJSONResponse, route_class=conditional_route("public, max-age=30"))
+
+def _parse_filters(items: Optional[List[str]]) -> Dict[str, List[str]]:
+    """Repeated <dimension>:<value> query parameters as {dimension: [values]}"""
+    filters: Dict[str, List[str]] = {}
+    for item in items or []:
+        dimension, separator, value = item.partition(':')
+        if not separator:
+            raise HTTPException(status_code=400, detail=f"Invalid filter '{item}', expected <dimension>:<value>")
+        filters.setdefault(dimension, []).append(value)
+    return filters
+
+@router.get("/query")
+@offload
+def query_analytics(
+    group_by: List[str] = Query([], description="Dimensions to group by, e.g. gpu, brand, month, quarter"),
+    metric: Optional[List[str]] = Query(None, description="sum:<measure>, mean:<measure>, count or margin"),
+    filter: Optional[List[str]] = Query(None, description="<dimension>:<value>, repeat to filter on several values"),
+    start_date: Optional[str] = Query(None, description="First day (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Last day, inclusive (YYYY-MM-DD)"),
+    sort: Optional[str] = Query(None, description="Dimension or metric column to sort by"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """Group sales by any dimensions with the given metrics, filters and date range"""
+    try:
+        result = analytics_service.query(group_by, metric or [], _parse_filters(filter), start_date, end_date,
+                                         sort, order == "desc", limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = result['rows']
+    return FastJSONResponse({"success": True, "data": rows, "count": len(rows), "plan": result['plan']})
+
+@router.get("/timeseries")
+@offload
+def get_time_series(
+    granularity: str = Query("day", pattern="^(hour|day|week|month|quarter)$"),
+    start: Optional[str] = Query(None, description="First day (YYYY-MM-DD), default the first sale"),
+    end: Optional[str] = Query(None, description="Last day, inclusive (YYYY-MM-DD), default the last sale"),
+    metric: Optional[List[str]] = Query(None, description="sum:<measure>, mean:<measure>, count or margin"),
+    filter: Optional[List[str]] = Query(None, description="<dimension>:<value>, repeat to filter on several values")
+):
+    """Get metrics per hour, day, ISO week, month or quarter, with empty periods as zeros"""
+    try:
+        result = analytics_service.get_time_series(granularity, start, end, metric or [], _parse_filters(filter))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = result['rows']
+    return FastJSONResponse({"success": True, "data": rows, "count": len(rows), "plan": result['plan']})
+
+@router.get("/percentiles")
+@offload
+def get_percentiles(
+    measure: str = Query("total_amount", description="Per-sale measure: total_amount or profit_margin"),
+    percentile: Optional[List[float]] = Query(None, description="Percentiles (0-100), default 50, 90 and 99"),
+    start_date: Optional[str] = Query(None, description="First day (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Last day, inclusive (YYYY-MM-DD)"),
+    brand: Optional[List[str]] = Query(None, description="Only these brands"),
+    by_brand: bool = Query(False, description="One row per brand"),
+    approximate: bool = Query(False, description="Estimate from sketches in constant time")
+):
+    """Get percentiles of order value or margin, optionally per brand"""
+    try:
+        result = analytics_service.get_percentiles(measure, percentile, start_date, end_date, brand, by_brand, approximate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = result['rows']
+    return FastJSONResponse({"success": True, "data": rows, "count": len(rows),
+                             **{key: value for key, value in result.items() if key != 'rows'}})
+
+@router.get("/distinct-products")
+@offload
+def get_distinct_products(
+    start_date: Optional[str] = Query(None, description="First day (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Last day, inclusive (YYYY-MM-DD)"),
+    brand: Optional[List[str]] = Query(None, description="Only these brands"),
+    by_brand: bool = Query(False, description="One row per brand"),
+    approximate: bool = Query(False, description="Estimate from sketches in constant time")
+):
+    """Get the number of distinct products sold, optionally per brand"""
+    try:
+        result = analytics_service.get_distinct_products(start_date, end_date, brand, by_brand, approximate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = result['rows']
+    return FastJSONResponse({"success": True, "data": rows, "count": len(rows),
+                             **{key: value for key, value in result.items() if key != 'rows'}})
 
 @router.get("/daily")
-async def get_daily_analytics(days: int = Query(30, ge=1, le=365)):
+@offload
+def get_daily_analytics(days: int = Query(30, ge=1, le=365)):
     """Get daily analytics"""
     data = analytics_service.get_daily_analytics(days)
-    return {"success": True, "data": data, "count": len(data)}
+    return FastJSONResponse({"success": True, "data": data, "count": len(data)})
 
 @router.get("/monthly")
-async def get_monthly_analytics():
+@offload
+def get_monthly_analytics():
     """Get monthly analytics"""
     data = analytics_service.get_monthly_analytics()
-    return {"success": True, "data": data, "count": len(data)}
+    return FastJSONResponse({"success": True, "data": data, "count": len(data)})
 
 @router.get("/weekly")
-async def get_weekly_analytics():
+@offload
+def get_weekly_analytics():
     """Get weekly analytics"""
     data = analytics_service.get_weekly_analytics()
-    return {"success": True, "data": data}
+    return FastJSONResponse({"success": True, "data": data})
 
 @router.get("/hourly")
-async def get_hourly_analytics():
+@offload
+def get_hourly_analytics():
     """Get hourly analytics"""
     data = analytics_service.get_hourly_analytics()
-    return {"success": True, "data": data, "count": len(data)}
+    return FastJSONResponse({"success": True, "data": data, "count": len(data)})
 
 @router.get("/brands")
-async def get_brand_analytics():
+@offload
+def get_brand_analytics():
     """Get brand performance analytics"""
     data = analytics_service.get_brand_analytics()
-    return {"success": True, "data": data, "count": len(data)}
+    return FastJSONResponse({"success": True, "data": data, "count": len(data)})
 
 @router.get("/gpu")
-async def get_gpu_analytics():
+@offload
+def get_gpu_analytics():
     """Get GPU performance analytics"""
     data = analytics_service.get_gpu_analytics()
-    return {"success": True, "data": data, "count": len(data)}
+    return FastJSONResponse({"success": True, "data": data, "count": len(data)})
 
 @router.get("/cpu")
-async def get_cpu_analytics():
+@offload
+def get_cpu_analytics():
     """Get CPU performance analytics"""
     data = analytics_service.get_cpu_analytics()
-    return {"success": True, "data": data, "count": len(data)}
\ No newline at end of file
+    return FastJSONResponse({"success": True, "data": data, "count": len(data)})
\ No newline at end of file
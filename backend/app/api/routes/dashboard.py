@@ -1,39 +1,15 @@
 from fastapi import APIRouter
-from app.services.sales_service import sales_service
-from app.services.product_service import product_service
-from app.services.analytics_service import analytics_service
+from app.services.dashboard_service import dashboard_service
+from app.api.responses import FastJSONResponse
+from app.api.offload import offload
+from app.api.caching import conditional_route
 
-router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+router = APIRouter(prefix="/dashboard", tags=["dashboard"],
+                   default_response_class=FastJSONResponse, route_class=conditional_route("no-cache"))
 
 @router.get("/")
-async def get_dashboard_data():
+@offload
+def get_dashboard_data():
     """Get all dashboard data"""
-    # Get summary statistics
-    sales_summary = sales_service.get_sales_summary()
-    product_stats = product_service.get_product_stats()
-    today_sales = sales_service.get_today_sales()
-    
-    # Get charts data
-    daily_data = analytics_service.get_daily_analytics(7)
-    brand_data = analytics_service.get_brand_analytics()
-    top_products = sales_service.get_top_selling_products(5)
-    
-    return {
-        "success": True,
-        "data": {
-            "stats": {
-                "total_revenue": sales_summary['total_revenue'],
-                "total_profit": sales_summary['total_profit'],
-                "total_products": product_stats['total_products'],
-                "total_sales": sales_summary['total_sales'],
-                "today_sales": today_sales['count'],
-                "today_revenue": today_sales['revenue'],
-                "today_profit": today_sales['profit']
-            },
-            "charts": {
-                "daily_trend": daily_data,
-                "brand_performance": brand_data,
-                "top_products": top_products
-            }
-        }
-    }
\ No newline at end of file
+    data = dashboard_service.get_dashboard_data()
+    return FastJSONResponse({"success": True, "data": data})
@@ -1,44 +1,84 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
 from app.services.product_service import product_service
+from app.api.responses import FastJSONResponse
+from app.api.offload import offload
+from app.api.caching import conditional_route
 
-router = APIRouter(prefix="/products", tags=["products"])
+router = APIRouter(prefix="/products", tags=["products"],
+                   default_response_class=FastJSONResponse, route_class=conditional_route("public, max-age=60"))
 
 @router.get("/")
-async def get_products():
+@offload
+def get_products():
     """Get all products"""
     products = product_service.get_all_products()
-    return {"success": True, "data": products, "count": len(products)}
+    return FastJSONResponse({"success": True, "data": products, "count": len(products)})
 
 @router.get("/search")
-async def search_products(q: str = Query(..., min_length=1)):
+@offload
+def search_products(q: str = Query(..., min_length=1)):
     """Search products"""
     results = product_service.search_products(q)
-    return {"success": True, "data": results, "count": len(results)}
+    return FastJSONResponse({"success": True, "data": results, "count": len(results)})
+
+@router.get("/filter")
+@offload
+def filter_products(
+    brand: Optional[List[str]] = Query(None),
+    series: Optional[List[str]] = Query(None),
+    cpu: Optional[List[str]] = Query(None),
+    gpu: Optional[List[str]] = Query(None),
+    ram: Optional[List[str]] = Query(None),
+    storage: Optional[List[str]] = Query(None),
+    screen_resolution: Optional[List[str]] = Query(None),
+    screen_type: Optional[List[str]] = Query(None),
+    price_bucket: Optional[List[str]] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0)
+):
+    """Filter products by facets and return matching products with facet counts"""
+    filters = {
+        'brand': brand,
+        'series': series,
+        'cpu': cpu,
+        'gpu': gpu,
+        'ram': ram,
+        'storage': storage,
+        'screen_resolution': screen_resolution,
+        'screen_type': screen_type,
+        'price_bucket': price_bucket,
+    }
+    result = product_service.filter_products(filters, min_price, max_price)
+    products = result['products']
+    return FastJSONResponse({"success": True, "data": products, "count": len(products), "facets": result['facets']})
 
 @router.get("/brands")
 async def get_brands():
     """Get all brands"""
     brands = product_service.get_brands()
-    return {"success": True, "data": brands}
+    return FastJSONResponse({"success": True, "data": brands})
 
 @router.get("/brands/{brand}")
-async def get_products_by_brand(brand: str):
+@offload
+def get_products_by_brand(brand: str):
     """Get products by brand"""
     products = product_service.get_products_by_brand(brand)
-    return {"success": True, "data": products, "count": len(products)}
+    return FastJSONResponse({"success": True, "data": products, "count": len(products)})
 
 @router.get("/low-stock")
-async def get_low_stock(threshold: int = Query(10, ge=0)):
+@offload
+def get_low_stock(threshold: int = Query(10, ge=0)):
     """Get low stock products"""
     products = product_service.get_low_stock_products(threshold)
-    return {"success": True, "data": products, "count": len(products)}
+    return FastJSONResponse({"success": True, "data": products, "count": len(products)})
 
 @router.get("/stats")
-async def get_product_stats():
+@offload
+def get_product_stats():
     """Get product statistics"""
     stats = product_service.get_product_stats()
-    return {"success": True, "data": stats}
+    return FastJSONResponse({"success": True, "data": stats})
 
 @router.get("/{product_name}")
 async def get_product(product_name: str):
@@ -46,4 +86,4 @@ async def get_product(product_name: str):
     product = product_service.get_product_by_name(product_name)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return {"success": True, "data": product}
\ No newline at end of file
+    return FastJSONResponse({"success": True, "data": product})
\ No newline at end of file
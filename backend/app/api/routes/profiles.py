@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import Optional
+from app.api.profiling import token_matches
+from app.api.responses import FastJSONResponse
+from app.utils.profiling import PROFILING_TOKEN, profile_store
+
+router = APIRouter(prefix="/profiles", tags=["profiles"], default_response_class=FastJSONResponse)
+
+
+def _authorize(token: Optional[str]):
+    # Look like a missing route while profiling is switched off
+    if not PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+def _find(profile_id: str):
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/")
+def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """List the most recent request profiles, newest first"""
+    _authorize(x_profile_token)
+    profiles = profile_store.list()
+    return FastJSONResponse({"success": True, "data": profiles, "count": len(profiles)})
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Get one profile: category breakdown, top functions and collapsed stacks"""
+    _authorize(x_profile_token)
+    return FastJSONResponse({"success": True, "data": _find(profile_id)})
+
+
+@router.get("/{profile_id}/collapsed")
+def download_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Download a profile's collapsed stacks (flamegraph.pl, speedscope)"""
+    _authorize(x_profile_token)
+    profile = _find(profile_id)
+    return Response(
+        content=profile['collapsed'],
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+    )
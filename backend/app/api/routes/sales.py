@@ -1,48 +1,105 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
 from datetime import datetime
+from app.models.sale import Sale
 from app.services.sales_service import sales_service
+from app.api.responses import FastJSONResponse
+from app.api.offload import offload
+from app.api.caching import conditional_route, volatile
 
-router = APIRouter(prefix="/sales", tags=["sales"])
+router = APIRouter(prefix="/sales", tags=["sales"],
+                   default_response_class=FastJSONResponse, route_class=conditional_route("no-cache"))
 
 @router.get("/")
-async def get_sales(limit: Optional[int] = Query(None, ge=1)):
-    """Get all sales"""
-    sales = sales_service.get_all_sales(limit)
-    return {"success": True, "data": sales, "count": len(sales)}
+@offload
+def get_sales(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
+    """Get sales newest first, paginated by keyset cursor when a limit is given"""
+    try:
+        page = sales_service.get_sales_page(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    sales = page['sales']
+    return FastJSONResponse({"success": True, "data": sales, "count": len(sales), "next_cursor": page['next_cursor']})
+
+@router.post("/", status_code=201)
+def record_sales(sales: Union[Sale, List[Sale]] = Body(...)):
+    """Record one sale or a batch of sales"""
+    # Plain def: runs in the threadpool, so concurrent requests share a log commit
+    batch = sales if isinstance(sales, list) else [sales]
+    try:
+        count = sales_service.record_sales([sale.model_dump() for sale in batch])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"success": True, "count": count}, status_code=201)
+
+@router.get("/stream")
+async def stream_sales(cursor: Optional[str] = Query(None, description="Resume after this cursor")):
+    """Stream the full sales history newest first as NDJSON"""
+    try:
+        chunks = sales_service.stream_sales(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
 
 @router.get("/recent")
-async def get_recent_sales(days: int = Query(7, ge=1)):
+@volatile
+@offload
+def get_recent_sales(days: int = Query(7, ge=1)):
     """Get recent sales"""
     sales = sales_service.get_recent_sales(days)
-    return {"success": True, "data": sales, "count": len(sales)}
+    return FastJSONResponse({"success": True, "data": sales, "count": len(sales)})
 
 @router.get("/date-range")
-async def get_sales_by_date_range(
+@offload
+def get_sales_by_date_range(
     start_date: str = Query(..., description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(..., description="End date (YYYY-MM-DD)")
 ):
     """Get sales within date range"""
     try:
         sales = sales_service.get_sales_by_date_range(start_date, end_date)
-        return {"success": True, "data": sales, "count": len(sales)}
+        return FastJSONResponse({"success": True, "data": sales, "count": len(sales)})
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
 
 @router.get("/summary")
-async def get_sales_summary():
+@offload
+def get_sales_summary():
     """Get sales summary"""
     summary = sales_service.get_sales_summary()
-    return {"success": True, "data": summary}
+    return FastJSONResponse({"success": True, "data": summary})
 
 @router.get("/today")
-async def get_today_sales():
+@offload
+def get_today_sales():
     """Get today's sales"""
     today_data = sales_service.get_today_sales()
-    return {"success": True, "data": today_data}
+    return FastJSONResponse({"success": True, "data": today_data})
+
+@router.get("/range-summary")
+@offload
+def get_range_summary(
+    start: str = Query(..., description="Start date or datetime (YYYY-MM-DD[THH:MM])"),
+    end: str = Query(..., description="End date, inclusive, or datetime, exclusive")
+):
+    """Get sales totals for a range compared with the period before it"""
+    try:
+        summary = sales_service.get_range_summary(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"success": True, "data": summary})
 
 @router.get("/top-products")
-async def get_top_products(limit: int = Query(10, ge=1, le=50)):
+@offload
+def get_top_products(
+    limit: int = Query(10, ge=1, le=50),
+    by: str = Query("revenue", pattern="^(revenue|profit|quantity)$", description="Ranking measure"),
+    days: Optional[int] = Query(None, ge=1, description="Only count the last N days")
+):
     """Get top selling products"""
-    products = sales_service.get_top_selling_products(limit)
-    return {"success": True, "data": products, "count": len(products)}
\ No newline at end of file
+    products = sales_service.get_top_selling_products(limit, by=by, days=days)
+    return FastJSONResponse({"success": True, "data": products, "count": len(products)})
\ No newline at end of file
@@ -1,45 +1,360 @@
 import pandas as pd
-from typing import Optional
+import itertools
+import threading
 import os
+import time
+from typing import Callable, Dict, List, Optional
+from app.db.rollup import RollupCube
+from app.db.sales_log import START, SalesLog
+from app.db.shared_store import SharedStore
+from app.db.snapshot import Snapshot, append_rows
+from app.models.sale import complete_sale
+from app.utils.csv_loader import CSVLoader
+from app.utils.csv_tail import CSVTail
+from app.utils.metrics import timed
+
+# Directory holding the product and sales CSV files
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(__file__), '../../data'))
+# Seconds between checks of sales_data.csv for appended rows (0 disables the watcher)
+SALES_WATCH_INTERVAL = float(os.getenv('SALES_WATCH_INTERVAL', '0'))
+# Seconds between compactions of the sales write-ahead log into the CSV (0 disables)
+SALES_COMPACT_INTERVAL = float(os.getenv('SALES_COMPACT_INTERVAL', '60'))
+# Share one memory-mapped copy of the dataset between worker processes
+SHARED_DATASET = os.getenv('SHARED_DATASET', '0') == '1'
+SHARED_DATASET_DIR = os.getenv('SHARED_DATASET_DIR', '')
+# Seconds between shared store syncs: exports on the loader, re-attaches on workers
+SHARED_POLL_INTERVAL = float(os.getenv('SHARED_POLL_INTERVAL', '1'))
+# Minimum seconds between shared store exports; each one rewrites the whole dataset
+SHARED_EXPORT_INTERVAL = float(os.getenv('SHARED_EXPORT_INTERVAL', '10'))
+# Seconds a worker waits for the loader's first export before loading on its own
+SHARED_ATTACH_TIMEOUT = float(os.getenv('SHARED_ATTACH_TIMEOUT', '60'))
 
 class Database:
-    def __init__(self):
-        self.base_path = os.path.join(os.path.dirname(__file__), '../../data')
-        self.products_df: Optional[pd.DataFrame] = None
-        self.sales_df: Optional[pd.DataFrame] = None
+    def __init__(self, shared: bool = SHARED_DATASET, base_path: Optional[str] = None):
+        self.base_path = base_path or DATA_DIR
+        self._snapshot: Snapshot = Snapshot.empty()
+        self._versions = itertools.count(1)
+        self._load_lock = threading.Lock()
+        self._listeners: List[Callable[[Snapshot], None]] = []
+        self._sales_tail: Optional[CSVTail] = None
+        self._sales_log: Optional[SalesLog] = None
+        # How far into the sales log (epoch, bytes) the snapshot goes
+        self._log_position = START
+        self._publish_wanted = threading.Event()
+        self._workers: Dict[str, threading.Thread] = {}
+        self._stop_workers = threading.Event()
+
+        self.shared_store: Optional[SharedStore] = None
+        self._shared_generation: Optional[str] = None
+        self._shared_version = 0
+        self._exported_at: Optional[float] = None
+        self._export_lock = threading.Lock()
+        if shared:
+            self.shared_store = SharedStore(SHARED_DATASET_DIR or os.path.join(self.base_path, '.shared'))
+            if self.shared_store.acquire_loader():
+                self._versions = itertools.count(self.shared_store.last_version() + 1)
         self.load_data()
-    
+
+    @property
+    def is_loader(self) -> bool:
+        """Whether this process builds snapshots itself rather than attaching to the shared store"""
+        return self.shared_store is None or self.shared_store.is_loader
+
     def load_data(self):
-        """Load CSV files into DataFrames"""
-        try:
-            products_path = os.path.join(self.base_path, 'megapc_products_updated.csv')
-            sales_path = os.path.join(self.base_path, 'sales_data.csv')
-            
-            self.products_df = pd.read_csv(products_path)
-            
-            # Try to load sales data if it exists
-            if os.path.exists(sales_path):
-                self.sales_df = pd.read_csv(sales_path)
-                # Convert date columns to datetime
-                self.sales_df['sale_date'] = pd.to_datetime(self.sales_df['sale_date'])
-                self.sales_df['date'] = pd.to_datetime(self.sales_df['date'])
+        """Load CSV files into a new snapshot and publish it atomically"""
+        with self._load_lock:
+            if self.is_loader:
+                self._load()
             else:
-                print("Warning: sales_data.csv not found. Sales endpoints will return empty data.")
-                self.sales_df = pd.DataFrame()
-                
+                self._attach_shared(timeout=SHARED_ATTACH_TIMEOUT)
+
+    def _load(self):
+        try:
+            loader = CSVLoader(self.base_path)
+            sales_log = self.sales_log
+            with sales_log.exclusive():
+                sales_log.recover(loader.sales_path)
+            products_df = loader.load_products()
+            sales_df = loader.load_sales()
+
+            # Recorded sales not compacted into the CSV yet
+            logged, self._log_position = sales_log.read_from(START)
+            if logged:
+                sales_df = append_rows(sales_df, loader.sales_from_records(logged))
+
+            # Build everything off to the side, then swap in a single assignment
+            # so concurrent readers never observe a half-loaded dataset
+            self._publish(lambda: Snapshot(products_df, sales_df, version=next(self._versions)))
+
+            # Remember how much of the sales file is in the snapshot
+            self._sales_tail = CSVTail(loader.sales_path)
+            self._sales_tail.mark(loader.loaded_sizes.get(loader.sales_path))
+
         except Exception as e:
             print(f"Error loading data: {e}")
             raise
-    
+
+        if self.shared_store is not None:
+            self.export_shared()
+
+    def refresh_sales(self) -> int:
+        """Publish sales rows appended to the CSV since the last load.
+
+        Only the new tail of the file is parsed and folded into the current
+        snapshot. Falls back to a full reload when the file was truncated or
+        rewritten. Returns the number of rows added (-1 after a full reload).
+        """
+        with self._load_lock:
+            return self._refresh_sales()
+
+    def _refresh_sales(self) -> int:
+        loader = CSVLoader(self.base_path)
+        new_sales = None
+        if self._sales_tail is not None:
+            try:
+                new_sales = loader.load_sales_tail(self._sales_tail)
+            except Exception as e:
+                print(f"Warning: could not parse appended sales rows: {e}")
+        if new_sales is None:
+            self._load()
+            return -1
+        if new_sales.empty:
+            return 0
+
+        self._publish(lambda: self._snapshot.with_sales(new_sales, version=next(self._versions)))
+        return len(new_sales)
+
+    @property
+    def sales_log(self) -> SalesLog:
+        """Write-ahead log for recorded sales, in the data directory"""
+        path = os.path.join(self.base_path, 'sales.wal')
+        if self._sales_log is None or self._sales_log.path != path:
+            if self._sales_log is not None:
+                self._sales_log.close()
+            self._sales_log = SalesLog(path, on_commit=self._publish_wanted.set)
+        return self._sales_log
+
+    def record_sales(self, records: List[Dict]) -> int:
+        """Durably record new sales and queue them for the live snapshot.
+
+        Returns once the records are in the write-ahead log; concurrent
+        callers share one fsync. Publishing is coalesced by a background
+        publisher following the log, so a write never pays for rebuilding
+        the snapshot and the rows become visible a moment later. With a
+        shared store the loader process publishes for every worker. The CSV
+        is only touched by ``compact_sales_log``. Calendar fields and
+        amounts are derived from sale_date, quantity and the prices; a
+        record contradicting them raises ValueError.
+        """
+        if not records:
+            return 0
+        records = [complete_sale(record) for record in records]
+        self.sales_log.append(records)
+        if self.is_loader:
+            self._start_publisher()
+        return len(records)
+
+    def publish_logged_sales(self) -> int:
+        """Fold sales logged since the last publish into a new snapshot"""
+        with self._load_lock:
+            return self._publish_logged_sales()
+
+    def _publish_logged_sales(self) -> int:
+        if not self.is_loader:
+            return 0
+        records, position = self.sales_log.read_from(self._log_position)
+        if records is None:
+            # Compacted by another process: those rows are in the CSV now
+            self._load()
+            return -1
+        self._log_position = position
+        if not records:
+            return 0
+        new_sales = CSVLoader(self.base_path).sales_from_records(records)
+        self._publish(lambda: self._snapshot.with_sales(new_sales, version=next(self._versions)))
+        return len(records)
+
+    def _start_publisher(self):
+        worker = self._workers.get('sales-publisher')
+        if worker is not None and worker.is_alive():
+            return
+
+        def run():
+            while not self._stop_workers.is_set():
+                if not self._publish_wanted.wait(timeout=1.0):
+                    continue
+                self._publish_wanted.clear()
+                try:
+                    self.publish_logged_sales()
+                except Exception as e:
+                    print(f"Error publishing recorded sales: {e}")
+
+        self._workers['sales-publisher'] = threading.Thread(target=run, name='sales-publisher', daemon=True)
+        self._workers['sales-publisher'].start()
+
+    def compact_sales_log(self) -> int:
+        """Move recorded sales from the write-ahead log into sales_data.csv"""
+        if not self.is_loader:
+            return 0
+        sales_log = self.sales_log
+        with self._load_lock, sales_log.exclusive():
+            loader = CSVLoader(self.base_path)
+            # Take in anything appended to the CSV by others first, so the
+            # tail can then be moved past our own rows without reading them
+            tail = self._sales_tail
+            if tail is not None and tail.has_changed():
+                self._refresh_sales()
+            # Everything in the log must be in the snapshot before it leaves the log
+            self._publish_logged_sales()
+            compacted = sales_log.compact_into(loader.sales_path)
+            self._log_position = sales_log.position()
+            if compacted and self._sales_tail is not None:
+                self._sales_tail.mark(os.path.getsize(loader.sales_path))
+            return compacted
+
+    def export_shared(self, interval: float = SHARED_EXPORT_INTERVAL) -> Optional[str]:
+        """Write the current snapshot to the shared store if workers have not seen it yet.
+
+        An export writes the whole dataset, so its I/O grows with the sales
+        history rather than with the rows added since the last one. Exports
+        are therefore at most one per ``interval`` seconds (the first is
+        immediate): versions published in between reach the workers
+        together with the next export, up to ``interval`` seconds late.
+        """
+        with self._export_lock:
+            snapshot = self._snapshot
+            if self.shared_store is None or not self.is_loader or snapshot.version <= self._shared_version:
+                return None
+            if self._exported_at is not None and time.monotonic() - self._exported_at < interval:
+                return None
+            generation = self.shared_store.publish(snapshot)
+            self._shared_version = snapshot.version
+            self._exported_at = time.monotonic()
+            return generation
+
+    def _attach_shared(self, timeout: float = 0):
+        generation = self.shared_store.current()
+        deadline = time.monotonic() + timeout
+        while generation is None and time.monotonic() < deadline:
+            time.sleep(0.1)
+            generation = self.shared_store.current()
+        if generation is None:
+            print("Warning: no shared dataset published yet, loading locally")
+            self._load()
+            return
+        if generation != self._shared_generation:
+            self._publish(lambda: self.shared_store.attach(generation))
+            self._shared_generation = generation
+
+    def _sync_shared(self):
+        if not self.is_loader and self.shared_store.acquire_loader():
+            print("Taking over as the shared dataset loader")
+            with self._load_lock:
+                self._versions = itertools.count(max(self.version, self.shared_store.last_version()) + 1)
+                self._load()
+            return
+
+        if self.is_loader:
+            # Pick up sales logged by other workers, then hand the result to them
+            self.publish_logged_sales()
+            self.export_shared()
+        elif self.shared_store.current() != self._shared_generation:
+            with self._load_lock:
+                self._attach_shared()
+
+    def watch(self, interval: float = SALES_WATCH_INTERVAL):
+        """Poll the sales CSV in a background thread and pick up appended rows"""
+        def poll():
+            tail = self._sales_tail
+            if self.is_loader and tail is not None and tail.has_changed():
+                self.refresh_sales()
+
+        self._every('sales-watcher', interval, poll)
+
+    def start_compaction(self, interval: float = SALES_COMPACT_INTERVAL):
+        """Compact the sales write-ahead log in a background thread (in one process only)"""
+        def compact():
+            # Every other process reloads after a compaction, so elect a single compactor
+            if self.is_loader and self.sales_log.acquire_compactor() and self.sales_log.size():
+                self.compact_sales_log()
+
+        self._every('sales-compactor', interval, compact)
+
+    def start_sharing(self, interval: float = SHARED_POLL_INTERVAL):
+        """Keep the shared store in sync: export as the loader, re-attach as a worker"""
+        if self.shared_store is not None:
+            self._every('shared-sync', interval, self._sync_shared)
+
+    def stop_watching(self):
+        """Stop the background watcher, compactor, publisher and sync threads"""
+        self._stop_workers.set()
+        for worker in self._workers.values():
+            worker.join(timeout=5)
+        self._workers.clear()
+        self._stop_workers.clear()
+
+    def _every(self, name: str, interval: float, task: Callable[[], None]):
+        worker = self._workers.get(name)
+        if interval <= 0 or (worker is not None and worker.is_alive()):
+            return
+
+        def run():
+            while not self._stop_workers.wait(interval):
+                try:
+                    task()
+                except Exception as e:
+                    print(f"Error in {name}: {e}")
+
+        self._workers[name] = threading.Thread(target=run, name=name, daemon=True)
+        self._workers[name].start()
+
+    @timed('snapshot')
+    def _publish(self, build: Callable[[], Snapshot]) -> Snapshot:
+        """Build a new snapshot, swap it in and notify listeners (caches, indexes, ...)"""
+        snapshot = build()
+        self._snapshot = snapshot
+        for listener in list(self._listeners):
+            listener(snapshot)
+        return snapshot
+
+    def on_publish(self, listener: Callable[[Snapshot], None]):
+        """Call listener(snapshot) every time a new snapshot is published"""
+        self._listeners.append(listener)
+
+    @property
+    def snapshot(self) -> Snapshot:
+        """Current immutable snapshot; hold on to it for a consistent read"""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def products_df(self) -> pd.DataFrame:
+        return self._snapshot.products
+
+    @property
+    def sales_df(self) -> pd.DataFrame:
+        return self._snapshot.sales
+
     def get_products(self) -> pd.DataFrame:
-        return self.products_df.copy()
-    
+        return self._snapshot.get_products()
+
     def get_sales(self) -> pd.DataFrame:
-        return self.sales_df.copy() if not self.sales_df.empty else pd.DataFrame()
-    
+        return self._snapshot.get_sales()
+
+    def get_sales_cube(self) -> RollupCube:
+        return self._snapshot.sales_cube
+
+    def replace_data(self, products_df: pd.DataFrame, sales_df: pd.DataFrame) -> Snapshot:
+        """Publish the given tables as a new snapshot (benchmarks, fixtures)"""
+        with self._load_lock:
+            return self._publish(lambda: Snapshot(products_df, sales_df, version=next(self._versions)))
+
     def reload_data(self):
         """Reload data from CSV files"""
         self.load_data()
 
 # Global database instance
-db = Database()
\ No newline at end of file
+db = Database()
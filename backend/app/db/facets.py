@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+from app.utils.metrics import timed
+
+FACET_FIELDS = [
+    'brand', 'series', 'cpu', 'gpu', 'ram', 'storage',
+    'screen_resolution', 'screen_type', 'price_bucket',
+]
+
+# Upper bounds (exclusive) of the price buckets, in the catalogue currency
+PRICE_EDGES = [1500, 2000, 2500, 3000, 4000]
+
+
+def price_bucket_labels() -> List[str]:
+    bounds = [0] + PRICE_EDGES
+    labels = [f'{lo}-{hi}' for lo, hi in zip(bounds, bounds[1:])]
+    return labels + [f'{PRICE_EDGES[-1]}+']
+
+
+class FacetIndex:
+    """Per-value posting lists over the products table.
+
+    Every facet value owns the sorted row ids of the products that have it.
+    Filters merge the lists of the selected values within a facet and
+    intersect across facets, so they cost the size of the lists they touch
+    rather than the size of the catalogue. Facet counts are disjunctive:
+    each facet is counted against every filter except its own, so the UI
+    can show how many products picking another value would give. Counts
+    come from a bincount of the value codes of the rows left by the other
+    filters, so they cost the size of that selection (the whole catalogue
+    when nothing else is filtered), not one intersection per facet value.
+    """
+
+    def __init__(self, size: int, postings: Dict[str, Dict[str, np.ndarray]], codes: Dict[str, np.ndarray],
+                 prices: np.ndarray):
+        self.size = size
+        self.postings = postings
+        # Row -> position of its value in postings[field] (-1 for missing)
+        self.codes = codes
+        self.all_rows = np.arange(size, dtype=np.int64)
+        # Case-insensitive lookup of facet values ('msi' -> ['MSI', 'Msi'])
+        self._aliases: Dict[str, Dict[str, List[str]]] = {}
+        for field, values in postings.items():
+            aliases: Dict[str, List[str]] = {}
+            for value in values:
+                aliases.setdefault(value.lower(), []).append(value)
+            self._aliases[field] = aliases
+        # Row order by price answers min/max price ranges by binary search
+        self._price_order = np.argsort(prices, kind='stable')
+        self._sorted_prices = prices[self._price_order]
+
+    @classmethod
+    def from_products(cls, products: pd.DataFrame) -> 'FacetIndex':
+        size = len(products)
+        postings: Dict[str, Dict[str, np.ndarray]] = {}
+        field_codes: Dict[str, np.ndarray] = {}
+        if products.empty:
+            return cls(0, postings, field_codes, np.array([], dtype=float))
+
+        columns = {field: products[field] for field in FACET_FIELDS if field in products.columns}
+        prices = products['price'].to_numpy(dtype=float) if 'price' in products.columns else np.zeros(size)
+        if 'price' in products.columns:
+            buckets = np.searchsorted(PRICE_EDGES, prices, side='right')
+            columns['price_bucket'] = pd.Categorical.from_codes(buckets, price_bucket_labels())
+
+        for field, column in columns.items():
+            codes, uniques = pd.factorize(column)
+            field_codes[field] = codes
+            # A stable sort keeps the rows of each value in row order
+            order = np.argsort(codes, kind='stable').astype(np.int64)
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            postings[field] = {
+                str(value): order[bounds[code]:bounds[code + 1]]
+                for code, value in enumerate(uniques)
+            }
+
+        return cls(size, postings, field_codes, prices)
+
+    @timed('filter')
+    def select(self, filters: Dict[str, Iterable[str]], min_price: Optional[float] = None,
+               max_price: Optional[float] = None) -> Dict:
+        """Rows matching all filters plus per-facet value counts"""
+        matches = {field: self._facet_rows(field, values) for field, values in filters.items() if values}
+        price_rows = self._price_rows(min_price, max_price)
+
+        def intersect(excluded: Optional[str] = None) -> np.ndarray:
+            lists = [rows for field, rows in matches.items() if field != excluded]
+            if price_rows is not None:
+                lists.append(price_rows)
+            if not lists:
+                return self.all_rows
+            lists.sort(key=len)
+            rows = lists[0]
+            for other in lists[1:]:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            return rows
+
+        counts = {}
+        selections: Dict[Optional[str], np.ndarray] = {}
+        for field, values in self.postings.items():
+            # Disjunctive counting: ignore this facet's own selection; facets
+            # without a filter of their own share the same selection
+            excluded = field if field in matches else None
+            rows = selections.get(excluded)
+            if rows is None:
+                rows = selections[excluded] = intersect(excluded)
+            codes = self.codes[field][rows]
+            tally = np.bincount(codes[codes >= 0], minlength=len(values))
+            counts[field] = {value: int(count) for value, count in zip(values, tally) if count}
+
+        rows = selections[None] if None in selections else intersect()
+        return {'rows': rows, 'facets': counts}
+
+    def _facet_rows(self, field: str, values: Iterable[str]) -> np.ndarray:
+        postings = self.postings.get(field)
+        if postings is None:
+            raise ValueError(f"Unknown facet: {field}")
+        matched = {match for value in values for match in self._aliases[field].get(str(value).lower(), [])}
+        if len(matched) == 1:
+            return postings[matched.pop()]
+        # Values of one facet never share a row, so merging needs no dedup
+        return np.sort(np.concatenate([postings[match] for match in matched] or [np.array([], dtype=np.int64)]))
+
+    def _price_rows(self, min_price: Optional[float], max_price: Optional[float]) -> Optional[np.ndarray]:
+        if min_price is None and max_price is None:
+            return None
+        lo = 0 if min_price is None else np.searchsorted(self._sorted_prices, min_price, side='left')
+        hi = self.size if max_price is None else np.searchsorted(self._sorted_prices, max_price, side='right')
+        return np.sort(self._price_order[lo:hi]).astype(np.int64)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+from app.db.rollup import COUNT
+
+# Measures kept as running totals; integer ones stay exact
+FLOAT_FIELDS = ['total_amount', 'total_cost', 'total_profit']
+INT_FIELDS = ['quantity', COUNT]
+FIELDS = FLOAT_FIELDS + INT_FIELDS
+
+HOUR = np.timedelta64(1, 'h')
+DAY = np.timedelta64(1, 'D')
+
+
+def _place(cumulative: np.ndarray, offset: int, length: int) -> np.ndarray:
+    """Running totals re-based to start `offset` buckets later and cover `length` buckets"""
+    placed = np.empty(length + 1, dtype=cumulative.dtype)
+    placed[:offset] = 0
+    count = min(len(cumulative), length + 1 - offset)
+    placed[offset:offset + count] = cumulative[:count]
+    placed[offset + count:] = cumulative[-1]
+    return placed
+
+
+class PrefixSums:
+    """Running totals of the sales measures per hour and per day.
+
+    ``hourly[field][k]`` is the sum of the field over every sale before
+    hour ``k`` counted from midnight of the first sale day (``daily``
+    likewise per day), so the total over any range is the difference of
+    two entries. Ingesting sales merges running totals of the new rows in
+    one vectorized pass over the calendar, never over the history.
+    Instances are never mutated.
+    """
+
+    def __init__(self, origin: Optional[np.datetime64], hourly: Dict[str, np.ndarray],
+                 daily: Dict[str, np.ndarray]):
+        self.origin = origin
+        self.hourly = hourly
+        self.daily = daily
+
+    @property
+    def days(self) -> int:
+        return len(self.daily[COUNT]) - 1 if self.origin is not None else 0
+
+    @classmethod
+    def empty(cls) -> 'PrefixSums':
+        return cls(None, {}, {})
+
+    @classmethod
+    def from_cube(cls, cube) -> 'PrefixSums':
+        """Build from the base cuboid of a RollupCube (one row per date, hour, ...)"""
+        base = cube.base
+        if base.empty:
+            return cls.empty()
+        stamps = base['date'].to_numpy().astype('datetime64[h]') + base['hour'].to_numpy().astype('int64') * HOUR
+        return cls._build(stamps, {field: base[field].to_numpy() for field in FIELDS})
+
+    @classmethod
+    def from_sales(cls, sales: pd.DataFrame) -> 'PrefixSums':
+        """Build from raw sales rows"""
+        if sales.empty:
+            return cls.empty()
+        stamps = sales['sale_date'].to_numpy().astype('datetime64[h]')
+        values = {field: sales[field].to_numpy() for field in FIELDS if field != COUNT}
+        values[COUNT] = None
+        return cls._build(stamps, values)
+
+    @classmethod
+    def _build(cls, stamps: np.ndarray, values: Dict[str, Optional[np.ndarray]]) -> 'PrefixSums':
+        origin = stamps.min().astype('datetime64[D]')
+        days = int((stamps.max().astype('datetime64[D]') - origin) // DAY) + 1
+        buckets = ((stamps - origin) // HOUR).astype(np.int64)
+
+        hourly, daily = {}, {}
+        for field in FIELDS:
+            weights = values[field]
+            per_hour = np.bincount(buckets, weights=None if weights is None else weights.astype(np.float64),
+                                   minlength=days * 24)
+            if field in INT_FIELDS:
+                per_hour = np.rint(per_hour).astype(np.int64)
+            hourly[field] = np.concatenate([[0], np.cumsum(per_hour)]).astype(per_hour.dtype)
+            daily[field] = np.concatenate([[0], np.cumsum(per_hour.reshape(days, 24).sum(axis=1))]).astype(per_hour.dtype)
+        return cls(origin, hourly, daily)
+
+    def merge(self, new_sales: pd.DataFrame) -> 'PrefixSums':
+        """Return new running totals with the given sales rows added"""
+        delta = self.from_sales(new_sales)
+        if delta.origin is None:
+            return self
+        if self.origin is None:
+            return delta
+
+        origin = min(self.origin, delta.origin)
+        own_offset = int((self.origin - origin) // DAY)
+        delta_offset = int((delta.origin - origin) // DAY)
+        days = max(own_offset + self.days, delta_offset + delta.days)
+
+        hourly, daily = {}, {}
+        for field in FIELDS:
+            hourly[field] = (_place(self.hourly[field], own_offset * 24, days * 24)
+                             + _place(delta.hourly[field], delta_offset * 24, days * 24))
+            daily[field] = (_place(self.daily[field], own_offset, days)
+                            + _place(delta.daily[field], delta_offset, days))
+        return PrefixSums(origin, hourly, daily)
+
+    def totals(self, start, end) -> Dict:
+        """Sums over sales with start <= sale_date < end, to the hour (two lookups)"""
+        if self.origin is None:
+            return {field: 0 if field in INT_FIELDS else 0.0 for field in FIELDS}
+
+        start = pd.Timestamp(start).to_datetime64()
+        end = pd.Timestamp(end).to_datetime64()
+        if start == start.astype('datetime64[D]') and end == end.astype('datetime64[D]'):
+            # Whole days: the daily totals have fewer rounding steps
+            sums, unit, limit = self.daily, DAY, self.days
+        else:
+            sums, unit, limit = self.hourly, HOUR, self.days * 24
+        # Partial hours count whole: start rounds down, end rounds up
+        first = int(np.clip((start - self.origin) // unit, 0, limit))
+        last = int(np.clip(-((self.origin - end) // unit), first, limit))
+
+        result = {}
+        for field in FIELDS:
+            value = sums[field][last] - sums[field][first]
+            result[field] = int(value) if field in INT_FIELDS else float(value)
+        return result
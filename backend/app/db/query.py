@@ -0,0 +1,299 @@
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.db.rollup import COUNT, DIMENSIONS, MEASURES
+from app.utils.metrics import timed
+
+# Calendar parts derived from the day of a sale, usable wherever a dimension is
+TIME_PARTS = ['year', 'quarter', 'month', 'week', 'day_of_week']
+# Product attributes only the raw sales rows carry (grouping by them means a scan)
+SCAN_DIMENSIONS = ['series', 'ram']
+QUERY_DIMENSIONS = DIMENSIONS + TIME_PARTS + SCAN_DIMENSIONS
+# Dimensions whose filter values are numbers
+NUMERIC_DIMENSIONS = {'hour', 'year', 'quarter', 'month', 'week'}
+
+AGGREGATES = ['sum', 'mean', 'count', 'margin']
+# Measures that count things and so are whole numbers
+COUNTED = ['quantity', COUNT]
+DEFAULT_METRICS = ['sum:total_amount', 'sum:total_profit', 'sum:quantity', 'count', 'margin']
+
+GRANULARITIES = ['hour', 'day', 'week', 'month', 'quarter']
+# Longest calendar a time series may span (about eleven years of hours)
+MAX_PERIODS = 100_000
+
+
+def time_part(days: pd.Series, part: str) -> pd.Series:
+    """Calendar part of a datetime column"""
+    if part == 'week':
+        values = days.dt.isocalendar().week.astype('int64')
+    elif part == 'day_of_week':
+        values = days.dt.day_name()
+    else:
+        values = getattr(days.dt, part)
+    return values.rename(part)
+
+
+def parse_metric(spec: str) -> Tuple[str, Optional[str], str]:
+    """'sum:total_amount' -> ('sum', 'total_amount', 'total_amount'); 'count' / 'margin' take no measure"""
+    aggregate, _, measure = spec.partition(':')
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{aggregate}' (use one of {', '.join(AGGREGATES)})")
+    if aggregate in ('count', 'margin'):
+        if measure:
+            raise ValueError(f"'{aggregate}' takes no measure")
+        return aggregate, None, 'sales_count' if aggregate == 'count' else 'margin'
+    if measure not in MEASURES:
+        raise ValueError(f"Unknown measure '{measure}' (use one of {', '.join(MEASURES)})")
+    return aggregate, measure, measure if aggregate == 'sum' else f'avg_{measure}'
+
+
+class AnalyticsQuery:
+    """Group-by / metrics / filters / date range over the sales of a snapshot.
+
+    ``plan`` picks the cheapest source that can answer the query: the
+    smallest rollup of the snapshot's cube that has every dimension the
+    query groups or filters on, or, for product attributes the cube does
+    not keep, the raw sales rows with the date range cut out by binary
+    search. Either way only the rows in range are grouped. Measures are
+    summed along with the row count, so means and margins stay exact.
+    """
+
+    def __init__(self, group_by: Sequence[str] = (), metrics: Sequence[str] = (),
+                 filters: Optional[Dict[str, Sequence]] = None, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None, sort: Optional[str] = None,
+                 descending: bool = True, limit: Optional[int] = None):
+        self.group_by = list(dict.fromkeys(group_by))
+        self.metrics = [parse_metric(spec) for spec in (metrics or DEFAULT_METRICS)]
+        self.filters = {dim: list(values) for dim, values in (filters or {}).items() if values}
+        self.start = pd.Timestamp(start_date).normalize() if start_date else None
+        self.end = pd.Timestamp(end_date).normalize() if end_date else None
+        if self.start is not None and self.end is not None and self.end < self.start:
+            raise ValueError("end must not be before start")
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+
+        for dim in self.group_by + list(self.filters):
+            if dim not in QUERY_DIMENSIONS:
+                raise ValueError(f"Unknown dimension '{dim}' (use one of {', '.join(QUERY_DIMENSIONS)})")
+        names = self.group_by + [name for _, _, name in self.metrics]
+        if sort is not None and sort not in names:
+            raise ValueError(f"Cannot sort by '{sort}': not a dimension or metric of the query")
+
+    def columns_needed(self) -> List[str]:
+        """Stored columns the query groups or filters on (time parts need the day)"""
+        needed = []
+        for dim in self.group_by + list(self.filters):
+            column = 'date' if dim in TIME_PARTS else dim
+            if column not in needed:
+                needed.append(column)
+        if (self.start is not None or self.end is not None) and 'date' not in needed:
+            needed.append('date')
+        return needed
+
+    def plan(self, snapshot) -> Dict:
+        """Source the query will read: a cube rollup or a pruned scan of the sales"""
+        needed = self.columns_needed()
+        if all(column in DIMENSIONS for column in needed):
+            cube = snapshot.sales_cube
+            if len(needed) == 1:
+                # Single-dimension rollups are cheap and kept for the snapshot's life
+                key, source = tuple(needed), cube.rollup(*needed)
+            else:
+                key, source = cube.covering(needed)
+            return {'source': 'rollup', 'dimensions': list(key), 'rows': len(source), 'frame': source}
+
+        rows = snapshot.sales_index.between(
+            self.start, self.end + timedelta(days=1) if self.end is not None else None, end_inclusive=False)
+        source = snapshot.sales.iloc[rows]
+        return {'source': 'scan', 'dimensions': [], 'rows': len(source), 'frame': source}
+
+    def execute(self, snapshot) -> Tuple[pd.DataFrame, Dict]:
+        """Result rows and a description of the plan that produced them"""
+        source, plan, days = self._select(snapshot)
+        if source.empty:
+            if self.group_by:
+                return pd.DataFrame(columns=self.group_by + [name for _, _, name in self.metrics]), plan
+            # A grand total over nothing is still one row, of zeros
+            totals = pd.DataFrame({column: [0] for column in MEASURES + [COUNT]})
+        elif plan['source'] == 'rollup' and plan['dimensions'] == self.group_by:
+            # Rows of the rollup are already one per group; cutting and filtering keeps it so
+            totals = source
+        else:
+            totals = self._grouped(source, days)
+        return self._metrics(totals), plan
+
+    def _select(self, snapshot) -> Tuple[pd.DataFrame, Dict, str]:
+        """Rows of the planned source in the date range that pass the filters, and the day column"""
+        plan = self.plan(snapshot)
+        source = plan.pop('frame')
+        days = 'date' if plan['source'] == 'rollup' else 'sale_date'
+        if source.empty:
+            return source, plan, days
+        if plan['source'] == 'rollup':
+            source = self._in_range(source, sorted_by_day=plan['dimensions'][:1] == ['date'])
+        return self._filtered(source, days), plan, days
+
+    @timed('filter')
+    def _in_range(self, frame: pd.DataFrame, sorted_by_day: bool) -> pd.DataFrame:
+        if self.start is None and self.end is None:
+            return frame
+        values = frame['date']
+        if sorted_by_day:
+            lo = values.searchsorted(self.start, side='left') if self.start is not None else 0
+            hi = values.searchsorted(self.end, side='right') if self.end is not None else len(frame)
+            return frame.iloc[lo:hi]
+        mask = pd.Series(True, index=frame.index)
+        if self.start is not None:
+            mask &= values >= self.start
+        if self.end is not None:
+            mask &= values <= self.end
+        return frame[mask]
+
+    @timed('filter')
+    def _filtered(self, frame: pd.DataFrame, days: str) -> pd.DataFrame:
+        for dim, values in self.filters.items():
+            column = time_part(frame[days], dim) if dim in TIME_PARTS else frame[dim]
+            if dim in NUMERIC_DIMENSIONS:
+                try:
+                    values = [int(value) for value in values]
+                except (TypeError, ValueError):
+                    raise ValueError(f"Filter values for '{dim}' must be integers")
+            elif dim == 'date':
+                try:
+                    values = pd.to_datetime(values, format='ISO8601').normalize()
+                except (TypeError, ValueError):
+                    raise ValueError("Filter values for 'date' must be dates (YYYY-MM-DD)")
+            frame = frame[column.isin(values).to_numpy()]
+        return frame
+
+    @timed('aggregate')
+    def _grouped(self, frame: pd.DataFrame, days: str) -> pd.DataFrame:
+        # Rollup rows carry their sale count, raw sales rows count one each
+        measures = frame[MEASURES].assign(**{COUNT: frame[COUNT] if COUNT in frame.columns else 1})
+        if not self.group_by:
+            return pd.DataFrame({column: [measures[column].sum()] for column in measures.columns})
+
+        keys = [time_part(frame[days], dim) if dim in TIME_PARTS else frame[dim] for dim in self.group_by]
+        grouped = measures.groupby(keys, sort=True, observed=True, dropna=False)
+        return grouped[MEASURES + [COUNT]].sum().reset_index()
+
+    def _metrics(self, totals: pd.DataFrame) -> pd.DataFrame:
+        result = totals[self.group_by].copy()
+        for aggregate, measure, name in self.metrics:
+            if aggregate == 'sum':
+                result[name] = totals[measure]
+            elif aggregate == 'mean':
+                result[name] = totals[measure] / totals[COUNT]
+            elif aggregate == 'count':
+                result[name] = totals[COUNT]
+            else:
+                result[name] = totals['total_profit'] / totals['total_cost'] * 100
+
+        if self.sort is not None:
+            result = result.sort_values(self.sort, ascending=not self.descending)
+        if self.limit is not None:
+            result = result.head(self.limit)
+        return result
+
+
+class TimeSeriesQuery(AnalyticsQuery):
+    """Metrics per hour, day, ISO week, month or quarter over a date range.
+
+    Only the pre-aggregates (or, with filters on product attributes, the
+    sales rows) inside the range are read: the daily rollup and the base
+    cuboid are sorted by day, so the range is a binary-searched slice and
+    the cost follows the window, not the history. Periods without sales
+    get zero sums and counts while the grouped rows are laid onto the
+    full calendar of the range; their means and margins stay null.
+    """
+
+    def __init__(self, granularity: str = 'day', metrics: Sequence[str] = (),
+                 filters: Optional[Dict[str, Sequence]] = None, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}' (use one of {', '.join(GRANULARITIES)})")
+        super().__init__([], metrics, filters, start_date, end_date)
+        self.granularity = granularity
+
+    def columns_needed(self) -> List[str]:
+        stamps = ['date', 'hour'] if self.granularity == 'hour' else ['date']
+        return list(dict.fromkeys(stamps + super().columns_needed()))
+
+    def execute(self, snapshot) -> Tuple[pd.DataFrame, Dict]:
+        timestamps = snapshot.sales_index.timestamps
+        if len(timestamps) == 0 and (self.start is None or self.end is None):
+            return pd.DataFrame(columns=['period', 'start'] + [name for _, _, name in self.metrics]), \
+                {'source': 'rollup', 'dimensions': [], 'rows': 0}
+
+        # An open end of the range stops at the first or last sale
+        first = self.start if self.start is not None else pd.Timestamp(timestamps[0]).normalize()
+        last = self.end if self.end is not None else pd.Timestamp(timestamps[-1]).normalize()
+        if last < first:
+            raise ValueError("end must not be before start")
+        calendar = self._calendar(first, last)
+        if len(calendar) > MAX_PERIODS:
+            raise ValueError(f"Too many {self.granularity} periods ({len(calendar)}), narrow the range")
+
+        source, plan, days = self._select(snapshot)
+        totals = self._bucketed(source, days, plan['source'] == 'rollup', calendar)
+        result = self._metrics(totals)
+        result.insert(0, 'period', self._labels(calendar))
+        result.insert(1, 'start', calendar.strftime('%Y-%m-%dT%H:%M:%S' if self.granularity == 'hour' else '%Y-%m-%d'))
+        return result.reset_index(drop=True), plan
+
+    def _floor(self, stamps: np.ndarray) -> np.ndarray:
+        """Start of the period each datetime64 value falls in"""
+        if self.granularity == 'hour':
+            floored = stamps.astype('datetime64[h]')
+        elif self.granularity == 'day':
+            floored = stamps.astype('datetime64[D]')
+        elif self.granularity == 'week':
+            days = stamps.astype('datetime64[D]')
+            # 1970-01-01 was a Thursday: (days + 3) % 7 counts days since Monday
+            floored = days - (days.astype('int64') + 3) % 7
+        else:
+            months = stamps.astype('datetime64[M]')
+            if self.granularity == 'quarter':
+                months = months - months.astype('int64') % 3
+            floored = months
+        return floored.astype('datetime64[ns]')
+
+    def _calendar(self, first: pd.Timestamp, last: pd.Timestamp) -> pd.DatetimeIndex:
+        if self.granularity == 'hour':
+            # The range is in days: the last day runs up to its 23:00 hour
+            last = last + pd.Timedelta(hours=23)
+        start, end = self._floor(np.array([first.to_datetime64(), last.to_datetime64()]))
+        if self.granularity in ('month', 'quarter'):
+            return pd.date_range(start, end, freq='MS' if self.granularity == 'month' else 'QS')
+        step = {'hour': pd.Timedelta(hours=1), 'day': pd.Timedelta(days=1), 'week': pd.Timedelta(days=7)}
+        return pd.date_range(start, end, freq=step[self.granularity])
+
+    @timed('aggregate')
+    def _bucketed(self, frame: pd.DataFrame, days: str, rollup: bool, calendar: pd.DatetimeIndex) -> pd.DataFrame:
+        """Summed measures per period of the calendar, zero where nothing sold"""
+        columns = MEASURES + [COUNT]
+        # Counts stay integers whatever the source rows were stored as
+        dtypes = {column: np.int64 if column in COUNTED else np.float64 for column in columns}
+        if frame.empty:
+            return pd.DataFrame(0, index=calendar, columns=columns).astype(dtypes)
+
+        stamps = frame[days].to_numpy()
+        if rollup and self.granularity == 'hour':
+            stamps = stamps + frame['hour'].to_numpy().astype('timedelta64[h]')
+        measures = frame[MEASURES].assign(**{COUNT: frame[COUNT] if COUNT in frame.columns else 1})
+        totals = measures.groupby(self._floor(stamps), sort=True)[columns].sum()
+        return totals.reindex(calendar, fill_value=0).astype(dtypes)
+
+    def _labels(self, calendar: pd.DatetimeIndex) -> pd.Index:
+        if self.granularity == 'hour':
+            return calendar.strftime('%Y-%m-%d %H:00')
+        if self.granularity == 'day':
+            return calendar.strftime('%Y-%m-%d')
+        if self.granularity == 'month':
+            return calendar.strftime('%Y-%m')
+        if self.granularity == 'quarter':
+            return pd.Index([f'{stamp.year}-Q{stamp.quarter}' for stamp in calendar])
+        iso = calendar.isocalendar()
+        return pd.Index([f'{year}-W{week:02d}' for year, week in zip(iso['year'], iso['week'])])
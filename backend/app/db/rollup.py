@@ -0,0 +1,115 @@
+import heapq
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Tuple
+from app.utils.metrics import timed
+
+# Grain of the cube: one row per (date, hour, brand, gpu, cpu, product) combination.
+# A product fixes its brand/gpu/cpu, so product_name barely grows the cube.
+DIMENSIONS = ['date', 'hour', 'brand', 'gpu', 'cpu', 'product_name']
+# Additive measures stored as sums; profit_margin is summed so means can be derived
+MEASURES = ['total_amount', 'total_cost', 'total_profit', 'quantity', 'profit_margin']
+COUNT = 'sales_count'
+# Per-day rollups kept up to date alongside the single-dimension ones, for rankings over a window
+WINDOWED = [('date', 'product_name')]
+# Views built with every cube and merged on ingest
+EAGER_VIEWS = [(dim,) for dim in DIMENSIONS] + WINDOWED
+
+
+class RollupCube:
+    """Pre-aggregated sales measures over date x hour x brand x gpu x cpu x product.
+
+    The base cuboid is built once per load; single-dimension rollups and
+    the per-day WINDOWED rollups are materialized eagerly and any other
+    combination is computed from the base cuboid on first use. The data
+    never changes after construction: ``merge`` returns a new cube, so
+    readers holding the old one are unaffected. The only mutable state is
+    the view memo: an append-only cache that readers on any thread may add
+    to, but whose entries are never dropped or replaced.
+    """
+
+    def __init__(self, base: pd.DataFrame, views: Dict[Tuple[str, ...], pd.DataFrame] = None):
+        self.base = base
+        self._views: Dict[Tuple[str, ...], pd.DataFrame] = dict(views or {})
+
+    @classmethod
+    def from_sales(cls, df: pd.DataFrame) -> 'RollupCube':
+        """Build the cube from a raw sales DataFrame"""
+        cube = cls(cls._aggregate(df, DIMENSIONS))
+        for dims in EAGER_VIEWS:
+            cube.rollup(*dims)
+        return cube
+
+    @property
+    def empty(self) -> bool:
+        return self.base.empty
+
+    @timed('aggregate')
+    def rollup(self, *dims: str) -> pd.DataFrame:
+        """Get measures grouped by the given dimensions (shared, do not mutate)"""
+        key = tuple(dims)
+        view = self._views.get(key)
+        if view is None:
+            # Two threads racing to build a view both return the first one stored
+            view = self._views.setdefault(key, self._aggregate(self.base, list(key), summed=True))
+        return view
+
+    def covering(self, dims: List[str]) -> Tuple[Tuple[str, ...], pd.DataFrame]:
+        """Smallest materialized rollup grouping by at least dims (the base cuboid if none is)"""
+        wanted = set(dims)
+        candidates = [(len(view), len(key), key, view)
+                      for key, view in list(self._views.items()) if wanted <= set(key)]
+        if not candidates:
+            return tuple(DIMENSIONS), self.base
+        _, _, key, view = min(candidates, key=lambda candidate: candidate[:2])
+        return key, view
+
+    @timed('aggregate')
+    def top(self, dim: str, measure: str, k: int, start=None, end=None) -> pd.DataFrame:
+        """The k values of dim with the largest summed measure, optionally between two dates (inclusive)"""
+        if start is None and end is None:
+            summed = self.rollup(dim)
+        else:
+            # The per-day rollup is sorted by date, so the window is a contiguous slice
+            daily = self.rollup('date', dim)
+            dates = daily['date'].to_numpy()
+            first = np.searchsorted(dates, np.datetime64(start), 'left') if start is not None else 0
+            last = np.searchsorted(dates, np.datetime64(end), 'right') if end is not None else len(dates)
+            summed = self._aggregate(daily.iloc[first:last], [dim], summed=True)
+
+        values = summed[measure].to_numpy()
+        ranked = heapq.nlargest(k, range(len(values)), key=values.__getitem__)
+        return summed.iloc[ranked]
+
+    def merge(self, new_sales: pd.DataFrame) -> 'RollupCube':
+        """Return a new cube with the given sales rows folded in"""
+        if new_sales.empty:
+            return self
+        delta = self.from_sales(new_sales)
+        base = self._combine(self.base, delta.base, DIMENSIONS)
+        views = {
+            key: self._combine(view, delta.rollup(*key), list(key))
+            for key, view in self._views.items()
+        }
+        return RollupCube(base, views)
+
+    @staticmethod
+    def _aggregate(df: pd.DataFrame, dims: List[str], summed: bool = False) -> pd.DataFrame:
+        if df.empty:
+            return pd.DataFrame(columns=dims + MEASURES + [COUNT])
+
+        grouped = df.groupby(dims, sort=True, observed=True, dropna=False)
+        if summed:
+            # Re-aggregating a cuboid: the count column is itself additive
+            return grouped[MEASURES + [COUNT]].sum().reset_index()
+
+        aggregations = {measure: (measure, 'sum') for measure in MEASURES}
+        aggregations[COUNT] = ('quantity', 'size')
+        return grouped.agg(**aggregations).reset_index()
+
+    @staticmethod
+    def _combine(left: pd.DataFrame, right: pd.DataFrame, dims: List[str]) -> pd.DataFrame:
+        if left.empty:
+            return right
+        combined = pd.concat([left, right], ignore_index=True)
+        return combined.groupby(dims, sort=True, observed=True, dropna=False)[MEASURES + [COUNT]].sum().reset_index()
@@ -0,0 +1,331 @@
+import csv
+import fcntl
+import io
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconds the commit leader waits for more writers to join its batch (0: commit at once)
+COMMIT_DELAY = float(os.getenv('SALES_LOG_COMMIT_DELAY_MS', '0')) / 1000
+
+# First line of the log, naming its epoch: a new one is started every time the log is emptied
+EPOCH_KEY = '__log_epoch__'
+
+# Where a reader is in the log: (epoch, byte offset); START has read nothing yet
+Position = Tuple[Optional[str], int]
+START: Position = (None, 0)
+
+
+class _Pending:
+    __slots__ = ('data', 'done', 'error')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.done = False
+        self.error: Optional[Exception] = None
+
+
+class SalesLog:
+    """Append-only write-ahead log of recorded sales with group commit.
+
+    Each record is one JSON line. Writers that arrive while a commit is in
+    flight queue up behind it; the next writer to run becomes the leader and
+    writes the whole queue with a single fsync, so the cost of a sync is
+    shared by every concurrent writer. ``on_commit`` is called once a batch
+    is durable; readers follow the log with ``read_from``. Writes, reads and
+    compaction take an flock on the log, so several processes can share it.
+
+    Compaction appends the logged sales to the sales CSV and empties the log.
+    A small checkpoint file written first lets ``recover`` finish or undo a
+    compaction interrupted by a crash, so no sale is lost or duplicated.
+    Emptying the log starts a new epoch, recorded in its first line, so a
+    reader in another process can tell its byte offset no longer applies
+    even after the log has grown past it again. Only the process holding
+    ``acquire_compactor`` should compact.
+    """
+
+    def __init__(self, path: str, on_commit: Callable[[], None] = None,
+                 commit_delay: float = COMMIT_DELAY):
+        self.path = path
+        self.checkpoint_path = path + '.checkpoint'
+        self.on_commit = on_commit
+        self.commit_delay = commit_delay
+        self._cond = threading.Condition()
+        self._queue: List[_Pending] = []
+        self._busy = False
+        self._exclusive_owner: Optional[int] = None
+        self._file = None
+        # Cross-process lock: flock on a side file, shared by the threads of this process
+        self._lock_file = None
+        self._lock_depth = 0
+        self._lock_guard = threading.Lock()
+        self._compactor_file = None
+        self.batches = 0
+        self.records = 0
+
+    def append(self, records: List[Dict]):
+        """Durably log records; returns once they are fsynced"""
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        entry = _Pending(data.encode('utf-8'))
+        with self._cond:
+            self._queue.append(entry)
+            while not entry.done:
+                if self._busy:
+                    self._cond.wait()
+                    continue
+
+                # Become the leader and commit everything queued so far
+                self._busy = True
+                if self.commit_delay:
+                    self._cond.wait(self.commit_delay)
+                batch, self._queue = self._queue, []
+                self._cond.release()
+                try:
+                    error = None
+                    self._commit(batch)
+                except Exception as e:
+                    error = e
+                finally:
+                    self._cond.acquire()
+                for pending in batch:
+                    pending.done = True
+                    pending.error = error
+                self._busy = False
+                self._cond.notify_all()
+
+        if entry.error is not None:
+            raise entry.error
+
+    def _commit(self, batch: List[_Pending]):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        with self.locked():
+            start = self._file.seek(0, os.SEEK_END)
+            try:
+                header = self._epoch_line() if start == 0 else b''
+                self._file.write(header + b''.join(pending.data for pending in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception:
+                # Never leave half a batch behind for the next one to append to
+                self._file.truncate(start)
+                raise
+        self.batches += 1
+        self.records += sum(pending.data.count(b'\n') for pending in batch)
+
+        if self.on_commit is not None:
+            self.on_commit()
+
+    @contextmanager
+    def locked(self, mode: int = fcntl.LOCK_EX):
+        """Hold the log's flock against other processes (re-entrant within this one)"""
+        with self._lock_guard:
+            if self._lock_depth == 0:
+                if self._lock_file is None:
+                    self._lock_file = open(self.path + '.lock', 'a')
+                fcntl.flock(self._lock_file.fileno(), mode)
+            self._lock_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock_guard:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def exclusive(self):
+        """Hold off commits from this and other processes (e.g. while compacting; re-entrant)"""
+        if self._exclusive_owner == threading.get_ident():
+            yield
+            return
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+            self._busy = True
+            self._exclusive_owner = threading.get_ident()
+        try:
+            with self.locked():
+                yield
+        finally:
+            with self._cond:
+                self._exclusive_owner = None
+                self._busy = False
+                self._cond.notify_all()
+
+    def acquire_compactor(self) -> bool:
+        """Try to become the one process compacting this log; held until the process exits"""
+        if self._compactor_file is None:
+            lock_file = open(self.path + '.compactor', 'a')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._compactor_file = lock_file
+        return True
+
+    def read(self) -> List[Dict]:
+        """All records currently in the log"""
+        return self.read_from(START)[0]
+
+    def read_from(self, position: Position = START) -> Tuple[Optional[List[Dict]], Position]:
+        """Complete records after a position and the position to continue from.
+
+        Returns (None, START) when the log was emptied since the position was
+        taken (its epoch changed), e.g. compacted by another process; those
+        records are in the CSV now and the caller has to reload.
+        """
+        epoch, offset = position
+        with self.locked(fcntl.LOCK_SH):
+            if not os.path.exists(self.path):
+                return ([], START) if offset == 0 else (None, START)
+            with open(self.path, 'rb') as f:
+                current, body = self._read_epoch(f)
+                size = os.fstat(f.fileno()).st_size
+                if offset and (epoch != current or size < offset):
+                    return None, START
+                offset = max(offset, body)
+                f.seek(offset)
+                data = f.read(size - offset)
+        end = data.rfind(b'\n') + 1
+        records = [json.loads(line) for line in data[:end].splitlines()]
+        return records, (current, offset + end)
+
+    def position(self) -> Position:
+        """Position of the end of the log, as of now"""
+        return self.read_from(START)[1]
+
+    def size(self) -> int:
+        """Bytes of records in the log (its epoch line not counted)"""
+        try:
+            with open(self.path, 'rb') as f:
+                return os.fstat(f.fileno()).st_size - self._read_epoch(f)[1]
+        except OSError:
+            return 0
+
+    def recover(self, csv_path: str):
+        """Finish or roll back an interrupted compaction and drop a torn last record (hold ``exclusive``)"""
+        with self.locked():
+            self._recover(csv_path)
+
+    def _recover(self, csv_path: str):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            csv_size = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+            if checkpoint.get('epoch', self._epoch()) != self._epoch():
+                # The log was emptied before the crash; what it holds now came later
+                pass
+            elif csv_size == checkpoint['csv_size_after']:
+                # The CSV has every logged sale; only emptying the log was lost
+                self._reset()
+            else:
+                with open(csv_path, 'ab') as f:
+                    f.truncate(checkpoint['csv_size_before'])
+                    os.fsync(f.fileno())
+            os.remove(self.checkpoint_path)
+
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                # Empty, or emptied without its epoch line being written
+                self._reset()
+            elif end != len(data):
+                self._truncate(end)
+
+    def compact_into(self, csv_path: str) -> int:
+        """Append logged sales to the CSV and empty the log (hold ``exclusive``)"""
+        with self.locked():
+            return self._compact_into(csv_path)
+
+    def _compact_into(self, csv_path: str) -> int:
+        records = self.read()
+        if not records:
+            return 0
+
+        header = None
+        if os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+            with open(csv_path, newline='') as f:
+                header = next(csv.reader(f))
+        columns = header or list(records[0].keys())
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if header is None:
+            writer.writerow(columns)
+        writer.writerows([record.get(column, '') for column in columns] for record in records)
+        data = buffer.getvalue().encode('utf-8')
+
+        size_before = os.path.getsize(csv_path) if os.path.exists(csv_path) else 0
+        if size_before and not self._ends_with_newline(csv_path):
+            data = b'\n' + data
+        self._write_checkpoint({'csv_size_before': size_before, 'csv_size_after': size_before + len(data),
+                                'epoch': self._epoch()})
+
+        with open(csv_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._reset()
+        os.remove(self.checkpoint_path)
+        return len(records)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _truncate(self, size: int):
+        self.close()
+        with open(self.path, 'ab') as f:
+            f.truncate(size)
+            os.fsync(f.fileno())
+
+    def _reset(self):
+        """Empty the log in place and start a new epoch (writers elsewhere keep appending to it)"""
+        self._truncate(0)
+        with open(self.path, 'ab') as f:
+            f.write(self._epoch_line())
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _epoch_line() -> bytes:
+        return (json.dumps({EPOCH_KEY: uuid.uuid4().hex}) + '\n').encode('utf-8')
+
+    def _epoch(self) -> Optional[str]:
+        """Epoch of the log file (None if there is no log)"""
+        try:
+            with open(self.path, 'rb') as f:
+                return self._read_epoch(f)[0]
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read_epoch(f) -> Tuple[str, int]:
+        """(epoch, bytes of the epoch line) of an open log; ('', 0) for a log without one"""
+        f.seek(0)
+        line = f.readline()
+        if line.endswith(b'\n') and line.startswith(b'{"' + EPOCH_KEY.encode()):
+            return json.loads(line)[EPOCH_KEY], len(line)
+        return '', 0
+
+    def _write_checkpoint(self, checkpoint: Dict):
+        staging = self.checkpoint_path + '.tmp'
+        with open(staging, 'w') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, self.checkpoint_path)
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
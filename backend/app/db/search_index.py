@@ -0,0 +1,127 @@
+import re
+import bisect
+import pandas as pd
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from app.utils.metrics import timed
+
+# Searchable fields and how much a hit in each one is worth when ranking
+SEARCH_FIELDS = {'brand': 3.0, 'gpu': 2.0, 'cpu': 2.0, 'product_name': 1.0}
+
+# Relative weight of a full-token, token-prefix and in-token substring match
+EXACT, PREFIX, SUBSTRING = 1.0, 0.75, 0.5
+
+NGRAM = 3
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def ngrams(term: str, size: int = NGRAM) -> Set[str]:
+    return {term[i:i + size] for i in range(len(term) - size + 1)}
+
+
+class ProductSearchIndex:
+    """Inverted index over the product catalogue.
+
+    Each token maps to the products containing it (with the best field
+    weight), a sorted vocabulary answers prefix lookups by bisection and a
+    trigram -> term index answers in-token substring lookups. Substrings
+    shorter than a trigram are indexed whole, so a one or two character
+    token ("i7") still matches inside longer terms. A query is
+    split into tokens that must all match (AND); results are ranked by
+    summed match weight. Lookups only touch the postings of matching terms,
+    never the catalogue itself.
+    """
+
+    def __init__(self, postings: Dict[str, Dict[int, float]], names: Dict[str, int]):
+        self._postings = postings
+        self._names = names
+        self._vocabulary = sorted(postings)
+        self._ngrams: Dict[str, Set[str]] = defaultdict(set)
+        for term in self._vocabulary:
+            for size in range(1, NGRAM + 1):
+                for gram in ngrams(term, size):
+                    self._ngrams[gram].add(term)
+
+    @classmethod
+    def from_products(cls, products: pd.DataFrame) -> 'ProductSearchIndex':
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        names: Dict[str, int] = {}
+        if products.empty:
+            return cls(postings, names)
+
+        for field, weight in SEARCH_FIELDS.items():
+            if field not in products.columns:
+                continue
+            # Tokenize each distinct value once, then fan out to its rows
+            codes, uniques = pd.factorize(products[field])
+            rows_by_code = pd.Series(range(len(codes))).groupby(codes).groups
+            for code, rows in rows_by_code.items():
+                if code < 0:
+                    continue
+                for token in set(tokenize(uniques[code])):
+                    posting = postings[token]
+                    for row in rows:
+                        if posting.get(row, 0.0) < weight:
+                            posting[row] = weight
+
+        if 'product_name' in products.columns:
+            for row, name in enumerate(products['product_name']):
+                if isinstance(name, str):
+                    names.setdefault(name.strip().lower(), row)
+
+        return cls(postings, names)
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Row of the product with exactly this name (case-insensitive)"""
+        return self._names.get(name.strip().lower())
+
+    @timed('filter')
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Rows matching every token of the query, best matches first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        # Resolve the most selective token first and stop as soon as nothing is left
+        matches = sorted((self._match(token) for token in tokens), key=len)
+        scores = dict(matches[0])
+        for match in matches[1:]:
+            scores = {row: score + match[row] for row, score in scores.items() if row in match}
+            if not scores:
+                return []
+
+        ranked = sorted(scores, key=lambda row: (-scores[row], row))
+        return ranked[:limit] if limit else ranked
+
+    def _match(self, token: str) -> Dict[int, float]:
+        """Rows matching one query token, with their best weighted score"""
+        scores: Dict[int, float] = {}
+
+        def collect(term: str, kind: float):
+            for row, weight in self._postings[term].items():
+                score = weight * kind
+                if scores.get(row, 0.0) < score:
+                    scores[row] = score
+
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            collect(term, EXACT if term == token else PREFIX)
+
+        if len(token) >= NGRAM:
+            grams = sorted((self._ngrams.get(gram, set()) for gram in ngrams(token)), key=len)
+            candidates = set.intersection(*grams) if grams else set()
+        else:
+            candidates = self._ngrams.get(token, set())
+        for term in candidates:
+            if token in term and not term.startswith(token):
+                collect(term, SUBSTRING)
+
+        return scores
@@ -0,0 +1,179 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+from app.db.prefix_sums import PrefixSums
+from app.db.rollup import EAGER_VIEWS, RollupCube
+from app.db.sketches import SalesSketches
+from app.db.snapshot import Snapshot
+from app.utils.columnar_cache import read_columns, write_columns
+
+STORE_FORMAT = 3
+CURRENT = 'CURRENT'
+MANIFEST = 'manifest.json'
+# Generations kept on disk: the current one and the one workers may still be attaching to
+KEEP_GENERATIONS = 2
+
+
+class SharedStore:
+    """Snapshots published as memory-mapped column files for sibling worker processes.
+
+    One process (the loader, elected with an flock) builds snapshots as
+    usual and writes each one to a new generation directory, then points
+    ``CURRENT`` at it with an atomic rename. Every other worker maps the
+    columns of the current generation read-only, so the page cache holds a
+    single copy of the dataset however many workers there are. Workers
+    poll ``CURRENT`` and re-attach when it moves; files of a retired
+    generation stay valid for as long as someone still maps them. Derived
+    structures that depend on the whole history (rollup cube, sketches)
+    are stored too, so attaching never rebuilds them.
+
+    Generations are complete and immutable: publishing costs I/O in
+    proportion to the whole dataset, however few rows changed, so callers
+    should publish at a bounded rate rather than on every new version.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock_file = None
+
+    def acquire_loader(self) -> bool:
+        """Try to become the loader process; the role is held until exit"""
+        if self._lock_file is not None:
+            return True
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, 'loader.lock'), 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    @property
+    def is_loader(self) -> bool:
+        return self._lock_file is not None
+
+    def current(self) -> Optional[str]:
+        """Name of the generation workers should be attached to"""
+        try:
+            with open(os.path.join(self.root, CURRENT)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def last_version(self) -> int:
+        """Data version of the current generation (0 if there is none)"""
+        generation = self.current()
+        if generation is None:
+            return 0
+        try:
+            with open(os.path.join(self.root, generation, MANIFEST)) as f:
+                return json.load(f)['version']
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def publish(self, snapshot: Snapshot) -> str:
+        """Write all of the snapshot's tables as a new generation and make it current"""
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            tables = {}
+            for name, df in self._tables(snapshot).items():
+                directory = os.path.join(staging, name)
+                os.mkdir(directory)
+                tables[name] = {'rows': len(df), 'columns': write_columns(directory, df)}
+            manifest = {'format': STORE_FORMAT, 'version': snapshot.version, 'tables': tables,
+                        'params': self._params(snapshot)}
+            with open(os.path.join(staging, MANIFEST), 'w') as f:
+                json.dump(manifest, f)
+
+            generation = f'gen-{time.time_ns()}-v{snapshot.version}'
+            os.replace(staging, os.path.join(self.root, generation))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer = os.path.join(self.root, CURRENT + '.tmp')
+        with open(pointer, 'w') as f:
+            f.write(generation)
+        os.replace(pointer, os.path.join(self.root, CURRENT))
+        self._remove_old(generation)
+        return generation
+
+    def attach(self, generation: str) -> Snapshot:
+        """Snapshot backed by the memory-mapped columns of a generation"""
+        directory = os.path.join(self.root, generation)
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != STORE_FORMAT:
+            raise ValueError(f"unsupported shared store format in {directory}")
+
+        tables = {
+            name: read_columns(os.path.join(directory, name), table['columns'], table['rows'])
+            for name, table in manifest['tables'].items()
+        }
+        params = manifest['params']
+        views = {tuple(key.split('.')): view for key, view in _group(tables, 'sales_cube').items()}
+        if params['totals_origin'] is None:
+            totals = PrefixSums.empty()
+        else:
+            totals = PrefixSums(np.datetime64(params['totals_origin']),
+                                _columns(tables['sales_totals.hourly']), _columns(tables['sales_totals.daily']))
+        sketches = SalesSketches(_group(tables, 'sales_sketches.quantiles'), _group(tables, 'sales_sketches.distinct'),
+                                 params['sketch_accuracy'], params['sketch_precision'])
+        # Rows were stored already sorted, so the snapshot keeps the mapped arrays
+        return Snapshot(tables['products'], tables['sales'], version=manifest['version'],
+                        sales_cube=RollupCube(tables['sales_cube'], views), sales_totals=totals,
+                        sales_sketches=sketches, sales_sorted=True)
+
+    @staticmethod
+    def _tables(snapshot: Snapshot) -> Dict:
+        tables = {
+            'products': snapshot.products,
+            'sales': snapshot.sales,
+            'sales_cube': snapshot.sales_cube.base,
+        }
+        for dims in EAGER_VIEWS:
+            tables['sales_cube.' + '.'.join(dims)] = snapshot.sales_cube.rollup(*dims)
+        totals = snapshot.sales_totals
+        if totals.origin is not None:
+            tables['sales_totals.hourly'] = pd.DataFrame(totals.hourly)
+            tables['sales_totals.daily'] = pd.DataFrame(totals.daily)
+        sketches = snapshot.sales_sketches
+        for measure, table in sketches.quantiles.items():
+            tables[f'sales_sketches.quantiles.{measure}'] = table
+        for dim, table in sketches.distinct.items():
+            tables[f'sales_sketches.distinct.{dim}'] = table
+        return tables
+
+    @staticmethod
+    def _params(snapshot: Snapshot) -> Dict:
+        """Scalars needed to rebuild the derived structures around their tables"""
+        origin = snapshot.sales_totals.origin
+        return {
+            'totals_origin': None if origin is None else str(origin),
+            'sketch_accuracy': snapshot.sales_sketches.accuracy,
+            'sketch_precision': snapshot.sales_sketches.precision,
+        }
+
+    def _remove_old(self, current: str):
+        generations = sorted(name for name in os.listdir(self.root) if name.startswith('gen-'))
+        for name in generations:
+            if name != current and name not in generations[-KEEP_GENERATIONS:]:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+def _group(tables: Dict[str, pd.DataFrame], prefix: str) -> Dict[str, pd.DataFrame]:
+    """Tables stored under prefix.<key>, by key"""
+    return {name[len(prefix) + 1:]: table for name, table in tables.items() if name.startswith(prefix + '.')}
+
+
+def _columns(table: pd.DataFrame) -> Dict[str, np.ndarray]:
+    return {name: table[name].to_numpy() for name in table.columns}
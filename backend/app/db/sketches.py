@@ -0,0 +1,218 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from app.utils.metrics import timed
+
+# Relative accuracy of quantile estimates (0.01: within 1% of a true sample value)
+QUANTILE_ACCURACY = float(os.getenv('SKETCH_QUANTILE_ACCURACY', '0.01'))
+# HyperLogLog precision: 2**p registers per distinct-count sketch
+HLL_PRECISION = int(os.getenv('SKETCH_HLL_PRECISION', '12'))
+
+# Grain of the sketches: one quantile and one distinct-count sketch per (brand, date)
+KEYS = ['brand', 'date']
+QUANTILE_MEASURES = ['total_amount', 'profit_margin']
+DISTINCT_DIMENSIONS = ['product_name']
+
+# Magnitudes below this fall in the zero bucket
+MIN_MAGNITUDE = 1e-9
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Number of significant bits of each uint64 (0 for 0)"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= np.uint64(1 << shift)
+        length[big] += shift
+        values[big] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def _flatten(grouped: pd.Series) -> pd.DataFrame:
+    """Grouped sketch table with plain string brands, so tables from different loads combine"""
+    table = grouped.reset_index()
+    table['brand'] = table['brand'].astype(str)
+    return table
+
+
+def _brand_ranges(table: pd.DataFrame) -> Dict[str, Tuple[int, int]]:
+    """Row range of each brand in a table sorted by brand"""
+    names = table['brand'].to_numpy()
+    if not len(names):
+        return {}
+    starts = np.concatenate([[0], np.flatnonzero(names[1:] != names[:-1]) + 1])
+    ends = np.append(starts[1:], len(names))
+    return {names[start]: (int(start), int(end)) for start, end in zip(starts, ends)}
+
+
+def _hash(values: pd.Series) -> np.ndarray:
+    """Stable 64-bit hashes; each distinct value is hashed once"""
+    codes, uniques = pd.factorize(values)
+    hashes = np.array([int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'little')
+                       for value in uniques], dtype=np.uint64)
+    return hashes[codes]
+
+
+class SalesSketches:
+    """Mergeable sketches of the sales per (brand, date).
+
+    Quantiles use a log-bucketed histogram (DDSketch): a value x > 0 is
+    counted in bucket ceil(log_gamma(x)) with gamma = (1 + a) / (1 - a), so
+    any quantile is answered to within a relative error a of a true sample
+    value; negatives mirror positives and tiny magnitudes count as zero.
+    Distinct counts use HyperLogLog with 2**p registers (standard error
+    about 1.04 / sqrt(2**p)). Both are kept as long tables sorted by brand
+    and date, so a brand's date window is a contiguous slice found by
+    binary search, and they merge by summing counts or taking register
+    maxima. Their size, and the cost of an answer, depends on the number
+    of buckets in use, never on the number of sales. Instances are never
+    mutated: ``merge`` returns new sketches.
+    """
+
+    def __init__(self, quantiles: Dict[str, pd.DataFrame], distinct: Dict[str, pd.DataFrame],
+                 accuracy: float = QUANTILE_ACCURACY, precision: int = HLL_PRECISION):
+        self.quantiles = quantiles
+        self.distinct = distinct
+        self.accuracy = accuracy
+        self.precision = precision
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._brands = {name: _brand_ranges(table) for name, table in {**quantiles, **distinct}.items()}
+
+    @classmethod
+    def from_sales(cls, df: pd.DataFrame, accuracy: float = QUANTILE_ACCURACY,
+                   precision: int = HLL_PRECISION) -> 'SalesSketches':
+        """Build sketches from a raw sales DataFrame"""
+        gamma = (1 + accuracy) / (1 - accuracy)
+        quantiles = {measure: cls._bucket(df, measure, gamma) for measure in QUANTILE_MEASURES}
+        distinct = {dim: cls._registers(df, dim, precision) for dim in DISTINCT_DIMENSIONS}
+        return cls(quantiles, distinct, accuracy, precision)
+
+    @staticmethod
+    def _bucket(df: pd.DataFrame, measure: str, gamma: float) -> pd.DataFrame:
+        if df.empty:
+            return pd.DataFrame(columns=KEYS + ['sign', 'bucket', 'count'])
+        values = df[measure].to_numpy(dtype=np.float64)
+        magnitude = np.abs(values)
+        sign = np.where(magnitude < MIN_MAGNITUDE, 0, np.sign(values)).astype(np.int8)
+        with np.errstate(divide='ignore'):
+            bucket = np.ceil(np.log(magnitude) / np.log(gamma))
+        bucket = np.where(sign == 0, 0, bucket).astype(np.int32)
+        counted = pd.DataFrame({'brand': df['brand'].to_numpy(), 'date': df['date'].to_numpy(),
+                                'sign': sign, 'bucket': bucket})
+        return _flatten(counted.groupby(KEYS + ['sign', 'bucket'], sort=True, observed=True).size().rename('count'))
+
+    @staticmethod
+    def _registers(df: pd.DataFrame, dim: str, precision: int) -> pd.DataFrame:
+        if df.empty:
+            return pd.DataFrame(columns=KEYS + ['register', 'rank'])
+        hashes = _hash(df[dim])
+        tail_bits = 64 - precision
+        register = (hashes >> np.uint64(tail_bits)).astype(np.int32)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        # Position of the first 1 bit after the register bits
+        rank = (tail_bits - _bit_length(tail) + 1).astype(np.int8)
+        counted = pd.DataFrame({'brand': df['brand'].to_numpy(), 'date': df['date'].to_numpy(),
+                                'register': register, 'rank': rank})
+        return _flatten(counted.groupby(KEYS + ['register'], sort=True, observed=True)['rank'].max())
+
+    def merge(self, new_sales: pd.DataFrame) -> 'SalesSketches':
+        """Return new sketches with the given sales rows folded in"""
+        if new_sales.empty:
+            return self
+        delta = self.from_sales(new_sales, self.accuracy, self.precision)
+        quantiles = {
+            measure: self._combine(table, delta.quantiles[measure], KEYS + ['sign', 'bucket'], 'count', 'sum')
+            for measure, table in self.quantiles.items()
+        }
+        distinct = {
+            dim: self._combine(table, delta.distinct[dim], KEYS + ['register'], 'rank', 'max')
+            for dim, table in self.distinct.items()
+        }
+        return SalesSketches(quantiles, distinct, self.accuracy, self.precision)
+
+    @staticmethod
+    def _combine(left: pd.DataFrame, right: pd.DataFrame, keys: List[str], column: str, how: str) -> pd.DataFrame:
+        if left.empty:
+            return right
+        combined = pd.concat([left, right], ignore_index=True)
+        return combined.groupby(keys, sort=True)[column].agg(how).reset_index()
+
+    def _window(self, name: str, table: pd.DataFrame, start=None, end=None,
+                brands: Optional[List[str]] = None) -> List[slice]:
+        """Row ranges of a table holding the given brands between two dates (inclusive)"""
+        ranges = self._brands[name]
+        dates = table['date'].to_numpy()
+        window = []
+        for brand in (ranges if brands is None else brands):
+            if brand not in ranges:
+                continue
+            # Sorted by brand, then date: a binary search at each end
+            low, high = ranges[brand]
+            if start is not None:
+                low += int(np.searchsorted(dates[low:high], np.datetime64(start), 'left'))
+            if end is not None:
+                high = low + int(np.searchsorted(dates[low:high], np.datetime64(end), 'right'))
+            if low < high:
+                window.append(slice(low, high))
+        return window
+
+    @timed('aggregate')
+    def quantile(self, measure: str, qs: List[float], start=None, end=None,
+                 brands: Optional[List[str]] = None) -> Dict:
+        """Estimated quantiles of a measure over sales between two dates (inclusive)"""
+        table = self.quantiles[measure]
+        window = self._window(measure, table, start, end, brands)
+        if not window:
+            return {'count': 0, 'quantiles': {q: None for q in qs}}
+        signs, buckets, counts = (
+            np.concatenate([table[column].to_numpy()[rows] for rows in window]).astype(np.int64)
+            for column in ('sign', 'bucket', 'count')
+        )
+
+        # Merge the buckets into one histogram in ascending value order: negatives
+        # by falling magnitude, then zero, then positives by rising magnitude
+        keys = signs * buckets
+        low = keys.min()
+        width = keys.max() - low + 1
+        histogram = np.concatenate([
+            np.bincount(keys[signs == sign] - low, weights=counts[signs == sign], minlength=width)
+            for sign in (-1, 0, 1)
+        ])
+        bucket_signs = np.repeat([-1, 0, 1], width)
+        bucket_indices = np.tile(np.arange(low, low + width), 3) * bucket_signs
+        used = histogram > 0
+        cumulative = np.cumsum(histogram[used])
+        # Relative midpoint of the bucket, within accuracy of any value in it
+        values = bucket_signs[used] * 2 * self.gamma ** bucket_indices[used].astype(np.float64) / (self.gamma + 1)
+
+        count = int(cumulative[-1])
+        estimates = {}
+        for q in qs:
+            position = np.searchsorted(cumulative, q * (count - 1), 'right')
+            estimates[q] = float(values[min(position, len(values) - 1)])
+        return {'count': count, 'quantiles': estimates}
+
+    @timed('aggregate')
+    def distinct_count(self, dim: str, start=None, end=None, brands: Optional[List[str]] = None) -> float:
+        """Estimated number of distinct values of dim among sales between two dates (inclusive)"""
+        table = self.distinct[dim]
+        registers = np.zeros(2 ** self.precision, dtype=np.int64)
+        for rows in self._window(dim, table, start, end, brands):
+            np.maximum.at(registers, table['register'].to_numpy()[rows].astype(np.int64),
+                          table['rank'].to_numpy()[rows].astype(np.int64))
+
+        size = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / np.sum(2.0 ** -registers.astype(np.float64))
+        empty = int(np.count_nonzero(registers == 0))
+        if estimate <= 2.5 * size and empty:
+            # Linear counting is more accurate while most registers are unused
+            estimate = size * np.log(size / empty)
+        return float(estimate)
+
+    @property
+    def distinct_error(self) -> float:
+        """Relative standard error of distinct counts"""
+        return 1.04 / np.sqrt(2 ** self.precision)
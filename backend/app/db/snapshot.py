@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from app.db.prefix_sums import PrefixSums
+from app.db.rollup import RollupCube
+from app.db.sketches import SalesSketches
+from app.db.time_index import TimeIndex
+from app.db.search_index import ProductSearchIndex
+from app.db.facets import FacetIndex
+from app.utils.metrics import timed
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Rebuild a DataFrame on top of read-only column arrays (no data copy)"""
+    columns = {}
+    for name in df.columns:
+        values = df[name].values
+        if isinstance(values, np.ndarray):
+            values = values.view()
+            values.flags.writeable = False
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def sort_by_sale_date(sales: pd.DataFrame) -> pd.DataFrame:
+    """Stable sort by sale_date, skipped when the rows are already in order"""
+    if sales.empty or 'sale_date' not in sales.columns or sales['sale_date'].is_monotonic_increasing:
+        return sales
+    return sales.sort_values('sale_date', kind='stable', ignore_index=True)
+
+
+def append_rows(df: pd.DataFrame, new_rows: pd.DataFrame) -> pd.DataFrame:
+    """Concatenate rows, keeping categorical columns categorical with sorted categories.
+
+    Each column is copied once (codes for categoricals); existing codes are
+    reused as-is unless the new rows bring values the dictionary lacks, in
+    which case the history is remapped with one integer lookup.
+    """
+    if df.empty:
+        return new_rows
+    if new_rows.empty:
+        return df
+
+    columns = {}
+    for name in df.columns:
+        old = df[name]
+        new = new_rows[name] if name in new_rows.columns else pd.Series(index=new_rows.index, dtype=old.dtype)
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            columns[name] = _append_categorical(old.values, new)
+        else:
+            columns[name] = pd.concat([old, new], ignore_index=True)
+    return pd.DataFrame(columns, copy=False)
+
+
+def _append_categorical(old: pd.Categorical, new: pd.Series) -> pd.Categorical:
+    categories = old.categories
+    codes = old.codes
+    added = pd.Index(new.dropna().unique()).difference(categories)
+    if len(added):
+        merged = categories.append(added).sort_values()
+        # Missing values (code -1) map through the trailing -1
+        codes = np.append(merged.get_indexer(categories), -1)[codes]
+        categories = merged
+    new_codes = categories.get_indexer(pd.Index(new.astype(object)))
+    return pd.Categorical.from_codes(np.concatenate([codes, new_codes]), dtype=pd.CategoricalDtype(categories),
+                                     validate=False)
+
+
+class Snapshot:
+    """Immutable, versioned view of the products and sales tables.
+
+    A snapshot is built completely before it is published, so readers only
+    ever see a fully loaded dataset. Column arrays are read-only and shared
+    between all readers; derived structures (rollup cube, running totals,
+    sketches, time index, product search index, facet postings) are built
+    alongside and live exactly as long as the data they describe. Sales
+    rows are kept in ascending sale_date order; ``sales_sorted`` skips the
+    check when the caller already guarantees it.
+    """
+
+    def __init__(self, products: pd.DataFrame, sales: pd.DataFrame, version: int,
+                 sales_cube: RollupCube = None, sales_totals: PrefixSums = None,
+                 sales_sketches: SalesSketches = None, product_search: ProductSearchIndex = None,
+                 product_facets: FacetIndex = None, sales_sorted: bool = False):
+        self.products = freeze_frame(products)
+        self.sales = freeze_frame(sales if sales_sorted else sort_by_sale_date(sales))
+        self.version = version
+        self.loaded_at = datetime.now()
+        self.sales_cube = sales_cube if sales_cube is not None else RollupCube.from_sales(self.sales)
+        self.sales_totals = sales_totals if sales_totals is not None else PrefixSums.from_cube(self.sales_cube)
+        self.sales_sketches = sales_sketches if sales_sketches is not None else SalesSketches.from_sales(self.sales)
+        self.sales_index = TimeIndex.from_sales(self.sales)
+        self.product_search = product_search if product_search is not None else ProductSearchIndex.from_products(self.products)
+        self.product_facets = product_facets if product_facets is not None else FacetIndex.from_products(self.products)
+
+    def with_sales(self, new_sales: pd.DataFrame, version: int) -> 'Snapshot':
+        """New snapshot with rows appended.
+
+        The cube, running totals and sketches merge aggregates of the new
+        rows only. The columns themselves are still concatenated, one copy
+        of the history per call, which is why ingestion batches its
+        publishes. Rows newer than the last sale are appended without
+        re-sorting; older ones trigger one stable sort.
+        """
+        stamps = new_sales['sale_date'] if 'sale_date' in new_sales.columns else None
+        in_order = (stamps is not None and stamps.is_monotonic_increasing
+                    and (len(self.sales_index) == 0 or stamps.empty
+                         or stamps.iloc[0] >= self.sales_index.timestamps[-1]))
+        return Snapshot(
+            self.products,
+            append_rows(self.sales, new_sales),
+            version,
+            sales_cube=self.sales_cube.merge(new_sales),
+            sales_totals=self.sales_totals.merge(new_sales),
+            sales_sketches=self.sales_sketches.merge(new_sales),
+            product_search=self.product_search,
+            product_facets=self.product_facets,
+            sales_sorted=in_order,
+        )
+
+    @classmethod
+    def empty(cls) -> 'Snapshot':
+        return cls(pd.DataFrame(), pd.DataFrame(), version=0)
+
+    def get_products(self) -> pd.DataFrame:
+        """Shallow view of the products table; adding columns does not leak into the snapshot"""
+        return self.products.copy(deep=False)
+
+    def get_sales(self) -> pd.DataFrame:
+        """Shallow view of the sales table; adding columns does not leak into the snapshot"""
+        return self.sales.copy(deep=False) if not self.sales.empty else pd.DataFrame()
+
+    @timed('filter')
+    def sales_between(self, start=None, end=None, end_inclusive: bool = True) -> pd.DataFrame:
+        """Sales with start <= sale_date <= end, oldest first, found by binary search"""
+        return self.sales.iloc[self.sales_index.between(start, end, end_inclusive)]
+
+    @timed('filter')
+    def latest_sales(self, n: int) -> pd.DataFrame:
+        """The n most recent sales, oldest first, without sorting"""
+        return self.sales.iloc[self.sales_index.last(n)]
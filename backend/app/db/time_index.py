@@ -0,0 +1,67 @@
+import base64
+import binascii
+import numpy as np
+import pandas as pd
+
+
+class TimeIndex:
+    """Binary-search index over a sorted sale_date column.
+
+    Time windows resolve to positional slices with two ``searchsorted`` calls,
+    so a range lookup costs O(log n) plus the rows actually returned.
+
+    Keyset cursors identify a row by its sale_date plus its ordinal among
+    rows sharing that timestamp, so they stay valid across snapshots as
+    long as history is only appended to.
+    """
+
+    def __init__(self, timestamps: np.ndarray):
+        self.timestamps = timestamps
+
+    @classmethod
+    def from_sales(cls, sales: pd.DataFrame) -> 'TimeIndex':
+        if sales.empty or 'sale_date' not in sales.columns:
+            return cls(np.array([], dtype='datetime64[ns]'))
+        return cls(sales['sale_date'].to_numpy())
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def between(self, start=None, end=None, end_inclusive: bool = True) -> slice:
+        """Positions of rows with start <= sale_date <= end (or < end)"""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, self._key(start), side='left'))
+        if end is None:
+            hi = len(self.timestamps)
+        else:
+            side = 'right' if end_inclusive else 'left'
+            hi = int(np.searchsorted(self.timestamps, self._key(end), side=side))
+        return slice(lo, max(lo, hi))
+
+    def last(self, n: int) -> slice:
+        """Positions of the n most recent rows"""
+        total = len(self.timestamps)
+        return slice(max(0, total - n), total)
+
+    def cursor_at(self, position: int) -> str:
+        """Opaque keyset cursor for the row at this position"""
+        timestamp = self.timestamps[position]
+        ordinal = position - int(np.searchsorted(self.timestamps, timestamp, side='left'))
+        token = f'{pd.Timestamp(timestamp).value}:{ordinal}'
+        return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+    def position_of(self, cursor: str) -> int:
+        """Position of the row a cursor points at (or where it would be)"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            nanos, ordinal = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+            timestamp = self._key(pd.Timestamp(int(nanos), unit='ns'))
+            ordinal = int(ordinal)
+        except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+        lo = int(np.searchsorted(self.timestamps, timestamp, side='left'))
+        hi = int(np.searchsorted(self.timestamps, timestamp, side='right'))
+        return min(lo + max(ordinal, 0), hi)
+
+    def _key(self, value) -> np.datetime64:
+        return pd.Timestamp(value).to_datetime64().astype(self.timestamps.dtype)
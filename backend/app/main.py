@@ -1,6 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import products, sales, analytics, dashboard
+from app.api.routes import products, sales, analytics, dashboard, profiles
+from app.api.metrics import MetricsMiddleware, render_metrics
+from app.api.profiling import ProfilingMiddleware
+from app.utils.metrics import CONTENT_TYPE
+from app.db.database import db
 
 app = FastAPI(
     title="SA pcstore Admin API",
@@ -15,13 +19,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Profile-Id"],
 )
 
+# PROFILING_TOKEN=<secret>: requests carrying it (X-Profile-Token header) are profiled
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so latency includes CORS handling and 304 revalidations
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(dashboard.router, prefix="/api")
 app.include_router(products.router, prefix="/api")
 app.include_router(sales.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
+app.include_router(profiles.router, prefix="/api")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Opt-in: SALES_WATCH_INTERVAL=<seconds> picks up rows appended to sales_data.csv
+    db.watch()
+    # SALES_COMPACT_INTERVAL=<seconds> moves recorded sales from the log into the CSV
+    db.start_compaction()
+    # SHARED_DATASET=1: the loader exports snapshots (at most every SHARED_EXPORT_INTERVAL
+    # seconds), other workers attach to them
+    db.start_sharing()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    db.stop_watching()
+    db.compact_sales_log()
 
 @app.get("/")
 async def root():
@@ -33,4 +59,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics: per-route latency and sizes, stage timings, dataset and cache gauges"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
\ No newline at end of file
@@ -1,8 +1,19 @@
-from pydantic import BaseModel
+import math
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+from app.utils.sales_generator import DAY_NAMES
+
+# Derived amounts sent by a client may differ from the server's by rounding only
+AMOUNT_TOLERANCE = 0.01
 
 class Sale(BaseModel):
+    """A sale as posted to /api/sales.
+
+    Calendar fields (date ... hour) and amounts (unit_profit ...
+    profit_margin) are derived on the server from sale_date, quantity and
+    the prices; they may be left out, and are rejected when they disagree.
+    """
     sale_date: str
     product_name: str
     brand: str
@@ -10,25 +21,95 @@ class Sale(BaseModel):
     cpu: str
     gpu: str
     ram: str
-    quantity: int
-    buying_price: float
-    unit_price: float
-    unit_profit: float
-    tva_percentage: float
-    unit_price_with_tva: float
-    total_amount: float
-    total_cost: float
-    total_profit: float
-    profit_margin: float
-    date: str
-    year: int
-    month: int
-    week: int
-    day_of_week: str
-    hour: int
+    quantity: int = Field(ge=1)
+    buying_price: float = Field(ge=0)
+    unit_price: float = Field(ge=0)
+    unit_profit: Optional[float] = None
+    tva_percentage: float = Field(ge=0)
+    unit_price_with_tva: Optional[float] = None
+    total_amount: Optional[float] = None
+    total_cost: Optional[float] = None
+    total_profit: Optional[float] = None
+    profit_margin: Optional[float] = None
+    date: Optional[str] = None
+    year: Optional[int] = None
+    month: Optional[int] = None
+    week: Optional[int] = None
+    day_of_week: Optional[str] = None
+    hour: Optional[int] = None
 
 class SalesSummary(BaseModel):
     total_sales: int
     total_revenue: float
     total_profit: float
-    average_order_value: float
\ No newline at end of file
+    average_order_value: float
+
+
+def complete_sale(record: Dict) -> Dict:
+    """Sale record with every derived field computed from sale_date, quantity and prices.
+
+    Raises ValueError when a base field is missing or invalid, or when the
+    record carries a derived field that contradicts the computed one.
+    """
+    try:
+        sale_date = datetime.fromisoformat(str(record['sale_date']))
+        quantity = int(record['quantity'])
+        buying_price = float(record['buying_price'])
+        unit_price = float(record['unit_price'])
+        tva_percentage = float(record['tva_percentage'])
+    except KeyError as e:
+        raise ValueError(f"Missing sale field {e}")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid sale: {e}")
+    if quantity < 1 or not all(math.isfinite(v) and v >= 0 for v in (buying_price, unit_price, tva_percentage)):
+        raise ValueError("quantity must be positive and prices finite and not negative")
+
+    unit_profit = unit_price - buying_price
+    unit_price_with_tva = unit_price * (1 + tva_percentage / 100)
+    derived = {
+        'unit_profit': unit_profit,
+        'unit_price_with_tva': unit_price_with_tva,
+        'total_amount': unit_price_with_tva * quantity,
+        'total_cost': buying_price * quantity,
+        'total_profit': unit_profit * quantity,
+        'profit_margin': unit_profit / buying_price * 100 if buying_price else 0.0,
+        'date': sale_date.date().isoformat(),
+        'year': sale_date.year,
+        'month': sale_date.month,
+        'week': sale_date.isocalendar()[1],
+        'day_of_week': DAY_NAMES[sale_date.weekday()],
+        'hour': sale_date.hour,
+    }
+    for field, value in derived.items():
+        given = record.get(field)
+        if given is None or _matches(field, given, value):
+            continue
+        raise ValueError(f"{field}={given!r} does not match sale_date, quantity and prices (expected {value!r})")
+
+    completed = dict(record)
+    completed.update(
+        sale_date=sale_date.isoformat(sep=' '),
+        quantity=quantity,
+        buying_price=buying_price,
+        unit_price=unit_price,
+        tva_percentage=tva_percentage,
+        **derived,
+    )
+    return completed
+
+
+def _matches(field: str, given, expected) -> bool:
+    if field == 'date':
+        try:
+            return datetime.fromisoformat(str(given)).date().isoformat() == expected
+        except ValueError:
+            return False
+    if isinstance(expected, str):
+        return str(given) == expected
+    try:
+        given = float(given)
+    except (TypeError, ValueError):
+        return False
+    if isinstance(expected, int):
+        return given == expected
+    return math.isclose(given, expected, rel_tol=1e-6, abs_tol=AMOUNT_TOLERANCE)
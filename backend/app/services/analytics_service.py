@@ -1,123 +1,231 @@
 import pandas as pd
-from typing import List, Dict
+from datetime import timedelta
+from typing import List, Dict, Optional, Tuple
 from app.db.database import db
+from app.db.snapshot import Snapshot
+from app.db.query import AnalyticsQuery, TimeSeriesQuery
+from app.db.sketches import QUANTILE_MEASURES
+from app.utils.json_encoder import Records
+from app.services.cache import memoized
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DEFAULT_PERCENTILES = [50, 90, 99]
 
 class AnalyticsService:
     @staticmethod
-    def get_daily_analytics(days: int = 30) -> List[Dict]:
+    @memoized
+    def query(group_by: List[str], metrics: List[str], filters: Optional[Dict[str, List[str]]] = None,
+              start_date: Optional[str] = None, end_date: Optional[str] = None, sort: Optional[str] = None,
+              descending: bool = True, limit: Optional[int] = None) -> Dict:
+        """Run an ad-hoc analytics query; returns the rows and the plan used"""
+        query = AnalyticsQuery(group_by, metrics, filters, start_date, end_date, sort, descending, limit)
+        rows, plan = query.execute(db.snapshot)
+        return {'rows': Records(rows), 'plan': plan}
+
+    @staticmethod
+    @memoized
+    def get_time_series(granularity: str = 'day', start: Optional[str] = None, end: Optional[str] = None,
+                        metrics: Optional[List[str]] = None, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Get metrics per period over a date range, gaps filled with zeros"""
+        query = TimeSeriesQuery(granularity, metrics or [], filters, start, end)
+        rows, plan = query.execute(db.snapshot)
+        return {'rows': Records(rows), 'plan': plan}
+
+    @staticmethod
+    @memoized
+    def get_percentiles(measure: str = 'total_amount', percentiles: Optional[List[float]] = None,
+                        start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        brands: Optional[List[str]] = None, by_brand: bool = False,
+                        approximate: bool = False) -> Dict:
+        """Get percentiles of a per-sale measure, exact or estimated from the sketches"""
+        if measure not in QUANTILE_MEASURES:
+            raise ValueError(f"Unknown measure '{measure}' (use one of {', '.join(QUANTILE_MEASURES)})")
+        percentiles = percentiles or DEFAULT_PERCENTILES
+        if any(not 0 <= p <= 100 for p in percentiles):
+            raise ValueError("Percentiles must be between 0 and 100")
+        qs = [p / 100 for p in percentiles]
+        snapshot = db.snapshot
+        start, end = _date_bounds(start_date, end_date)
+
+        rows = []
+        if approximate:
+            sketches = snapshot.sales_sketches
+            for brand, selected in _brand_groups(snapshot, brands, by_brand):
+                estimate = sketches.quantile(measure, qs, start, end, selected)
+                if by_brand and not estimate['count']:
+                    continue
+                rows.append(_percentile_row(brand, estimate['count'], percentiles,
+                                            [estimate['quantiles'][q] for q in qs]))
+        else:
+            sales = _sales_window(snapshot, start, end, brands)
+            groups = sales.groupby('brand', observed=True, sort=True) if by_brand else [(None, sales)]
+            for brand, group in groups:
+                values = group[measure].quantile(qs).tolist() if len(group) else [None] * len(qs)
+                rows.append(_percentile_row(brand, len(group), percentiles, values))
+
+        return {
+            'measure': measure,
+            'approximate': approximate,
+            # Any estimate is within this fraction of the value at the requested rank
+            'relative_error': snapshot.sales_sketches.accuracy if approximate else 0.0,
+            'rows': rows,
+        }
+
+    @staticmethod
+    @memoized
+    def get_distinct_products(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                              brands: Optional[List[str]] = None, by_brand: bool = False,
+                              approximate: bool = False) -> Dict:
+        """Get the number of distinct products sold, exact or estimated from the sketches"""
+        snapshot = db.snapshot
+        start, end = _date_bounds(start_date, end_date)
+
+        rows = []
+        if approximate:
+            sketches = snapshot.sales_sketches
+            for brand, selected in _brand_groups(snapshot, brands, by_brand):
+                count = round(sketches.distinct_count('product_name', start, end, selected))
+                if by_brand and not count:
+                    continue
+                rows.append({**({'brand': brand} if by_brand else {}), 'distinct_products': count})
+        else:
+            sales = _sales_window(snapshot, start, end, brands)
+            groups = sales.groupby('brand', observed=True, sort=True) if by_brand else [(None, sales)]
+            for brand, group in groups:
+                rows.append({**({'brand': brand} if by_brand else {}),
+                             'distinct_products': int(group['product_name'].nunique()) if len(group) else 0})
+
+        return {
+            'approximate': approximate,
+            # HyperLogLog standard error, as a fraction of the count
+            'relative_error': snapshot.sales_sketches.distinct_error if approximate else 0.0,
+            'rows': rows,
+        }
+
+    @staticmethod
+    def _preset(query: AnalyticsQuery, snapshot: Optional[Snapshot] = None) -> Optional[pd.DataFrame]:
+        """Rows of a built-in query, None while there are no sales"""
+        snapshot = snapshot or db.snapshot
+        if snapshot.sales_cube.empty:
+            return None
+        return query.execute(snapshot)[0]
+
+    @staticmethod
+    @memoized
+    def get_daily_analytics(days: int = 30, snapshot: Optional[Snapshot] = None) -> Records:
         """Get daily sales analytics"""
-        df = db.get_sales()
-        if df.empty:
+        snapshot = snapshot or db.snapshot
+        sale_days = snapshot.sales_cube.rollup('date')['date']
+        # The last `days` days with sales, cut out of the daily rollup rather than computed for all of history
+        start = sale_days.iloc[-days] if days < len(sale_days) else None
+        daily = AnalyticsService._preset(AnalyticsQuery(
+            ['date'], ['sum:total_amount', 'sum:total_cost', 'sum:total_profit', 'sum:quantity', 'margin'],
+            start_date=start), snapshot)
+        if daily is None:
             return []
-        
-        daily = df.groupby('date').agg({
-            'total_amount': 'sum',
-            'total_cost': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum'
-        }).reset_index()
-        
-        daily['profit_margin'] = (daily['total_profit'] / daily['total_cost'] * 100)
+
+        daily = daily.rename(columns={'margin': 'profit_margin'})
         daily['date'] = daily['date'].astype(str)
-        
-        return daily.tail(days).to_dict(orient='records')
-    
+
+        return Records(daily)
+
     @staticmethod
-    def get_monthly_analytics() -> List[Dict]:
+    @memoized
+    def get_monthly_analytics() -> Records:
         """Get monthly sales analytics"""
-        df = db.get_sales()
-        if df.empty:
+        monthly = AnalyticsService._preset(AnalyticsQuery(
+            ['year', 'month'], ['sum:total_amount', 'sum:total_cost', 'sum:total_profit', 'sum:quantity', 'margin']))
+        if monthly is None:
             return []
-        
-        monthly = df.groupby(['year', 'month']).agg({
-            'total_amount': 'sum',
-            'total_cost': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum'
-        }).reset_index()
-        
-        monthly['period'] = monthly['year'].astype(str) + '-' + monthly['month'].astype(str).str.zfill(2)
-        monthly['profit_margin'] = (monthly['total_profit'] / monthly['total_cost'] * 100)
-        
-        return monthly.to_dict(orient='records')
-    
+
+        monthly = monthly.rename(columns={'margin': 'profit_margin'})
+        period = monthly['year'].astype(str) + '-' + monthly['month'].astype(str).str.zfill(2)
+        monthly.insert(monthly.columns.get_loc('profit_margin'), 'period', period)
+
+        return Records(monthly)
+
     @staticmethod
-    def get_weekly_analytics() -> List[Dict]:
+    @memoized
+    def get_weekly_analytics() -> Records:
         """Get weekly sales analytics"""
-        df = db.get_sales()
-        if df.empty:
+        weekly = AnalyticsService._preset(AnalyticsQuery(
+            ['day_of_week'], ['sum:total_amount', 'sum:total_profit', 'sum:quantity']))
+        if weekly is None:
             return []
-        
-        weekly = df.groupby('day_of_week').agg({
-            'total_amount': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum'
-        }).reindex(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
-        
-        return weekly.reset_index().rename(columns={'day_of_week': 'day'}).to_dict(orient='records')
-    
+
+        weekly = weekly.set_index('day_of_week').reindex(WEEKDAYS)
+        weekly.index.name = 'day_of_week'
+
+        return Records(weekly.reset_index().rename(columns={'day_of_week': 'day'}))
+
     @staticmethod
-    def get_hourly_analytics() -> List[Dict]:
+    @memoized
+    def get_hourly_analytics() -> Records:
         """Get hourly sales analytics"""
-        df = db.get_sales()
-        if df.empty:
+        hourly = AnalyticsService._preset(AnalyticsQuery(
+            ['hour'], ['sum:total_amount', 'sum:total_profit', 'sum:quantity']))
+        if hourly is None:
             return []
-        
-        hourly = df.groupby('hour').agg({
-            'total_amount': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum'
-        }).reset_index()
-        
+
         hourly['hour'] = hourly['hour'].astype(str) + 'h'
-        return hourly.to_dict(orient='records')
-    
+        return Records(hourly)
+
     @staticmethod
-    def get_brand_analytics() -> List[Dict]:
-        """Get brand performance analytics"""
-        df = db.get_sales()
-        if df.empty:
+    def _dimension_performance(dimension: str, snapshot: Optional[Snapshot] = None) -> Records:
+        """Revenue, profit and mean margin per value of a cube dimension"""
+        analysis = AnalyticsService._preset(AnalyticsQuery(
+            [dimension], ['sum:total_amount', 'sum:total_profit', 'sum:quantity', 'mean:profit_margin'],
+            sort='total_profit'), snapshot)
+        if analysis is None:
             return []
-        
-        brand_analysis = df.groupby('brand').agg({
-            'total_amount': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum',
-            'profit_margin': 'mean'
-        }).sort_values('total_profit', ascending=False)
-        
-        return brand_analysis.reset_index().to_dict(orient='records')
-    
+
+        return Records(analysis.rename(columns={'avg_profit_margin': 'profit_margin'}))
+
+    @staticmethod
+    @memoized
+    def get_brand_analytics(snapshot: Optional[Snapshot] = None) -> Records:
+        """Get brand performance analytics"""
+        return AnalyticsService._dimension_performance('brand', snapshot)
+
     @staticmethod
-    def get_gpu_analytics() -> List[Dict]:
+    @memoized
+    def get_gpu_analytics() -> Records:
         """Get GPU performance analytics"""
-        df = db.get_sales()
-        if df.empty:
-            return []
-        
-        gpu_analysis = df.groupby('gpu').agg({
-            'total_amount': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum',
-            'profit_margin': 'mean'
-        }).sort_values('total_profit', ascending=False)
-        
-        return gpu_analysis.reset_index().to_dict(orient='records')
-    
+        return AnalyticsService._dimension_performance('gpu')
+
     @staticmethod
-    def get_cpu_analytics() -> List[Dict]:
+    @memoized
+    def get_cpu_analytics() -> Records:
         """Get CPU performance analytics"""
-        df = db.get_sales()
-        if df.empty:
-            return []
-        
-        cpu_analysis = df.groupby('cpu').agg({
-            'total_amount': 'sum',
-            'total_profit': 'sum',
-            'quantity': 'sum',
-            'profit_margin': 'mean'
-        }).sort_values('total_profit', ascending=False)
-        
-        return cpu_analysis.reset_index().to_dict(orient='records')
-
-analytics_service = AnalyticsService()
\ No newline at end of file
+        return AnalyticsService._dimension_performance('cpu')
+
+def _date_bounds(start_date: Optional[str], end_date: Optional[str]) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """First and last day of an inclusive date range (None leaves it open)"""
+    start = pd.Timestamp(start_date).normalize() if start_date else None
+    end = pd.Timestamp(end_date).normalize() if end_date else None
+    if start is not None and end is not None and end < start:
+        raise ValueError("end_date must not be before start_date")
+    return start, end
+
+def _sales_window(snapshot: Snapshot, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp],
+                  brands: Optional[List[str]]) -> pd.DataFrame:
+    """Raw sales between two days (inclusive), optionally of some brands only"""
+    if snapshot.sales.empty:
+        return pd.DataFrame(columns=['brand', 'product_name', *QUANTILE_MEASURES])
+    sales = snapshot.sales_between(start, end + timedelta(days=1) if end is not None else None, end_inclusive=False)
+    return sales[sales['brand'].isin(brands)] if brands else sales
+
+def _brand_groups(snapshot: Snapshot, brands: Optional[List[str]], by_brand: bool) -> List[Tuple[Optional[str], Optional[List[str]]]]:
+    """(label, brands to merge) per output row: one per brand, or a single row"""
+    if not by_brand:
+        return [(None, brands)]
+    known = snapshot.sales_cube.rollup('brand')['brand'].astype(str).tolist() if not snapshot.sales_cube.empty else []
+    return [(brand, [brand]) for brand in known if not brands or brand in brands]
+
+def _percentile_row(brand: Optional[str], count: int, percentiles: List[float], values: List[Optional[float]]) -> Dict:
+    row = {'brand': brand} if brand is not None else {}
+    row['count'] = count
+    row.update({f'p{p:g}': value for p, value in zip(percentiles, values)})
+    return row
+
+analytics_service = AnalyticsService()
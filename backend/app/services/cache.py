@@ -0,0 +1,140 @@
+import functools
+import os
+import sys
+import threading
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+from app.db.database import db
+from app.db.snapshot import Snapshot
+from app.utils.json_encoder import Records
+
+MAX_ENTRIES = int(os.getenv('SERVICE_CACHE_MAX_ENTRIES', '512'))
+MAX_BYTES = int(os.getenv('SERVICE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+
+def estimate_size(value: Any) -> int:
+    """Rough resident size of a service result, in bytes"""
+    if isinstance(value, Records):
+        value = value.frame
+    if isinstance(value, pd.DataFrame):
+        # Shallow column sizes plus a flat allowance for object cells
+        size = int(value.memory_usage(index=True, deep=False).sum())
+        object_columns = sum(1 for dtype in value.dtypes if dtype == object)
+        return size + object_columns * len(value) * 64
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ServiceCache:
+    """Bounded LRU of service results keyed by method, arguments and data version.
+
+    Entries are evicted least-recently-used first once either the entry
+    count or the estimated byte size goes over budget. Publishing a new
+    snapshot clears the cache; a result computed while the version changed
+    under it is returned but not stored. Cached results are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def memoize(self, func: Callable) -> Callable:
+        """Decorator for service methods (apply under @staticmethod)"""
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            pinned = [value for value in (*args, *kwargs.values()) if isinstance(value, Snapshot)]
+            version = pinned[0].version if pinned else db.version
+            key = (name, version, freeze(args), freeze(kwargs))
+
+            found, result = self.get(key)
+            if found:
+                return result
+            result = func(*args, **kwargs)
+            # Unpinned calls read whatever snapshot was current; only keep the
+            # result if that is still the version it was keyed under
+            if pinned or version == db.version:
+                self.put(key, result)
+            return result
+
+        wrapper.cache = self
+        return wrapper
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self, *_):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable stand-in for call arguments (snapshots are keyed by version)"""
+    if isinstance(value, Snapshot):
+        return ('snapshot', value.version)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, set):
+        return tuple(sorted(freeze(item) for item in value))
+    return value
+
+
+service_cache = ServiceCache()
+memoized = service_cache.memoize
+
+# Results for an old snapshot can never be asked for again
+db.on_publish(service_cache.clear)
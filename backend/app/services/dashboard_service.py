@@ -0,0 +1,68 @@
+import threading
+from datetime import date
+from typing import Dict
+from app.db.database import db
+from app.services.sales_service import sales_service
+from app.services.product_service import product_service
+from app.services.analytics_service import analytics_service
+
+class DashboardService:
+    """Builds the whole dashboard payload from one snapshot.
+
+    Every KPI and chart series is read from the snapshot's pre-aggregated
+    rollups (plus today's slice of the time index), so building it costs at
+    most one pass over the data. The result is cached against the snapshot
+    version and the current date, so repeated requests between data changes
+    are served as-is.
+    """
+
+    _lock = threading.Lock()
+    _cache_key = None
+    _cache_value: Dict = None
+
+    @staticmethod
+    def get_dashboard_data() -> Dict:
+        """Get all dashboard KPIs and chart series"""
+        snapshot = db.snapshot
+        # Today's figures roll over at midnight even if the data does not change
+        key = (snapshot.version, date.today())
+        with DashboardService._lock:
+            if DashboardService._cache_key == key:
+                return DashboardService._cache_value
+
+        sales_summary = sales_service.get_sales_summary(snapshot)
+        product_stats = product_service.get_product_stats(snapshot)
+        today_sales = sales_service.get_today_sales(snapshot)
+
+        data = {
+            "stats": {
+                "total_revenue": sales_summary['total_revenue'],
+                "total_profit": sales_summary['total_profit'],
+                "total_products": product_stats['total_products'],
+                "total_sales": sales_summary['total_sales'],
+                "today_sales": today_sales['count'],
+                "today_revenue": today_sales['revenue'],
+                "today_profit": today_sales['profit']
+            },
+            "charts": {
+                "daily_trend": analytics_service.get_daily_analytics(7, snapshot),
+                "brand_performance": analytics_service.get_brand_analytics(snapshot),
+                "top_products": sales_service.get_top_selling_products(5, snapshot)
+            }
+        }
+
+        with DashboardService._lock:
+            DashboardService._cache_key = key
+            DashboardService._cache_value = data
+        return data
+
+    @staticmethod
+    def clear_cache(*_):
+        with DashboardService._lock:
+            DashboardService._cache_key = None
+            DashboardService._cache_value = None
+
+dashboard_service = DashboardService()
+
+# Drop the payload of a superseded snapshot straight away
+db.on_publish(dashboard_service.clear_cache)
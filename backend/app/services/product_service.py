@@ -1,60 +1,85 @@
 import pandas as pd
 from typing import List, Dict, Optional
 from app.db.database import db
+from app.db.snapshot import Snapshot
+from app.utils.json_encoder import Records
+from app.services.cache import memoized
 
 class ProductService:
     @staticmethod
-    def get_all_products() -> List[Dict]:
+    @memoized
+    def get_all_products() -> Records:
         """Get all products"""
         df = db.get_products()
-        return df.to_dict(orient='records')
+        return Records(df)
     
     @staticmethod
+    @memoized
     def get_product_by_name(name: str) -> Optional[Dict]:
         """Get a specific product by name"""
-        df = db.get_products()
-        product = df[df['product_name'].str.contains(name, case=False, na=False)]
-        if product.empty:
-            return None
-        return product.iloc[0].to_dict()
+        snapshot = db.snapshot
+        row = snapshot.product_search.lookup(name)
+        if row is None:
+            # Not an exact name: fall back to the best search hit
+            hits = snapshot.product_search.search(name, limit=1)
+            if not hits:
+                return None
+            row = hits[0]
+        return snapshot.products.iloc[row].to_dict()
     
     @staticmethod
-    def search_products(query: str) -> List[Dict]:
-        """Search products by name, brand, or specs"""
-        df = db.get_products()
-        mask = (
-            df['product_name'].str.contains(query, case=False, na=False) |
-            df['brand'].str.contains(query, case=False, na=False) |
-            df['cpu'].str.contains(query, case=False, na=False) |
-            df['gpu'].str.contains(query, case=False, na=False)
-        )
-        results = df[mask]
-        return results.to_dict(orient='records')
+    @memoized
+    def search_products(query: str) -> Records:
+        """Search products by name, brand, or specs (all terms must match, best first)"""
+        snapshot = db.snapshot
+        rows = snapshot.product_search.search(query)
+        results = snapshot.products.iloc[rows]
+        return Records(results)
     
     @staticmethod
+    @memoized
     def get_brands() -> List[str]:
         """Get all unique brands"""
         df = db.get_products()
         return df['brand'].unique().tolist()
     
     @staticmethod
-    def get_products_by_brand(brand: str) -> List[Dict]:
+    @memoized
+    def get_products_by_brand(brand: str) -> Records:
         """Get products by brand"""
-        df = db.get_products()
-        products = df[df['brand'].str.lower() == brand.lower()]
-        return products.to_dict(orient='records')
+        snapshot = db.snapshot
+        if snapshot.products.empty:
+            return []
+        rows = snapshot.product_facets.select({'brand': [brand]})['rows']
+        products = snapshot.products.iloc[rows]
+        return Records(products)
     
     @staticmethod
-    def get_low_stock_products(threshold: int = 10) -> List[Dict]:
+    @memoized
+    def filter_products(filters: Dict[str, List[str]], min_price: Optional[float] = None,
+                        max_price: Optional[float] = None) -> Dict:
+        """Filter products by facet values and price, with per-facet counts"""
+        snapshot = db.snapshot
+        if snapshot.products.empty:
+            return {'products': [], 'facets': {}}
+        
+        selection = snapshot.product_facets.select(filters, min_price, max_price)
+        products = snapshot.products.iloc[selection['rows']]
+        return {'products': Records(products), 'facets': selection['facets']}
+    
+    @staticmethod
+    @memoized
+    def get_low_stock_products(threshold: int = 10) -> Records:
         """Get products with low stock"""
         df = db.get_products()
         low_stock = df[df['stock_quantity'] <= threshold]
-        return low_stock.to_dict(orient='records')
+        return Records(low_stock)
     
     @staticmethod
-    def get_product_stats() -> Dict:
+    @memoized
+    def get_product_stats(snapshot: Optional[Snapshot] = None) -> Dict:
         """Get product statistics"""
-        df = db.get_products()
+        df = (snapshot or db.snapshot).products
         return {
             'total_products': len(df),
             'total_brands': df['brand'].nunique(),
@@ -1,49 +1,94 @@
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
 from datetime import datetime, timedelta
 from app.db.database import db
+from app.db.snapshot import Snapshot
+from app.db.rollup import COUNT
+from app.utils.json_encoder import Records, encode_ndjson
+from app.services.cache import memoized
+
+# Rows encoded per chunk when streaming the sales history
+STREAM_CHUNK_ROWS = 5000
+# Measure behind each top-products ranking
+RANKINGS = {'revenue': 'total_amount', 'profit': 'total_profit', 'quantity': 'quantity'}
 
 class SalesService:
     @staticmethod
-    def get_all_sales(limit: Optional[int] = None) -> List[Dict]:
+    def record_sales(sales: List[Dict]) -> int:
+        """Record new sales; returns once they are durable (visible shortly after)"""
+        return db.record_sales(sales)
+    
+    @staticmethod
+    def get_all_sales(limit: Optional[int] = None) -> Records:
         """Get all sales with optional limit"""
-        df = db.get_sales()
-        if df.empty:
+        snapshot = db.snapshot
+        if snapshot.sales.empty:
             return []
         
-        df = df.sort_values('sale_date', ascending=False)
-        if limit:
-            df = df.head(limit)
-        return df.to_dict(orient='records')
+        # Sales are stored oldest first, so the newest N are simply the last N rows
+        df = snapshot.latest_sales(limit) if limit else snapshot.sales
+        return Records(df.iloc[::-1])
+    
+    @staticmethod
+    def get_sales_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
+        """Get one page of sales, newest first, continuing after a keyset cursor"""
+        snapshot = db.snapshot
+        if snapshot.sales.empty:
+            return {'sales': [], 'next_cursor': None}
+        
+        top = len(snapshot.sales) if cursor is None else snapshot.sales_index.position_of(cursor)
+        bottom = max(0, top - limit) if limit else 0
+        page = snapshot.sales.iloc[bottom:top].iloc[::-1]
+        next_cursor = snapshot.sales_index.cursor_at(bottom) if bottom > 0 else None
+        return {'sales': Records(page), 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def stream_sales(cursor: Optional[str] = None, chunk_size: int = STREAM_CHUNK_ROWS) -> Iterator[str]:
+        """Stream sales newest first as NDJSON, encoding one chunk at a time"""
+        snapshot = db.snapshot
+        sales = snapshot.sales
+        # Resolve the cursor eagerly so a bad one fails before any bytes are sent
+        top = len(sales) if cursor is None else snapshot.sales_index.position_of(cursor)
+        
+        def chunks() -> Iterator[str]:
+            end = top
+            while end > 0:
+                start = max(0, end - chunk_size)
+                yield encode_ndjson(sales.iloc[start:end].iloc[::-1])
+                end = start
+        
+        return chunks()
     
     @staticmethod
-    def get_recent_sales(days: int = 7) -> List[Dict]:
+    def get_recent_sales(days: int = 7) -> Records:
         """Get sales from the last N days"""
-        df = db.get_sales()
-        if df.empty:
+        snapshot = db.snapshot
+        if snapshot.sales.empty:
             return []
         
         cutoff_date = datetime.now() - timedelta(days=days)
-        recent = df[df['sale_date'] >= cutoff_date]
-        return recent.sort_values('sale_date', ascending=False).to_dict(orient='records')
+        recent = snapshot.sales_between(start=cutoff_date)
+        return Records(recent.iloc[::-1])
     
     @staticmethod
-    def get_sales_by_date_range(start_date: str, end_date: str) -> List[Dict]:
+    @memoized
+    def get_sales_by_date_range(start_date: str, end_date: str) -> Records:
         """Get sales within a date range"""
-        df = db.get_sales()
-        if df.empty:
+        snapshot = db.snapshot
+        if snapshot.sales.empty:
             return []
         
         start = pd.to_datetime(start_date)
         end = pd.to_datetime(end_date)
-        filtered = df[(df['sale_date'] >= start) & (df['sale_date'] <= end)]
-        return filtered.to_dict(orient='records')
+        filtered = snapshot.sales_between(start, end)
+        return Records(filtered)
     
     @staticmethod
-    def get_sales_summary() -> Dict:
+    @memoized
+    def get_sales_summary(snapshot: Optional[Snapshot] = None) -> Dict:
         """Get overall sales summary"""
-        df = db.get_sales()
-        if df.empty:
+        cube = (snapshot or db.snapshot).sales_cube
+        if cube.empty:
             return {
                 'total_sales': 0,
                 'total_revenue': 0,
@@ -53,45 +98,82 @@ class SalesService:
                 'average_profit_margin': 0
             }
         
+        # Grand totals come from the daily rollup rather than the raw rows
+        totals = cube.rollup('date')[['quantity', 'total_amount', 'total_profit', 'total_cost', 'profit_margin', COUNT]].sum()
         return {
-            'total_sales': int(df['quantity'].sum()),
-            'total_revenue': float(df['total_amount'].sum()),
-            'total_profit': float(df['total_profit'].sum()),
-            'total_cost': float(df['total_cost'].sum()),
-            'average_order_value': float(df['total_amount'].mean()),
-            'average_profit_margin': float(df['profit_margin'].mean())
+            'total_sales': int(totals['quantity']),
+            'total_revenue': float(totals['total_amount']),
+            'total_profit': float(totals['total_profit']),
+            'total_cost': float(totals['total_cost']),
+            'average_order_value': float(totals['total_amount'] / totals[COUNT]),
+            'average_profit_margin': float(totals['profit_margin'] / totals[COUNT])
         }
     
     @staticmethod
-    def get_today_sales() -> Dict:
+    def get_today_sales(snapshot: Optional[Snapshot] = None) -> Dict:
         """Get today's sales statistics"""
-        df = db.get_sales()
-        if df.empty:
+        snapshot = snapshot or db.snapshot
+        if snapshot.sales.empty:
             return {'count': 0, 'revenue': 0, 'profit': 0}
         
-        today = datetime.now().date()
-        today_sales = df[df['date'] == pd.to_datetime(today)]
+        today = pd.Timestamp(datetime.now().date())
+        totals = snapshot.sales_totals.totals(today, today + timedelta(days=1))
         
         return {
-            'count': len(today_sales),
-            'revenue': float(today_sales['total_amount'].sum()),
-            'profit': float(today_sales['total_profit'].sum()),
-            'avg_order_value': float(today_sales['total_amount'].mean()) if len(today_sales) > 0 else 0
+            'count': totals[COUNT],
+            'revenue': totals['total_amount'],
+            'profit': totals['total_profit'],
+            'avg_order_value': totals['total_amount'] / totals[COUNT] if totals[COUNT] > 0 else 0
         }
     
     @staticmethod
-    def get_top_selling_products(limit: int = 10) -> List[Dict]:
-        """Get top selling products"""
-        df = db.get_sales()
-        if df.empty:
+    def get_range_summary(start: str, end: str, snapshot: Optional[Snapshot] = None) -> Dict:
+        """Get sales totals for a period and the equally long period before it"""
+        snapshot = snapshot or db.snapshot
+        start_at, end_at = _parse_bound(start), _parse_bound(end, inclusive_day=True)
+        if end_at <= start_at:
+            raise ValueError("end must be after start")
+        previous_start = start_at - (end_at - start_at)
+        
+        # Two lookups per period in the running totals, whatever the range
+        current = snapshot.sales_totals.totals(start_at, end_at)
+        previous = snapshot.sales_totals.totals(previous_start, start_at)
+        return {
+            'current': {'start': start_at.isoformat(), 'end': end_at.isoformat(), **current},
+            'previous': {'start': previous_start.isoformat(), 'end': start_at.isoformat(), **previous},
+            'change': {
+                field: (current[field] - previous[field]) / previous[field] * 100 if previous[field] else None
+                for field in current
+            }
+        }
+    
+    @staticmethod
+    def get_top_selling_products(limit: int = 10, snapshot: Optional[Snapshot] = None,
+                                 by: str = 'revenue', days: Optional[int] = None) -> Records:
+        """Get top selling products, over all time or the last N days"""
+        since = pd.Timestamp(datetime.now().date()) - timedelta(days=days - 1) if days else None
+        return SalesService._top_products(limit, RANKINGS[by], since, snapshot)
+    
+    @staticmethod
+    @memoized
+    def _top_products(limit: int, measure: str, since: Optional[pd.Timestamp] = None,
+                      snapshot: Optional[Snapshot] = None) -> Records:
+        cube = (snapshot or db.snapshot).sales_cube
+        if cube.empty:
             return []
         
-        top_products = df.groupby('product_name').agg({
-            'quantity': 'sum',
-            'total_amount': 'sum',
-            'total_profit': 'sum'
-        }).sort_values('total_amount', ascending=False).head(limit)
+        # Ranked with a bounded heap over the per-product (per-day) rollups
+        top_products = cube.top('product_name', measure, limit, start=since)
         
-        return top_products.reset_index().to_dict(orient='records')
+        return Records(top_products[['product_name', 'quantity', 'total_amount', 'total_profit']])
+
+def _parse_bound(value: str, inclusive_day: bool = False) -> pd.Timestamp:
+    """Timestamp for a range bound; a bare end date covers that whole day"""
+    stamp = pd.Timestamp(value)
+    if pd.isna(stamp):
+        raise ValueError(f"Invalid date: {value}")
+    if inclusive_day and len(value.strip()) <= 10:
+        stamp += timedelta(days=1)
+    return stamp
 
 sales_service = SalesService()
\ No newline at end of file
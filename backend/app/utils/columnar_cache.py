@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+CACHE_FORMAT = 1
+MANIFEST = 'manifest.json'
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_columns(directory: str, df: pd.DataFrame) -> List[Dict]:
+    """Save every column of df as .npy files in directory; returns their manifest entries"""
+    return [_write_column(directory, position, df[name]) for position, name in enumerate(df.columns)]
+
+
+def read_columns(directory: str, columns: List[Dict], rows: int) -> pd.DataFrame:
+    """Memory-map columns written by write_columns back into a DataFrame"""
+    data = {}
+    for column in columns:
+        path = os.path.join(directory, column['file'])
+        values = np.load(path, mmap_mode='r')
+        if column['kind'] == 'string':
+            categories = np.load(os.path.join(directory, column['categories']))
+            # Codes + dictionary map straight onto a categorical, no string rebuild
+            values = pd.Categorical.from_codes(values, categories.astype(object))
+        data[column['name']] = values
+    df = pd.DataFrame(data, copy=False)
+    if len(df) != rows:
+        raise ValueError(f"expected {rows} rows, found {len(df)}")
+    return df
+
+
+def _write_column(directory: str, position: int, series: pd.Series) -> Dict:
+    entry = {'name': series.name, 'file': f'{position:03d}.npy'}
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_dtype(series):
+        entry['kind'] = 'numeric'
+        np.save(os.path.join(directory, entry['file']), series.to_numpy())
+        return entry
+
+    codes, uniques = pd.factorize(series, sort=True)
+    if not all(isinstance(value, str) for value in uniques):
+        raise TypeError(f"column {series.name!r} is neither numeric, datetime nor string")
+    entry['kind'] = 'string'
+    entry['categories'] = f'{position:03d}.categories.npy'
+    np.save(os.path.join(directory, entry['file']), codes.astype(np.int32))
+    np.save(os.path.join(directory, entry['categories']), np.array(list(uniques), dtype=str))
+    return entry
+
+
+class ColumnWriter:
+    """Write a table of known length chunk by chunk in the write_columns layout.
+
+    Each column is a pre-sized memory-mapped ``.npy`` file filled in place,
+    so memory use is bounded by one chunk however long the table is. String
+    columns must arrive as categoricals whose categories are the same in
+    every chunk (they are taken from the first one).
+    """
+
+    def __init__(self, directory: str, rows: int):
+        self.directory = directory
+        self.rows = rows
+        self.offset = 0
+        self.columns: List[Dict] = []
+        self._arrays: List[np.ndarray] = []
+
+    def write(self, chunk: pd.DataFrame):
+        if not self.columns:
+            os.makedirs(self.directory, exist_ok=True)
+            for position, name in enumerate(chunk.columns):
+                self._open_column(position, chunk[name])
+        end = self.offset + len(chunk)
+        if end > self.rows:
+            raise ValueError(f"table is longer than the declared {self.rows} rows")
+        for array, name in zip(self._arrays, chunk.columns):
+            series = chunk[name]
+            values = series.cat.codes.to_numpy() if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+            array[self.offset:end] = values
+        self.offset = end
+
+    def close(self) -> Dict:
+        """Flush the columns and write the manifest read back by read_table"""
+        if self.offset != self.rows:
+            raise ValueError(f"expected {self.rows} rows, got {self.offset}")
+        for array in self._arrays:
+            array.flush()
+        manifest = {'format': CACHE_FORMAT, 'rows': self.rows, 'columns': self.columns}
+        with open(os.path.join(self.directory, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+        self._arrays = []
+        return manifest
+
+    def _open_column(self, position: int, series: pd.Series):
+        entry = {'name': series.name, 'file': f'{position:03d}.npy'}
+        path = os.path.join(self.directory, entry['file'])
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'string'
+            entry['categories'] = f'{position:03d}.categories.npy'
+            np.save(os.path.join(self.directory, entry['categories']),
+                    np.array([str(value) for value in series.cat.categories], dtype=str))
+            dtype = np.int32
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_dtype(series):
+            entry['kind'] = 'numeric'
+            dtype = series.dtype
+        else:
+            raise TypeError(f"column {series.name!r} must be numeric, datetime or categorical")
+        self._arrays.append(np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(self.rows,)))
+        self.columns.append(entry)
+
+
+def read_table(directory: str) -> pd.DataFrame:
+    """Memory-map a table written by ColumnWriter"""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    return read_columns(directory, manifest['columns'], manifest['rows'])
+
+
+class ColumnarCache:
+    """Binary per-column cache of a CSV file stored next to it.
+
+    Every column is written as a memory-mappable ``.npy`` file: numbers and
+    datetimes as-is, strings as int32 codes plus a sorted array of distinct
+    values that loads back as a categorical. A manifest records the source file's size, mtime and SHA-256.
+    Size and mtime are checked on every load; the hash is only recomputed
+    when the size matches but the mtime moved (touched or copied file), so a
+    valid cache opens without reading the CSV at all.
+    """
+
+    def __init__(self, csv_path: str, cache_root: str = None):
+        self.csv_path = csv_path
+        if cache_root is None:
+            cache_root = os.path.join(os.path.dirname(csv_path), '.cache')
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        self.cache_dir = os.path.join(cache_root, name)
+        # Size of the CSV contents the last read_csv returned (None if unknown)
+        self.source_size: Optional[int] = None
+
+    def read_csv(self, parse_dates: Iterable[str] = ()) -> pd.DataFrame:
+        """Load from the cache when valid, otherwise parse the CSV and rebuild the cache"""
+        self.source_size = None
+        manifest = self._read_manifest()
+        df = self.load(manifest)
+        if df is not None:
+            self.source_size = manifest['size']
+            return df
+
+        before = os.stat(self.csv_path)
+        df = pd.read_csv(self.csv_path)
+        for column in parse_dates:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format='ISO8601')
+
+        # Only persist if the CSV did not change underneath us while parsing
+        after = os.stat(self.csv_path)
+        if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+            self.source_size = before.st_size
+            self.store(df, before)
+        return df
+
+    def load(self, manifest: Dict = None) -> Optional[pd.DataFrame]:
+        """Memory-map the cached columns, or return None if the cache is missing or stale"""
+        if manifest is None:
+            manifest = self._read_manifest()
+        if manifest is None or not self._is_fresh(manifest):
+            return None
+        try:
+            return self._read_columns(manifest)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: ignoring unreadable cache {self.cache_dir}: {e}")
+            return None
+
+    def store(self, df: pd.DataFrame, source_stat: os.stat_result = None) -> bool:
+        """Write the DataFrame as the cache for the current CSV contents"""
+        if df.empty:
+            return False
+        if source_stat is None:
+            source_stat = os.stat(self.csv_path)
+
+        parent = os.path.dirname(self.cache_dir)
+        try:
+            os.makedirs(parent, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix='.staging-', dir=parent)
+        except OSError as e:
+            print(f"Warning: cannot write cache {self.cache_dir}: {e}")
+            return False
+
+        try:
+            columns = write_columns(staging, df)
+            manifest = {
+                'format': CACHE_FORMAT,
+                'source': os.path.basename(self.csv_path),
+                'size': source_stat.st_size,
+                'mtime_ns': source_stat.st_mtime_ns,
+                'sha256': file_digest(self.csv_path),
+                'rows': len(df),
+                'columns': columns,
+            }
+            self._write_manifest(staging, manifest)
+            self._publish(staging)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: cannot write cache {self.cache_dir}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+    def _is_fresh(self, manifest: Dict) -> bool:
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return False
+        if manifest.get('format') != CACHE_FORMAT or manifest.get('size') != stat.st_size:
+            return False
+        if manifest.get('mtime_ns') == stat.st_mtime_ns:
+            return True
+        if file_digest(self.csv_path) != manifest.get('sha256'):
+            return False
+
+        # Same bytes under a new mtime: remember it so the next start skips the hash
+        manifest['mtime_ns'] = stat.st_mtime_ns
+        try:
+            self._write_manifest(self.cache_dir, manifest)
+        except OSError:
+            pass
+        return True
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_columns(self, manifest: Dict) -> pd.DataFrame:
+        return read_columns(self.cache_dir, manifest['columns'], manifest['rows'])
+
+    @staticmethod
+    def _write_manifest(directory: str, manifest: Dict):
+        # Write-then-rename so a crash never leaves a truncated manifest behind
+        path = os.path.join(directory, MANIFEST)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def _publish(self, staging: str):
+        # Processes that already mapped the old files keep them until they let go
+        retired = None
+        if os.path.exists(self.cache_dir):
+            retired = tempfile.mkdtemp(prefix='.retired-', dir=os.path.dirname(self.cache_dir))
+            os.replace(self.cache_dir, os.path.join(retired, 'old'))
+        os.replace(staging, self.cache_dir)
+        if retired is not None:
+            shutil.rmtree(retired, ignore_errors=True)
@@ -1,16 +1,54 @@
 import pandas as pd
+import io
 import os
-from typing import Optional
+from typing import Dict, List, Optional
+from app.utils.columnar_cache import ColumnarCache
+from app.utils.csv_tail import CSVTail
+from app.utils.schema import SALES_SCHEMA, PRODUCTS_SCHEMA, apply_schema
 
 class CSVLoader:
     """Utility class for loading and managing CSV data"""
     
-    def __init__(self, data_dir: str = None):
+    def __init__(self, data_dir: str = None, use_cache: bool = True,
+                 use_schema: bool = True, compact_floats: bool = False):
         if data_dir is None:
             # Default to data directory relative to this file
             self.data_dir = os.path.join(os.path.dirname(__file__), '../../data')
         else:
             self.data_dir = data_dir
+        self.use_cache = use_cache
+        self.use_schema = use_schema
+        self.compact_floats = compact_floats
+        # Byte size of each file as it was loaded, for incremental tail reads
+        self.loaded_sizes: Dict[str, Optional[int]] = {}
+    
+    def _read_csv(self, file_path: str, parse_dates=()) -> pd.DataFrame:
+        """Read a CSV, going through its columnar cache when enabled"""
+        if self.use_cache:
+            cache = ColumnarCache(file_path)
+            df = cache.read_csv(parse_dates)
+            self.loaded_sizes[file_path] = cache.source_size
+            return df
+        
+        before = os.stat(file_path)
+        df = self._parse_csv(file_path, parse_dates)
+        after = os.stat(file_path)
+        self.loaded_sizes[file_path] = before.st_size if before.st_size == after.st_size else None
+        return df
+    
+    @staticmethod
+    def _parse_csv(source, parse_dates=()) -> pd.DataFrame:
+        df = pd.read_csv(source)
+        for column in parse_dates:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format='ISO8601')
+        return df
+    
+    def _apply_schema(self, df: pd.DataFrame, schema) -> pd.DataFrame:
+        """Compact dtypes (categoricals, narrow ints) unless disabled"""
+        if not self.use_schema:
+            return df
+        return apply_schema(df, schema, compact_floats=self.compact_floats)
     
     def load_products(self) -> pd.DataFrame:
         """Load products from CSV file"""
@@ -18,24 +56,45 @@ class CSVLoader:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Products file not found: {file_path}")
         
-        df = pd.read_csv(file_path)
-        return df
+        df = self._read_csv(file_path)
+        return self._apply_schema(df, PRODUCTS_SCHEMA)
     
     def load_sales(self) -> pd.DataFrame:
         """Load sales from CSV file"""
-        file_path = os.path.join(self.data_dir, 'sales_data.csv')
+        file_path = self.sales_path
         if not os.path.exists(file_path):
             print(f"Warning: Sales file not found: {file_path}")
             return pd.DataFrame()
         
-        df = pd.read_csv(file_path)
-        # Convert date columns
-        if 'sale_date' in df.columns:
-            df['sale_date'] = pd.to_datetime(df['sale_date'])
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
+        # Date columns are parsed once and then served from the cache
+        df = self._read_csv(file_path, parse_dates=('sale_date', 'date'))
+        return self._apply_schema(df, SALES_SCHEMA)
+    
+    @property
+    def sales_path(self) -> str:
+        return os.path.join(self.data_dir, 'sales_data.csv')
+    
+    def load_sales_tail(self, tail: CSVTail) -> Optional[pd.DataFrame]:
+        """Parse only the sales rows appended since the tail was last read.
         
-        return df
+        Returns None when the file was truncated or rewritten and must be
+        reloaded in full.
+        """
+        raw = tail.read_new()
+        if raw is None:
+            return None
+        if not raw:
+            return pd.DataFrame()
+        df = self._parse_csv(io.BytesIO(raw), parse_dates=('sale_date', 'date'))
+        return self._apply_schema(df, SALES_SCHEMA)
+    
+    def sales_from_records(self, records: List[Dict]) -> pd.DataFrame:
+        """Build a typed sales frame from row dicts (raises ValueError on bad dates)"""
+        df = pd.DataFrame.from_records(records)
+        for column in ('sale_date', 'date'):
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], format='ISO8601')
+        return self._apply_schema(df, SALES_SCHEMA)
     
     def save_products(self, df: pd.DataFrame) -> bool:
         """Save products to CSV file"""
@@ -50,7 +109,7 @@ class CSVLoader:
     def save_sales(self, df: pd.DataFrame) -> bool:
         """Save sales to CSV file"""
         try:
-            file_path = os.path.join(self.data_dir, 'sales_data.csv')
+            file_path = self.sales_path
             df.to_csv(file_path, index=False)
             return True
         except Exception as e:
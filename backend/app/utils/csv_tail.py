@@ -0,0 +1,75 @@
+import hashlib
+import os
+from typing import Optional
+
+# Bytes just before the consumed offset that must stay unchanged between reads
+FINGERPRINT_BYTES = 4096
+
+
+class CSVTail:
+    """Tracks how far an append-only CSV file has been consumed.
+
+    After a full load the file size is recorded as the consumed offset,
+    together with the header line and a hash of the bytes right before the
+    offset. ``read_new`` then returns only complete lines appended since, or
+    None when the file was truncated or rewritten and needs a full reload.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.header = b''
+        self._fingerprint: Optional[str] = None
+
+    def mark(self, size: Optional[int]):
+        """Record that the first `size` bytes have been loaded (None: unknown)"""
+        self.offset = 0
+        self.header = b''
+        self._fingerprint = None
+        if size is None or not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            self.header = f.readline()
+            self.offset = size
+            self._fingerprint = self._fingerprint_at(f, size)
+
+    def has_changed(self) -> bool:
+        """Cheap check for the file watcher: has the size moved since the last read?"""
+        try:
+            return os.stat(self.path).st_size != self.offset
+        except OSError:
+            return self.offset != 0
+
+    def read_new(self) -> Optional[bytes]:
+        """Header plus complete lines appended since the last read, b'' if none, None if rewritten"""
+        if self._fingerprint is None:
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < self.offset or f.readline() != self.header:
+                    return None
+                if self._fingerprint_at(f, self.offset) != self._fingerprint:
+                    return None
+                if size == self.offset:
+                    return b''
+
+                f.seek(self.offset)
+                chunk = f.read(size - self.offset)
+        except OSError:
+            return None
+
+        # Leave a partially written last line for the next read
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return b''
+        self.offset += end
+        with open(self.path, 'rb') as f:
+            self._fingerprint = self._fingerprint_at(f, self.offset)
+        return self.header + chunk[:end]
+
+    @staticmethod
+    def _fingerprint_at(f, offset: int) -> str:
+        start = max(0, offset - FINGERPRINT_BYTES)
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
@@ -0,0 +1,139 @@
+import json
+import math
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List
+from app.utils.metrics import timed
+
+
+class Records:
+    """A table of rows kept in columnar form until it is serialized.
+
+    Services return this instead of ``to_dict(orient='records')`` so the
+    response encoder can turn whole columns into JSON at once instead of
+    building one Python dict per row.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_list())
+
+    def __getitem__(self, position: int) -> Dict:
+        return self.frame.iloc[position].to_dict()
+
+    def to_list(self) -> List[Dict]:
+        return self.frame.to_dict(orient='records')
+
+
+@timed('serialize')
+def encode_json(content: Any) -> bytes:
+    """Serialize a response payload; Records are encoded column by column"""
+    return encode_value(content).encode('utf-8')
+
+
+@timed('serialize')
+def encode_ndjson(frame: pd.DataFrame) -> str:
+    """One JSON object per line, newline terminated"""
+    if frame.empty:
+        return ''
+    return '\n'.join(_encode_rows(frame)) + '\n'
+
+
+def encode_records(frame: pd.DataFrame) -> str:
+    return '[' + ','.join(_encode_rows(frame)) + ']'
+
+
+def encode_value(value: Any) -> str:
+    """JSON text of a scalar or container, NaN/NaT as null and numpy types native"""
+    if isinstance(value, Records):
+        return encode_records(value.frame)
+    if isinstance(value, pd.DataFrame):
+        return encode_records(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if value is None or value is pd.NaT or value is pd.NA:
+        return 'null'
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return repr(value) if math.isfinite(value) else 'null'
+    if isinstance(value, dict):
+        return '{' + ','.join(
+            json.dumps(str(key), ensure_ascii=False) + ':' + encode_value(item)
+            for key, item in value.items()
+        ) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(encode_value(item) for item in value) + ']'
+    if isinstance(value, np.ndarray):
+        return encode_value(value.tolist())
+    if isinstance(value, pd.Series):
+        return encode_value(value.to_dict())
+    if isinstance(value, (datetime, date)):
+        return '"' + value.isoformat() + '"'
+    if isinstance(value, np.datetime64):
+        return encode_value(pd.Timestamp(value))
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def _encode_rows(frame: pd.DataFrame) -> Iterator[str]:
+    if frame.empty:
+        return iter(())
+    # '{"a":{},"b":{}}' filled positionally with each column's JSON tokens
+    fields = [
+        json.dumps(str(name), ensure_ascii=False).replace('{', '{{').replace('}', '}}') + ':{}'
+        for name in frame.columns
+    ]
+    template = '{{' + ','.join(fields) + '}}'
+    columns = [_encode_column(frame.iloc[:, i]) for i in range(frame.shape[1])]
+    return map(template.format, *columns)
+
+
+def _encode_column(series: pd.Series) -> List[str]:
+    """JSON token of every value in a column, computed in bulk"""
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Encode each distinct value once; code -1 (missing) picks the trailing null
+        lookup = np.array([encode_value(v) for v in dtype.categories] + ['null'], dtype=object)
+        return lookup[series.cat.codes.to_numpy()].tolist()
+
+    if isinstance(dtype, np.dtype):
+        values = series.to_numpy()
+        if dtype.kind == 'b':
+            return np.where(values, 'true', 'false').tolist()
+        if dtype.kind in 'iu':
+            return json.dumps(values.tolist())[1:-1].split(', ')
+        if dtype.kind == 'f':
+            tokens = json.dumps(values.tolist())[1:-1].split(', ')
+            for position in np.flatnonzero(~np.isfinite(values)).tolist():
+                tokens[position] = 'null'
+            return tokens
+        if dtype.kind == 'M':
+            return _encode_datetimes(values)
+
+    try:
+        codes, uniques = pd.factorize(series)
+    except TypeError:
+        return [encode_value(v) for v in series.tolist()]
+    lookup = np.array([encode_value(v) for v in uniques] + ['null'], dtype=object)
+    return lookup[codes].tolist()
+
+
+def _encode_datetimes(values: np.ndarray) -> List[str]:
+    # Timestamps repeat a lot (dates, minute resolution): format each distinct one once
+    codes, uniques = pd.factorize(values)
+    uniques = np.asarray(uniques, dtype=values.dtype)
+    # Match datetime.isoformat(): whole seconds unless some value has a fraction
+    whole = (uniques.astype('datetime64[s]') == uniques).all()
+    strings = np.datetime_as_string(uniques, unit='s' if whole else 'us')
+    lookup = np.array(['"' + text + '"' for text in strings.tolist()] + ['null'], dtype=object)
+    return lookup[codes].tolist()
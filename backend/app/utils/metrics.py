@@ -0,0 +1,224 @@
+import bisect
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; finer than Prometheus' defaults at the low end, most endpoints answer in well under 5ms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes, 256B to 64MiB in steps of 4x
+SIZE_BUCKETS = tuple(256 * 4 ** n for n in range(10))
+
+# Label used for stage timings recorded outside any request (publishing, background tasks)
+BACKGROUND = 'background'
+
+# Stage timings of the request being handled; the middleware attributes them to its route
+_request_stages: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar('request_stages', default=None)
+# Stage being timed in this context; stages nested inside it are part of its time
+_active_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('active_stage', default=None)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield from self._samples(key, value)
+
+    def _samples(self, key: Tuple[str, ...], value) -> Iterator[str]:
+        yield f'{self.name}{self._labels(key)} {_format(value)}'
+
+
+class Counter(_Metric):
+    """Monotonically increasing total"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirror a total that is counted elsewhere (e.g. by a cache)"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, key: Tuple[str, ...], state) -> Iterator[str]:
+        counts, total, count = state
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = 'le="%s"' % _format(bound)
+            yield f'{self.name}_bucket{self._labels(key, le)} {cumulative}'
+        yield f'{self.name}_sum{self._labels(key)} {_format(total)}'
+        yield f'{self.name}_count{self._labels(key)} {count}'
+
+
+class Registry:
+    """Metrics rendered together in the Prometheus text exposition format.
+
+    Collectors are called right before rendering, so values that are cheap
+    to read but awkward to keep up to date (dataset sizes, cache counters
+    owned by other objects) are refreshed only when someone scrapes.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = [line for metric in self._metrics for line in metric.render()]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'app_stage_duration_seconds', 'Time spent in internal stages of request handling',
+    ['route', 'stage'])
+
+
+@contextmanager
+def collect_stages() -> Iterator[List[Tuple[str, float]]]:
+    """Gather stage timings recorded in this context (and contexts copied from it)"""
+    stages: List[Tuple[str, float]] = []
+    token = _request_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+
+def record_stage(stage: str, seconds: float):
+    stages = _request_stages.get()
+    if stages is None:
+        stage_seconds.observe(seconds, route=BACKGROUND, stage=stage)
+    else:
+        # list.append is atomic, worker threads may record concurrently
+        stages.append((stage, seconds))
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator timing every call as the given stage.
+
+    Only the outermost timed call is recorded: a ``filter`` running inside
+    an ``aggregate`` counts as aggregate time, so the stages of a request
+    never add up to more than its wall time.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_stage.get() is not None:
+                return func(*args, **kwargs)
+            token = _active_stage.set(stage)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_stage(stage, time.perf_counter() - started)
+                _active_stage.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
@@ -0,0 +1,213 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Shared secret that turns profiling on; requests must present it (empty disables profiling)
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+# Profiles kept for download, oldest dropped first
+PROFILE_BUFFER_SIZE = int(os.getenv('PROFILE_BUFFER_SIZE', '20'))
+# Milliseconds between stack samples
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '1'))
+
+# Where a sample's time went, decided by the frames on its stack (first match wins)
+CATEGORIES = [
+    ('serialization', ('app.utils.json_encoder', 'json')),
+    ('pandas', ('pandas', 'numpy')),
+    ('idle', ('selectors',)),
+    ('framework', ('fastapi', 'starlette', 'anyio', 'uvicorn', 'asyncio', 'concurrent', 'pydantic')),
+    ('app', ('app',)),
+]
+
+# Profiler of the request being handled, inherited by the threads it hands work to
+_current: contextvars.ContextVar[Optional['SamplingProfiler']] = contextvars.ContextVar('profiler', default=None)
+
+
+class SamplingProfiler:
+    """Statistical profiler for the threads working on one request.
+
+    A background thread snapshots the Python stacks of the attached threads
+    every ``interval`` seconds and counts identical stacks. Stacks are kept
+    root first as ``thread;module:function;...``, the "collapsed" format
+    read by flamegraph.pl, speedscope and most other flame graph tools.
+    Sampling cost does not grow with the number of calls made, so the
+    profile of a pandas-heavy request stays representative. An event loop
+    thread is shared by every request, so it is attached together with the
+    request's task and only sampled while that task is the one running.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._threads: Dict[int, Tuple[str, Optional[asyncio.Task]]] = {}
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def attach(self, task: Optional[asyncio.Task] = None):
+        """Sample the calling thread from now on (only while task runs, if given)"""
+        thread = threading.current_thread()
+        self._threads[thread.ident] = (thread.name, task)
+
+    def detach(self):
+        self._threads.pop(threading.get_ident(), None)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, (name, task) in list(self._threads.items()):
+                if task is not None and asyncio.current_task(task.get_loop()) is not task:
+                    # The loop is running (or waiting for) another request
+                    continue
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[self._collapse(name, frame)] += 1
+                    self.samples += 1
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get('__name__', '?')
+            names.append(f"{module}:{getattr(code, 'co_qualname', code.co_name)}".replace(';', ','))
+            frame = frame.f_back
+        names.append(thread_name)
+        return ';'.join(reversed(names))
+
+    def collapsed(self) -> str:
+        """Stacks and sample counts, one per line, heaviest first"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def breakdown(self) -> Dict[str, float]:
+        """Share of samples per category (serialization, pandas, framework, ...)"""
+        counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            counts[_categorize(stack)] += count
+        total = sum(counts.values())
+        return {category: count / total for category, count in counts.most_common()} if total else {}
+
+    def top_functions(self, limit: int = 20) -> List[Dict]:
+        """Hottest functions: share of samples spent in them (self) and under them (total)"""
+        own: Counter = Counter()
+        under: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if frames:
+                own[frames[-1]] += count
+            for name in set(frames):
+                under[name] += count
+        total = self.samples or 1
+        return [
+            {'function': name, 'self': count / total, 'total': under[name] / total}
+            for name, count in own.most_common(limit)
+        ]
+
+
+def _categorize(stack: str) -> str:
+    modules = [frame.split(':', 1)[0] for frame in stack.split(';')[1:]]
+    for category, prefixes in CATEGORIES:
+        for module in modules:
+            if any(module == prefix or module.startswith(prefix + '.') for prefix in prefixes):
+                return category
+    return 'other'
+
+
+class ProfileStore:
+    """Rolling buffer of the most recent request profiles"""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self._profiles: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex[:12]
+
+    def add(self, profile_id: str, method: str, path: str, status: int, profiler: SamplingProfiler) -> Dict:
+        profile = {
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'status': status,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': profiler.elapsed * 1000,
+            'interval_ms': profiler.interval * 1000,
+            'samples': profiler.samples,
+            'breakdown': profiler.breakdown(),
+            'top_functions': profiler.top_functions(),
+            'collapsed': profiler.collapsed(),
+        }
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def list(self) -> List[Dict]:
+        """Summaries, newest first"""
+        with self._lock:
+            profiles = list(self._profiles)
+        return [{key: value for key, value in profile.items() if key != 'collapsed'}
+                for profile in reversed(profiles)]
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile['id'] == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+
+@contextmanager
+def profiling(profiler: SamplingProfiler) -> Iterator[SamplingProfiler]:
+    """Sample the calling thread, and threads that join with ``attached``, until exit"""
+    token = _current.set(profiler)
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    profiler.attach(task)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _current.reset(token)
+
+
+def active() -> Optional[SamplingProfiler]:
+    """Profiler of the request being handled in this context, if it is profiled"""
+    return _current.get()
+
+
+@contextmanager
+def attached():
+    """Add this thread to the profile of the request it is working for, if any"""
+    profiler = _current.get()
+    if profiler is None:
+        yield
+        return
+    profiler.attach()
+    try:
+        yield
+    finally:
+        profiler.detach()
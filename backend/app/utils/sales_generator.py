@@ -0,0 +1,187 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Iterator, List, Optional
+from app.utils.columnar_cache import ColumnWriter
+
+# Same shape as notebook.ipynb's generate_sales_data: Poisson(5) sales a day,
+# 1-5 units per sale, sold between 08:00 and 21:59
+DAILY_MEAN = 5.0
+QUANTITY_RANGE = (1, 6)
+HOUR_RANGE = (8, 22)
+CHUNK_ROWS = 1_000_000
+
+SALES_COLUMNS = [
+    'sale_date', 'product_name', 'brand', 'series', 'cpu', 'gpu', 'ram', 'quantity',
+    'buying_price', 'unit_price', 'unit_profit', 'tva_percentage', 'unit_price_with_tva',
+    'total_amount', 'total_cost', 'total_profit', 'profit_margin',
+    'date', 'year', 'month', 'week', 'day_of_week', 'hour',
+]
+PRODUCT_LABELS = ['product_name', 'brand', 'series', 'cpu', 'gpu', 'ram']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class SalesGenerator:
+    """Vectorized port of the notebook's generate_sales_data.
+
+    The number of sales per day is drawn up front (Poisson), so the table
+    length is known before any row exists; rows are then produced in chunks
+    of at most ``chunk_rows``, which keeps memory flat for any table size.
+    Draws come from generators seeded with ``seed``, so the same seed and
+    chunk size always give the same table. Columns come out with the dtypes of
+    SALES_SCHEMA (strings as categoricals over the product catalogue).
+    """
+
+    def __init__(self, products: pd.DataFrame, start_date: str = '2024-01-01',
+                 end_date: Optional[str] = None, rows: Optional[int] = None,
+                 daily_mean: float = DAILY_MEAN, seed: int = 42):
+        self.seed = seed
+        self.days = pd.date_range(start_date, end_date or date.today().isoformat(), freq='D')
+        if rows is not None:
+            daily_mean = rows / len(self.days)
+        self.daily_counts = np.random.default_rng([seed, 0]).poisson(daily_mean, size=len(self.days))
+        self.total = int(self.daily_counts.sum())
+
+        # Catalogue as flat arrays: labels as codes into sorted dictionaries
+        self.labels = {}
+        for column in PRODUCT_LABELS:
+            codes, uniques = pd.factorize(products[column], sort=True)
+            self.labels[column] = (codes, pd.Index(uniques, dtype=object))
+        self.unit_price = products['price'].to_numpy(dtype=np.float64)
+        self.buying_price = products['buying_price'].to_numpy(dtype=np.float64)
+        self.tva_percentage = products['tva_percentage'].to_numpy(dtype=np.float64)
+        self.unit_price_with_tva = products['price_with_tva'].to_numpy(dtype=np.float64)
+        self.profit_margin = products['profit_margin'].to_numpy(dtype=np.float64)
+
+    def chunks(self, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """Yield the table in order, at most chunk_rows rows at a time"""
+        rng = np.random.default_rng([self.seed, 1])
+        day_values = self.days.values
+        ends = np.cumsum(self.daily_counts)
+        for start in range(0, self.total, chunk_rows):
+            stop = min(start + chunk_rows, self.total)
+            # Day of every row in [start, stop): a day may straddle two chunks
+            first, last = np.searchsorted(ends, [start, stop - 1], side='right')
+            counts = self.daily_counts[first:last + 1].copy()
+            counts[0] -= start - (ends[first - 1] if first else 0)
+            counts[-1] -= ends[last] - stop
+            yield self._rows(rng, np.repeat(day_values[first:last + 1], counts))
+
+    def generate(self) -> pd.DataFrame:
+        """The whole table in memory (same rows as a single chunk)"""
+        rng = np.random.default_rng([self.seed, 1])
+        return self._rows(rng, np.repeat(self.days.values, self.daily_counts))
+
+    def _rows(self, rng: np.random.Generator, day: np.ndarray) -> pd.DataFrame:
+        n = len(day)
+        product = rng.integers(0, len(self.unit_price), size=n)
+        quantity = rng.integers(*QUANTITY_RANGE, size=n).astype(np.int16)
+        minutes = rng.integers(*HOUR_RANGE, size=n) * 60 + rng.integers(0, 60, size=n)
+        sale_date = pd.DatetimeIndex(day + minutes.astype('timedelta64[m]')).as_unit('ns')
+
+        unit_price = self.unit_price[product]
+        buying_price = self.buying_price[product]
+        unit_price_with_tva = self.unit_price_with_tva[product]
+        unit_profit = unit_price - buying_price
+        iso = sale_date.isocalendar()
+
+        columns = {'sale_date': sale_date}
+        for column, (codes, uniques) in self.labels.items():
+            columns[column] = pd.Categorical.from_codes(codes[product], categories=uniques)
+        columns.update({
+            'quantity': quantity,
+            'buying_price': buying_price,
+            'unit_price': unit_price,
+            'unit_profit': unit_profit,
+            'tva_percentage': self.tva_percentage[product],
+            'unit_price_with_tva': unit_price_with_tva,
+            'total_amount': unit_price_with_tva * quantity,
+            'total_cost': buying_price * quantity,
+            'total_profit': unit_profit * quantity,
+            'profit_margin': self.profit_margin[product],
+            'date': sale_date.normalize(),
+            'year': sale_date.year.to_numpy().astype(np.int16),
+            'month': sale_date.month.to_numpy().astype(np.int8),
+            'week': iso['week'].to_numpy().astype(np.int8),
+            'day_of_week': pd.Categorical.from_codes(sale_date.dayofweek.to_numpy(), categories=DAY_NAMES),
+            'hour': sale_date.hour.to_numpy().astype(np.int8),
+        })
+        return pd.DataFrame(columns, copy=False)[SALES_COLUMNS]
+
+
+def generate_sales(products: pd.DataFrame, rows: Optional[int] = None,
+                   start_date: str = '2024-01-01', end_date: Optional[str] = None,
+                   daily_mean: float = DAILY_MEAN, seed: int = 42) -> pd.DataFrame:
+    """Generate synthetic sales with the schema of data/sales_data.csv.
+
+    When ``rows`` is given the daily rate is scaled so the table has about
+    that many rows over the date range (which ends today by default).
+    """
+    return SalesGenerator(products, start_date, end_date, rows, daily_mean, seed).generate()
+
+
+def write_csv(generator: SalesGenerator, path: str, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Stream the table to a CSV file laid out like data/sales_data.csv"""
+    written = 0
+    with open(path, 'w', newline='') as f:
+        for chunk in generator.chunks(chunk_rows):
+            chunk.to_csv(f, header=written == 0, index=False)
+            written += len(chunk)
+        if written == 0:
+            pd.DataFrame(columns=SALES_COLUMNS).to_csv(f, index=False)
+    return written
+
+
+def write_columnar(generator: SalesGenerator, directory: str, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Stream the table to memory-mappable column files (see columnar_cache.read_table)"""
+    writer = ColumnWriter(directory, generator.total)
+    for chunk in generator.chunks(chunk_rows):
+        writer.write(chunk)
+    writer.close()
+    return generator.total
+
+
+def parse_count(text: str) -> int:
+    """'250k' -> 250000, '300m' -> 300000000"""
+    text = text.strip().lower()
+    factor = {'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if factor != 1 else text) * factor)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    data_dir = os.path.join(os.path.dirname(__file__), '../../data')
+    parser = argparse.ArgumentParser(description='Generate synthetic sales data like notebook.ipynb, in constant memory')
+    parser.add_argument('--out', required=True, help='CSV file, or directory for --format columnar')
+    parser.add_argument('--format', choices=['csv', 'columnar'], default='csv')
+    parser.add_argument('--products', default=os.path.join(data_dir, 'megapc_products_updated.csv'),
+                        help='product catalogue CSV')
+    parser.add_argument('--start', default='2024-01-01', help='first day (YYYY-MM-DD)')
+    parser.add_argument('--end', default=None, help='last day (YYYY-MM-DD, default today)')
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument('--rows', type=parse_count, help='approximate total rows, e.g. 10m (sets the daily mean)')
+    rate.add_argument('--daily-mean', type=float, default=DAILY_MEAN, help='mean sales per day (default 5)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=parse_count, default=CHUNK_ROWS, help='rows generated per chunk')
+    args = parser.parse_args(argv)
+
+    products = pd.read_csv(args.products)
+    generator = SalesGenerator(products, args.start, args.end, args.rows, args.daily_mean, args.seed)
+    print(f"Generating {generator.total:,} sales over {len(generator.days)} days")
+
+    started = time.perf_counter()
+    if args.format == 'csv':
+        rows = write_csv(generator, args.out, args.chunk_rows)
+    else:
+        rows = write_columnar(generator, args.out, args.chunk_rows)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {rows:,} rows to {args.out} in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    # python -m app.utils.sales_generator --rows 100m --out sales.csv
+    sys.exit(main())
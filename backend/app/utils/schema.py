@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+# Low-cardinality string dimensions become categoricals (one small dictionary
+# plus integer codes), calendar fields use the narrowest integer that fits.
+SALES_SCHEMA: Dict[str, str] = {
+    'sale_date': 'datetime64[ns]',
+    'product_name': 'category',
+    'brand': 'category',
+    'series': 'category',
+    'cpu': 'category',
+    'gpu': 'category',
+    'ram': 'category',
+    'quantity': 'int16',
+    'buying_price': 'float64',
+    'unit_price': 'float64',
+    'unit_profit': 'float64',
+    'tva_percentage': 'float64',
+    'unit_price_with_tva': 'float64',
+    'total_amount': 'float64',
+    'total_cost': 'float64',
+    'total_profit': 'float64',
+    'profit_margin': 'float64',
+    'date': 'datetime64[ns]',
+    'year': 'int16',
+    'month': 'int8',
+    'week': 'int8',
+    'day_of_week': 'category',
+    'hour': 'int8',
+}
+
+PRODUCTS_SCHEMA: Dict[str, str] = {
+    'product_name': 'object',
+    'brand': 'category',
+    'series': 'category',
+    'model': 'category',
+    'screen_size': 'category',
+    'screen_resolution': 'category',
+    'screen_type': 'category',
+    'cpu': 'category',
+    'gpu': 'category',
+    'ram': 'category',
+    'storage': 'category',
+    'os': 'category',
+    'price': 'float64',
+    'image_url': 'object',
+    'product_url': 'object',
+    'tva_percentage': 'float64',
+    'stock_quantity': 'int32',
+    'buying_price': 'float64',
+    'price_with_tva': 'float64',
+    'profit_margin': 'float64',
+}
+
+# Per-unit values that may be stored as float32. Totals are left in float64
+# because they are summed over the whole history.
+FLOAT32_SAFE = {
+    'buying_price', 'unit_price', 'unit_profit', 'tva_percentage',
+    'unit_price_with_tva', 'profit_margin', 'price', 'price_with_tva',
+}
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str], compact_floats: bool = False) -> pd.DataFrame:
+    """Cast known columns to their schema dtype; unknown columns are left alone"""
+    if df.empty:
+        return df
+
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        dtype = schema.get(name)
+        if dtype is not None:
+            if compact_floats and dtype == 'float64' and name in FLOAT32_SAFE:
+                dtype = 'float32'
+            series = _cast(series, dtype)
+        columns[name] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def _cast(series: pd.Series, dtype: str) -> pd.Series:
+    if dtype == 'category':
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series.astype('category')
+        # Keep categories sorted so groupby output order matches plain strings
+        categories = series.cat.categories
+        if not categories.is_monotonic_increasing:
+            series = series.cat.reorder_categories(categories.sort_values())
+        return series
+
+    if dtype == 'object':
+        return series.astype(object) if series.dtype != object else series
+
+    if dtype.startswith('datetime64'):
+        return series if pd.api.types.is_datetime64_dtype(series) else pd.to_datetime(series, format='ISO8601')
+
+    target = np.dtype(dtype)
+    if series.dtype == target:
+        return series
+    if target.kind in 'iu':
+        # Never truncate: keep the wider type if the data does not fit or has gaps
+        if series.isna().any() or not pd.api.types.is_integer_dtype(series):
+            return series
+        info = np.iinfo(target)
+        if len(series) and (series.min() < info.min or series.max() > info.max):
+            return series
+    return series.astype(target)
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> List[Dict]:
+    """Bytes per column before and after applying a schema"""
+    before_bytes = before.memory_usage(index=False, deep=True)
+    after_bytes = after.memory_usage(index=False, deep=True)
+    report = []
+    for name in before.columns:
+        report.append({
+            'column': name,
+            'dtype_before': str(before[name].dtype),
+            'dtype_after': str(after[name].dtype),
+            'bytes_before': int(before_bytes[name]),
+            'bytes_after': int(after_bytes[name]),
+        })
+    report.append({
+        'column': '<total>',
+        'dtype_before': '',
+        'dtype_after': '',
+        'bytes_before': int(before_bytes.sum()),
+        'bytes_after': int(after_bytes.sum()),
+    })
+    return report
+
+
+def format_report(title: str, report: List[Dict]) -> str:
+    lines = [title, f"{'column':<22}{'before':>12}{'after':>12}  dtype"]
+    for row in report:
+        change = f"{row['dtype_before']} -> {row['dtype_after']}" if row['dtype_before'] else ''
+        lines.append(f"{row['column']:<22}{row['bytes_before']:>12,}{row['bytes_after']:>12,}  {change}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # python -m app.utils.schema  -> print bytes per column for the bundled data
+    from app.utils.csv_loader import CSVLoader
+
+    raw = CSVLoader(use_cache=False, use_schema=False)
+    for title, frame, schema in (
+        ('sales', raw.load_sales(), SALES_SCHEMA),
+        ('products', raw.load_products(), PRODUCTS_SCHEMA),
+    ):
+        print(format_report(title, memory_report(frame, apply_schema(frame, schema))))
+        print()
@@ -0,0 +1,251 @@
+"""Service-level benchmarks on synthetic sales tables.
+
+Usage (from backend/):
+
+    python -m benchmarks.run --sizes 10k,100k,1m --out results.json
+    python -m benchmarks.run --sizes 10k,100k --baseline results.json
+
+Every service method is timed cold (service caches cleared before each
+call) and warm (served from the caches). Latency includes encoding the
+result to JSON, since services hand back lazily encoded Records. Peak and
+retained memory come from one extra traced call. Synthetic sales are
+streamed to memory-mapped column files chunk by chunk, so the harness
+never holds a second copy of the table next to the app's.
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.db.database import db
+from app.services.analytics_service import analytics_service
+from app.services.cache import service_cache
+from app.services.dashboard_service import dashboard_service
+from app.services.product_service import product_service
+from app.services.sales_service import sales_service
+from app.utils.columnar_cache import read_table
+from app.utils.csv_loader import CSVLoader
+from app.utils.json_encoder import encode_json
+from app.utils.sales_generator import SalesGenerator, write_columnar
+from app.utils.schema import SALES_SCHEMA, apply_schema
+
+DEFAULT_SIZES = '10k,100k,1m'
+SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+# Slower than baseline by more than this fraction (and MIN_DELTA_MS) is a regression
+DEFAULT_THRESHOLD = 0.20
+MIN_DELTA_MS = 0.05
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000"""
+    text = text.strip().lower()
+    if text and text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(rows: int) -> str:
+    for suffix, factor in sorted(SUFFIXES.items(), key=lambda item: -item[1]):
+        if rows >= factor and rows % factor == 0:
+            return f'{rows // factor}{suffix}'
+    return str(rows)
+
+
+def build_cases(products: pd.DataFrame, sales: pd.DataFrame) -> List[Tuple[str, Callable]]:
+    """(name, zero-argument call) for every service method worth timing"""
+    brand = str(products['brand'].iloc[0])
+    last_day = sales['sale_date'].max()
+    range_start = (last_day - timedelta(days=30)).strftime('%Y-%m-%d')
+    range_end = last_day.strftime('%Y-%m-%d')
+
+    return [
+        ('AnalyticsService.get_daily_analytics', lambda: analytics_service.get_daily_analytics(30)),
+        ('AnalyticsService.get_monthly_analytics', analytics_service.get_monthly_analytics),
+        ('AnalyticsService.get_weekly_analytics', analytics_service.get_weekly_analytics),
+        ('AnalyticsService.get_hourly_analytics', analytics_service.get_hourly_analytics),
+        ('AnalyticsService.get_brand_analytics', analytics_service.get_brand_analytics),
+        ('AnalyticsService.get_gpu_analytics', analytics_service.get_gpu_analytics),
+        ('AnalyticsService.get_cpu_analytics', analytics_service.get_cpu_analytics),
+        ('SalesService.get_all_sales', lambda: sales_service.get_all_sales(100)),
+        ('SalesService.get_sales_page', lambda: sales_service.get_sales_page(100)),
+        ('SalesService.get_recent_sales', lambda: sales_service.get_recent_sales(7)),
+        ('SalesService.get_sales_by_date_range', lambda: sales_service.get_sales_by_date_range(range_start, range_end)),
+        ('SalesService.get_sales_summary', sales_service.get_sales_summary),
+        ('SalesService.get_today_sales', sales_service.get_today_sales),
+        ('SalesService.get_top_selling_products', lambda: sales_service.get_top_selling_products(10)),
+        ('ProductService.get_all_products', product_service.get_all_products),
+        ('ProductService.search_products', lambda: product_service.search_products('rtx')),
+        ('ProductService.filter_products', lambda: product_service.filter_products({'brand': [brand]})),
+        ('ProductService.get_products_by_brand', lambda: product_service.get_products_by_brand(brand)),
+        ('ProductService.get_low_stock_products', lambda: product_service.get_low_stock_products(10)),
+        ('ProductService.get_product_stats', product_service.get_product_stats),
+        ('DashboardService.get_dashboard_data', dashboard_service.get_dashboard_data),
+    ]
+
+
+def clear_caches():
+    service_cache.clear()
+    dashboard_service.clear_cache()
+
+
+def time_calls(func: Callable, cold: bool, repeat: int, min_time: float) -> Dict:
+    """Latency statistics in milliseconds over at least `repeat` calls and `min_time` seconds"""
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        if cold:
+            clear_caches()
+        t0 = time.perf_counter()
+        encode_json(func())
+        samples.append((time.perf_counter() - t0) * 1000)
+        if len(samples) >= 1000:
+            break
+    samples.sort()
+    return {
+        'runs': len(samples),
+        'min_ms': samples[0],
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'mean_ms': statistics.fmean(samples),
+    }
+
+
+def trace_call(func: Callable) -> Dict:
+    """Peak traced memory of one cold call, and what it left allocated"""
+    clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = encode_json(func())
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    grown = [stat for stat in after.compare_to(before, 'filename') if stat.size_diff > 0]
+    return {
+        'peak_bytes': peak - baseline,
+        'allocated_blocks': sum(max(stat.count_diff, 0) for stat in grown),
+        'retained_bytes': sum(stat.size_diff for stat in grown),
+        'response_bytes': len(result),
+    }
+
+
+def run_size(rows: int, products: pd.DataFrame, repeat: int, min_time: float,
+             only: Optional[str] = None) -> Dict:
+    # Unlinked files stay readable through existing mappings, so the directory can go right away
+    with tempfile.TemporaryDirectory(prefix='bench-sales-') as directory:
+        t0 = time.perf_counter()
+        write_columnar(SalesGenerator(products, rows=rows), directory)
+        sales = read_table(directory)
+        t1 = time.perf_counter()
+        sales = apply_schema(sales, SALES_SCHEMA)
+        t2 = time.perf_counter()
+        db.replace_data(products, sales)
+        t3 = time.perf_counter()
+
+    setup = {
+        'rows': len(sales),
+        'generate_s': t1 - t0,
+        'schema_s': t2 - t1,
+        'snapshot_s': t3 - t2,
+        'sales_bytes': int(db.sales_df.memory_usage(index=True, deep=True).sum()),
+    }
+
+    results = {}
+    for name, func in build_cases(products, sales):
+        if only and only not in name:
+            continue
+        results[name] = {
+            'cold': time_calls(func, cold=True, repeat=repeat, min_time=min_time),
+            'warm': time_calls(func, cold=False, repeat=repeat, min_time=min_time),
+            'memory': trace_call(func),
+        }
+        print(f"  {name:<45} cold {results[name]['cold']['median_ms']:9.3f} ms"
+              f"   warm {results[name]['warm']['median_ms']:8.3f} ms"
+              f"   peak {results[name]['memory']['peak_bytes'] / 1024:10.1f} KiB")
+    return {'setup': setup, 'results': results}
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """Cold median latencies that got slower than the baseline by more than threshold"""
+    regressions = []
+    for label, size in current['sizes'].items():
+        base_size = baseline.get('sizes', {}).get(label)
+        if base_size is None:
+            continue
+        for name, result in size['results'].items():
+            base_result = base_size['results'].get(name)
+            if base_result is None:
+                continue
+            now = result['cold']['median_ms']
+            before = base_result['cold']['median_ms']
+            ratio = now / before if before else float('inf')
+            if ratio > 1 + threshold and now - before > MIN_DELTA_MS:
+                regressions.append({'size': label, 'method': name, 'baseline_ms': before,
+                                    'current_ms': now, 'ratio': ratio})
+    return regressions
+
+
+def environment() -> Dict:
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the backend services on synthetic sales data')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma separated row counts, e.g. 10k,100k,1m,10m')
+    parser.add_argument('--repeat', type=int, default=5, help='minimum timed calls per method and mode')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimum seconds spent timing each method and mode')
+    parser.add_argument('--only', help='only run methods whose name contains this text')
+    parser.add_argument('--out', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='results JSON to compare against; exits 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown as a fraction of the baseline (default 0.20)')
+    args = parser.parse_args(argv)
+
+    products = CSVLoader().load_products()
+    report = {'environment': environment(), 'sizes': {}}
+    for rows in [parse_size(size) for size in args.sizes.split(',')]:
+        label = size_label(rows)
+        print(f"{label} rows")
+        report['sizes'][label] = run_size(rows, products, args.repeat, args.min_time, args.only)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for item in regressions:
+            print(f"REGRESSION {item['size']:>5} {item['method']:<45} "
+                  f"{item['baseline_ms']:.3f} ms -> {item['current_ms']:.3f} ms (x{item['ratio']:.2f})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(BACKEND, 'data')
+sys.path.insert(0, BACKEND)
+
+# The app's package __init__ files hold a leftover standalone script that reads a
+# CSV from a developer's home directory on import; the modules do not use them,
+# so register the packages without running them.
+for package in ('app', 'app.api', 'app.api.routes', 'app.db', 'app.models', 'app.services', 'app.utils'):
+    if package not in sys.modules:
+        module = types.ModuleType(package)
+        module.__path__ = [os.path.join(BACKEND, *package.split('.'))]
+        sys.modules[package] = module
+
+
+def copy_data(target):
+    """Copy the product catalogue and the first 20 sales into target"""
+    shutil.copy(os.path.join(DATA, 'megapc_products_updated.csv'), target)
+    with open(os.path.join(DATA, 'sales_data.csv')) as f:
+        lines = [next(f) for _ in range(21)]
+    with open(os.path.join(target, 'sales_data.csv'), 'w') as f:
+        f.writelines(lines)
+
+
+# The global database loads on import; keep it (its sales log, lock and
+# cache files) off the repository's data directory
+_session_data = tempfile.TemporaryDirectory()
+copy_data(_session_data.name)
+os.environ['DATA_DIR'] = _session_data.name
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Data directory with the product catalogue and the first 20 sales"""
+    copy_data(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sale_record():
+    """One sale as posted to /api/sales"""
+    import pandas as pd
+    return pd.read_csv(os.path.join(DATA, 'sales_data.csv'), nrows=1).iloc[0].to_dict()
+
+
+@pytest.fixture
+def make_database(data_dir):
+    """Build Database instances on the test data directory, like separate worker processes"""
+    from app.db.database import Database
+
+    databases = []
+
+    def make(shared=False):
+        database = Database(shared=shared, base_path=str(data_dir))
+        databases.append(database)
+        return database
+
+    yield make
+    for database in databases:
+        database.stop_watching()
+        database.sales_log.close()
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from app.db.facets import FacetIndex
+
+
+def test_select_counts_each_facet_against_the_other_filters():
+    products = pd.DataFrame({
+        'brand': ['MSI', 'Dell', 'MSI', 'Asus', None],
+        'gpu': ['RTX 4060', 'RTX 4060', 'RTX 4070', 'RTX 4070', 'RTX 4060'],
+        'price': [1200.0, 2100.0, 2600.0, 1800.0, 900.0],
+    })
+    index = FacetIndex.from_products(products)
+
+    selection = index.select({'brand': ['msi'], 'gpu': ['RTX 4060']})
+    np.testing.assert_array_equal(selection['rows'], [0])
+    # brand is counted against the gpu filter only, gpu against the brand filter only
+    assert selection['facets']['brand'] == {'MSI': 1, 'Dell': 1}
+    assert selection['facets']['gpu'] == {'RTX 4060': 1, 'RTX 4070': 1}
+
+    cheap = index.select({}, max_price=2000)
+    np.testing.assert_array_equal(cheap['rows'], [0, 3, 4])
+    assert cheap['facets']['brand'] == {'MSI': 1, 'Asus': 1}
+    assert cheap['facets']['price_bucket'] == {'0-1500': 2, '1500-2000': 1}
+
+
+def test_select_matches_a_scan_of_the_catalogue(data_dir):
+    products = pd.read_csv(data_dir / 'megapc_products_updated.csv')
+    index = FacetIndex.from_products(products)
+    brands = products['brand'].value_counts().index[:2].tolist()
+    ram = products['ram'].iloc[0]
+
+    selection = index.select({'brand': [b.lower() for b in brands], 'ram': [ram]}, min_price=1000, max_price=4000)
+    in_price = products['price'].between(1000, 4000)
+    expected = products.index[products['brand'].isin(brands) & (products['ram'] == ram) & in_price]
+    np.testing.assert_array_equal(selection['rows'], expected)
+
+    # Each facet is counted against the other filters only
+    others = products[(products['ram'] == ram) & in_price]
+    assert selection['facets']['brand'] == others['brand'].value_counts().to_dict()
+    assert index.select({'brand': ['no such brand']})['rows'].size == 0
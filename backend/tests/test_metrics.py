@@ -0,0 +1,41 @@
+from app.utils.metrics import collect_stages, timed
+
+
+@timed('filter')
+def _filter():
+    return 'rows'
+
+
+@timed('aggregate')
+def _aggregate():
+    return _filter()
+
+
+def test_nested_stages_count_towards_the_outermost_one():
+    with collect_stages() as stages:
+        _aggregate()
+        _filter()
+    assert [stage for stage, _ in stages] == ['aggregate', 'filter']
+
+
+def test_route_label_includes_the_router_prefix():
+    from starlette.routing import Route
+
+    from app.api.metrics import UNMATCHED, _route_label
+
+    route = Route('/brands/{brand}', endpoint=lambda request: None)
+    scope = {'path': '/api/products/brands/MSI', 'root_path': '', 'route': route}
+    assert _route_label(scope) == '/api/products/brands/{brand}'
+
+    full = Route('/api/products/brands/{brand}', endpoint=lambda request: None)
+    assert _route_label({**scope, 'route': full}) == '/api/products/brands/{brand}'
+    assert _route_label({'path': '/wp-login.php'}) == UNMATCHED
+
+
+def test_snapshot_stage_times_publishing_not_reads(make_database):
+    database = make_database()
+    with collect_stages() as stages:
+        database.snapshot
+        database.get_sales()
+        database.replace_data(database.products_df, database.sales_df)
+    assert [stage for stage, _ in stages] == ['snapshot']
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.prefix_sums import FIELDS, PrefixSums
+from app.db.rollup import COUNT, RollupCube
+
+
+@pytest.fixture
+def sales(make_database):
+    return make_database().snapshot.sales
+
+
+def _brute_force(sales, start, end):
+    """Sums over sales in [start, end) with the hour-rounding of PrefixSums.totals"""
+    start = pd.Timestamp(start).floor('h')
+    end = pd.Timestamp(end).ceil('h')
+    window = sales[(sales['sale_date'] >= start) & (sales['sale_date'] < end)]
+    totals = {field: window[field].sum() for field in FIELDS if field != COUNT}
+    totals[COUNT] = len(window)
+    return totals
+
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-01-01', '2024-01-06'),
+    ('2024-01-02', '2024-01-04'),
+    ('2024-01-01 11:00', '2024-01-03 15:00'),
+    ('2024-01-01 11:20', '2024-01-03 15:40'),
+    ('2023-12-01', '2024-01-02'),
+    ('2024-01-05', '2024-03-01'),
+    ('2024-02-01', '2024-03-01'),
+])
+def test_totals_match_a_scan_of_the_range(sales, start, end):
+    totals = PrefixSums.from_sales(sales).totals(start, end)
+    expected = _brute_force(sales, start, end)
+    assert totals['quantity'] == expected['quantity']
+    assert totals[COUNT] == expected[COUNT]
+    for field in ('total_amount', 'total_cost', 'total_profit'):
+        assert totals[field] == pytest.approx(expected[field])
+
+
+def test_cube_and_raw_rows_give_the_same_running_totals(sales):
+    from_rows = PrefixSums.from_sales(sales)
+    from_cube = PrefixSums.from_cube(RollupCube.from_sales(sales))
+    assert from_rows.origin == from_cube.origin
+    for field in FIELDS:
+        np.testing.assert_allclose(from_rows.hourly[field], from_cube.hourly[field])
+        np.testing.assert_allclose(from_rows.daily[field], from_cube.daily[field])
+
+
+def test_merge_equals_building_from_all_rows(sales):
+    # Later days, then a backfill before the first day: the calendar grows both ways
+    parts = [sales.iloc[5:12], sales.iloc[12:], sales.iloc[:5]]
+    backfill = sales.iloc[:2].assign(sale_date=pd.to_datetime(['2023-12-28 08:15', '2023-12-30 22:05']))
+    merged = PrefixSums.from_sales(parts[0])
+    for part in parts[1:] + [backfill]:
+        merged = merged.merge(part)
+
+    everything = pd.concat([sales, backfill], ignore_index=True)
+    built = PrefixSums.from_sales(everything)
+    assert merged.origin == built.origin
+    for field in FIELDS:
+        np.testing.assert_allclose(merged.hourly[field], built.hourly[field])
+    assert merged.totals('2023-12-01', '2024-02-01')[COUNT] == len(everything)
+
+
+def test_empty_totals_are_zero():
+    totals = PrefixSums.empty().totals('2024-01-01', '2024-01-02')
+    assert totals == {field: 0 for field in FIELDS}
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from app.api.profiling import requested_token
+from app.utils.profiling import SamplingProfiler, profiling
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def profiled_work():
+    _spin(0.05)
+
+
+def other_request_work():
+    _spin(0.05)
+
+
+def test_event_loop_samples_only_the_profiled_task():
+    profiler = SamplingProfiler(interval=0.001)
+
+    async def profiled():
+        with profiling(profiler):
+            await asyncio.sleep(0.01)
+            profiled_work()
+            await asyncio.sleep(0.1)
+
+    async def other():
+        await asyncio.sleep(0.07)
+        other_request_work()
+
+    async def main():
+        await asyncio.gather(profiled(), other())
+
+    asyncio.run(main())
+    collapsed = profiler.collapsed()
+    assert 'profiled_work' in collapsed
+    assert 'other_request_work' not in collapsed
+
+
+def test_token_is_read_from_the_header_only():
+    scope = {'headers': [(b'x-profile-token', b's3cret')], 'query_string': b''}
+    assert requested_token(scope) == 's3cret'
+    assert requested_token({'headers': [], 'query_string': b'profile=s3cret'}) is None
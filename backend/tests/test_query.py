@@ -0,0 +1,27 @@
+import pytest
+
+from app.db.query import AnalyticsQuery
+
+
+@pytest.mark.parametrize('group_by', [['date'], ['series']])
+def test_date_filter_matches_the_same_sales_as_a_one_day_range(make_database, group_by):
+    snapshot = make_database().snapshot
+    filtered, _ = AnalyticsQuery(group_by, ['count'], filters={'date': ['2024-01-03']}).execute(snapshot)
+    ranged, _ = AnalyticsQuery(group_by, ['count'], start_date='2024-01-03', end_date='2024-01-03').execute(snapshot)
+
+    assert filtered['sales_count'].sum() == 5
+    assert filtered.reset_index(drop=True).equals(ranged.reset_index(drop=True))
+
+
+def test_date_filter_takes_several_days(make_database):
+    snapshot = make_database().snapshot
+    result, _ = AnalyticsQuery([], ['count'], filters={'date': ['2024-01-01', '2024-01-05T00:00:00']}).execute(snapshot)
+    assert result['sales_count'].iloc[0] == 7
+
+
+def test_invalid_date_filter_and_reversed_range_are_rejected(make_database):
+    snapshot = make_database().snapshot
+    with pytest.raises(ValueError, match='date'):
+        AnalyticsQuery(['date'], filters={'date': ['yesterday']}).execute(snapshot)
+    with pytest.raises(ValueError, match='before'):
+        AnalyticsQuery(['date'], start_date='2024-01-05', end_date='2024-01-01')
@@ -0,0 +1,51 @@
+import pytest
+
+from app.models.sale import complete_sale
+
+
+def test_complete_sale_accepts_recorded_sales(sale_record):
+    completed = complete_sale(sale_record)
+    for field, value in sale_record.items():
+        if isinstance(value, float):
+            assert completed[field] == pytest.approx(value, abs=0.01)
+        elif field != 'date':
+            assert completed[field] == value
+
+
+def test_complete_sale_derives_omitted_fields(sale_record):
+    base = {field: sale_record[field] for field in
+            ('sale_date', 'product_name', 'brand', 'series', 'cpu', 'gpu', 'ram',
+             'quantity', 'buying_price', 'unit_price', 'tva_percentage')}
+    base['quantity'] = 3
+    completed = complete_sale(base)
+    assert completed['total_cost'] == pytest.approx(3 * base['buying_price'])
+    assert completed['total_profit'] == pytest.approx(3 * (base['unit_price'] - base['buying_price']))
+    assert completed['total_amount'] == pytest.approx(3 * base['unit_price'] * (1 + base['tva_percentage'] / 100))
+    assert completed['date'] == sale_record['sale_date'][:10]
+    assert completed['day_of_week'] == sale_record['day_of_week']
+    assert completed['hour'] == sale_record['hour']
+
+
+@pytest.mark.parametrize('field, value', [
+    ('total_amount', 1e9), ('total_profit', -5.0), ('unit_profit', 0.0),
+    ('year', 1999), ('hour', 25), ('day_of_week', 'Funday'), ('date', '1999-01-01'),
+])
+def test_complete_sale_rejects_contradictions(sale_record, field, value):
+    with pytest.raises(ValueError, match=field):
+        complete_sale({**sale_record, field: value})
+
+
+@pytest.mark.parametrize('field, value', [
+    ('sale_date', 'yesterday'), ('quantity', 0), ('unit_price', float('nan')), ('buying_price', -1),
+])
+def test_complete_sale_rejects_invalid_base_fields(sale_record, field, value):
+    with pytest.raises(ValueError):
+        complete_sale({**sale_record, field: value})
+
+
+def test_record_sales_rejects_the_whole_batch(make_database, sale_record):
+    database = make_database()
+    with pytest.raises(ValueError):
+        database.record_sales([sale_record, {**sale_record, 'total_amount': 1e9}])
+    assert database.sales_log.size() == 0
+    assert database.record_sales([sale_record]) == 1
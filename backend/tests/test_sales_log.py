@@ -0,0 +1,154 @@
+import json
+import os
+
+import pytest
+
+from app.db.sales_log import EPOCH_KEY, START, SalesLog
+
+
+def record(i):
+    return {'sale_date': '2024-01-01 10:00:00', 'product_name': f'p{i}', 'quantity': 1}
+
+
+def test_read_from_follows_appends(tmp_path):
+    log = SalesLog(str(tmp_path / 'sales.wal'))
+    log.append([record(1)])
+    records, position = log.read_from(START)
+    assert records == [record(1)]
+
+    log.append([record(2), record(3)])
+    records, position = log.read_from(position)
+    assert records == [record(2), record(3)]
+    assert log.read_from(position) == ([], position)
+
+
+def test_compaction_in_another_process_invalidates_offsets(tmp_path):
+    path = str(tmp_path / 'sales.wal')
+    writer, reader = SalesLog(path), SalesLog(path)
+    writer.append([record(1)])
+    _, position = reader.read_from(START)
+
+    with writer.exclusive():
+        assert writer.compact_into(str(tmp_path / 'sales.csv')) == 1
+    # The log grows past the reader's old offset again
+    writer.append([record(2), record(3)])
+
+    assert reader.read_from(position) == (None, START)
+    assert reader.read_from(START)[0] == [record(2), record(3)]
+
+
+def test_compaction_moves_records_to_csv_and_starts_new_epoch(tmp_path):
+    log = SalesLog(str(tmp_path / 'sales.wal'))
+    log.append([record(1), record(2)])
+    epoch = log.position()[0]
+
+    with log.exclusive():
+        assert log.compact_into(str(tmp_path / 'sales.csv')) == 2
+
+    assert (tmp_path / 'sales.csv').read_text().splitlines() == [
+        'sale_date,product_name,quantity', '2024-01-01 10:00:00,p1,1', '2024-01-01 10:00:00,p2,1',
+    ]
+    assert log.read() == [] and log.size() == 0
+    assert log.position()[0] not in (None, epoch)
+
+
+def test_recover_rolls_back_interrupted_compaction(tmp_path):
+    log = SalesLog(str(tmp_path / 'sales.wal'))
+    csv_path = tmp_path / 'sales.csv'
+    csv_path.write_text('sale_date,product_name,quantity\n')
+    log.append([record(1)])
+    # Crash after the checkpoint and a partial CSV append
+    log._write_checkpoint({'csv_size_before': csv_path.stat().st_size, 'csv_size_after': 10_000})
+    with open(csv_path, 'a') as f:
+        f.write('2024-01-01 10:00:00,p1')
+
+    with log.exclusive():
+        log.recover(str(csv_path))
+
+    assert csv_path.read_text() == 'sale_date,product_name,quantity\n'
+    assert log.read() == [record(1)]
+
+
+def test_recover_keeps_sales_logged_after_an_interrupted_compaction(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sales.wal')
+    csv_path = tmp_path / 'sales.csv'
+    compactor, writer = SalesLog(path), SalesLog(path)
+    compactor.append([record(1)])
+
+    # Crash after the CSV append and the log reset, before the checkpoint is removed
+    remove = os.remove
+
+    def crash(target):
+        if target == compactor.checkpoint_path:
+            raise OSError('crashed')
+        remove(target)
+
+    monkeypatch.setattr(os, 'remove', crash)
+    with compactor.exclusive(), pytest.raises(OSError):
+        compactor.compact_into(str(csv_path))
+    monkeypatch.undo()
+    compacted = csv_path.read_text()
+
+    # Other processes keep logging under the new epoch
+    writer.append([record(2), record(3)])
+    with compactor.exclusive():
+        compactor.recover(str(csv_path))
+
+    assert compactor.read() == [record(2), record(3)]
+    assert csv_path.read_text() == compacted
+    assert not os.path.exists(compactor.checkpoint_path)
+
+
+def test_recover_finishes_a_compaction_that_did_not_empty_the_log(tmp_path, monkeypatch):
+    log = SalesLog(str(tmp_path / 'sales.wal'))
+    csv_path = tmp_path / 'sales.csv'
+    log.append([record(1)])
+
+    def crash():
+        raise OSError('crashed')
+
+    monkeypatch.setattr(log, '_reset', crash)
+    with log.exclusive(), pytest.raises(OSError):
+        log.compact_into(str(csv_path))
+    monkeypatch.undo()
+
+    with log.exclusive():
+        log.recover(str(csv_path))
+    assert log.read() == []
+    assert csv_path.read_text().count('p1') == 1
+
+
+def test_recover_drops_torn_last_record(tmp_path):
+    log = SalesLog(str(tmp_path / 'sales.wal'))
+    log.append([record(1)])
+    with open(log.path, 'ab') as f:
+        f.write(b'{"sale_date": "2024-01')
+
+    with log.exclusive():
+        log.recover(str(tmp_path / 'sales.csv'))
+
+    assert log.read() == [record(1)]
+    with open(log.path) as f:
+        assert EPOCH_KEY in json.loads(f.readline())
+
+
+def test_single_compactor(tmp_path):
+    path = str(tmp_path / 'sales.wal')
+    first, second = SalesLog(path), SalesLog(path)
+    assert first.acquire_compactor()
+    assert not second.acquire_compactor()
+    assert first.acquire_compactor()
+
+
+def test_worker_reloads_after_another_worker_compacts(make_database, sale_record):
+    a, b = make_database(), make_database()
+    assert len(b.sales_df) == 20
+
+    a.record_sales([sale_record])
+    assert b.publish_logged_sales() == 1
+    assert a.compact_sales_log() == 1
+    a.record_sales([sale_record, sale_record])
+
+    # b's offset is stale; it reloads from the CSV and the log instead of skipping rows
+    assert b.publish_logged_sales() == -1
+    assert len(b.sales_df) == 23
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from app.db.search_index import ProductSearchIndex
+
+
+def _index():
+    return ProductSearchIndex.from_products(pd.DataFrame({
+        'product_name': ['MSI Katana Corei7-13620H RTX4060', 'Asus TUF Ryzen7 RTX3050', 'Dell G15 i5 RTX4050'],
+        'brand': ['MSI', 'Asus', 'Dell'],
+        'gpu': ['RTX 4060', 'RTX 3050', 'RTX 4050'],
+        'cpu': ['Core i7-13620H', 'Ryzen 7 7735HS', 'Core i5-12500H'],
+    }))
+
+
+def test_short_tokens_match_inside_longer_terms():
+    index = _index()
+    # "i7" is a whole token of row 0's cpu and part of "corei7" in its name
+    assert index.search('i7') == [0]
+    # "50" only appears inside longer tokens
+    assert sorted(index.search('50')) == [1, 2]
+    assert index.search('z') == [1]
+
+
+def test_every_query_token_must_match():
+    index = _index()
+    assert index.search('rtx 4060') == [0]
+    assert index.search('tuf') == [1]
+    # "ell" is a substring of dell only
+    assert index.search('ell') == [2]
+    assert index.search('katana nothing') == []
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.prefix_sums import PrefixSums
+from app.db.rollup import EAGER_VIEWS, RollupCube
+from app.db.shared_store import SharedStore
+from app.db.sketches import SalesSketches
+
+
+@pytest.fixture
+def published(make_database, tmp_path):
+    """Loader snapshot and the same snapshot attached from a shared store"""
+    snapshot = make_database().snapshot
+    store = SharedStore(str(tmp_path / 'shared'))
+    assert store.acquire_loader()
+    generation = store.publish(snapshot)
+    return snapshot, store, generation
+
+
+def test_attach_maps_the_published_tables(published):
+    snapshot, store, generation = published
+    assert store.current() == generation
+    assert store.last_version() == snapshot.version
+
+    attached = store.attach(generation)
+    assert attached.version == snapshot.version
+    assert len(attached.sales) == len(snapshot.sales)
+    assert not attached.sales['quantity'].to_numpy().flags.writeable
+    pd.testing.assert_series_equal(attached.sales['total_amount'], snapshot.sales['total_amount'])
+
+
+def test_attach_reuses_the_stored_sketches(published, monkeypatch):
+    snapshot, store, generation = published
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError("sketches rebuilt on attach")
+
+    monkeypatch.setattr(SalesSketches, 'from_sales', rebuild)
+    attached = store.attach(generation).sales_sketches
+    loader = snapshot.sales_sketches
+    assert attached.quantile('total_amount', [0.5, 0.9]) == loader.quantile('total_amount', [0.5, 0.9])
+    assert attached.distinct_count('product_name') == loader.distinct_count('product_name')
+
+
+def test_attached_snapshot_takes_new_sales(published, sale_record):
+    snapshot, store, generation = published
+    new_sales = pd.DataFrame([sale_record])
+    new_sales['sale_date'] = pd.to_datetime(new_sales['sale_date'])
+    new_sales['date'] = pd.to_datetime(new_sales['date'])
+
+    merged = store.attach(generation).with_sales(new_sales, snapshot.version + 1)
+    expected = snapshot.with_sales(new_sales, snapshot.version + 1)
+    assert len(merged.sales) == len(expected.sales)
+    assert merged.sales_sketches.quantile('total_amount', [0.5]) == expected.sales_sketches.quantile('total_amount', [0.5])
+    assert np.isclose(merged.sales_sketches.distinct_count('product_name'),
+                      expected.sales_sketches.distinct_count('product_name'))
+
+
+def test_old_generations_are_removed(published):
+    snapshot, store, first = published
+    generations = [store.publish(snapshot) for _ in range(3)]
+    assert store.current() == generations[-1]
+    with pytest.raises(OSError):
+        store.attach(first)
+
+
+def test_attach_reuses_the_stored_totals_and_views(published, monkeypatch):
+    snapshot, store, generation = published
+
+    def rebuild(*args, **kwargs):
+        raise AssertionError("derived structure rebuilt on attach")
+
+    monkeypatch.setattr(PrefixSums, 'from_cube', rebuild)
+    monkeypatch.setattr(RollupCube, '_aggregate', rebuild)
+    attached = store.attach(generation)
+
+    for field in snapshot.sales_totals.hourly:
+        np.testing.assert_array_equal(attached.sales_totals.hourly[field], snapshot.sales_totals.hourly[field])
+        np.testing.assert_array_equal(attached.sales_totals.daily[field], snapshot.sales_totals.daily[field])
+    start, end = snapshot.sales['sale_date'].iloc[[2, -3]]
+    assert attached.sales_totals.totals(start, end) == snapshot.sales_totals.totals(start, end)
+    for dims in EAGER_VIEWS:
+        np.testing.assert_allclose(attached.sales_cube.rollup(*dims)['total_amount'],
+                                   snapshot.sales_cube.rollup(*dims)['total_amount'])
+
+
+def test_exports_are_rate_limited(make_database, sale_record):
+    database = make_database(shared=True)
+    store = database.shared_store
+    first = store.current()
+    assert store.last_version() == database.version
+
+    database.record_sales([sale_record])
+    database.publish_logged_sales()
+    assert database.version > store.last_version()
+    assert database.export_shared() is None
+    assert store.current() == first
+
+    assert database.export_shared(interval=0) == store.current() != first
+    assert store.last_version() == database.version
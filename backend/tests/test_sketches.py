@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.sketches import SalesSketches
+
+QS = [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+
+@pytest.fixture(scope='module')
+def sales():
+    rng = np.random.default_rng(7)
+    rows = 20_000
+    return pd.DataFrame({
+        'brand': rng.choice(['MSI', 'Asus', 'Dell'], rows),
+        'date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 60, rows), unit='D'),
+        'total_amount': rng.lognormal(8, 1, rows),
+        # Losses, break-evens and gains
+        'profit_margin': np.round(rng.normal(10, 15, rows), 1),
+        'product_name': [f'product-{n}' for n in rng.integers(0, 6_000, rows)],
+    })
+
+
+def _nearest_rank(values, q):
+    ordered = np.sort(values)
+    return ordered[int(np.floor(q * (len(ordered) - 1)))]
+
+
+@pytest.mark.parametrize('measure', ['total_amount', 'profit_margin'])
+def test_quantiles_are_within_the_relative_accuracy(sales, measure):
+    sketches = SalesSketches.from_sales(sales, accuracy=0.01)
+    result = sketches.quantile(measure, QS)
+    assert result['count'] == len(sales)
+    for q in QS:
+        expected = _nearest_rank(sales[measure].to_numpy(), q)
+        assert abs(result['quantiles'][q] - expected) <= 0.01 * abs(expected) + 1e-9, q
+
+
+def test_windows_only_count_the_selected_brands_and_dates(sales):
+    sketches = SalesSketches.from_sales(sales)
+    start, end = pd.Timestamp('2024-01-10'), pd.Timestamp('2024-01-20')
+    window = sales[sales['brand'].isin(['MSI', 'Dell']) & sales['date'].between(start, end)]
+
+    result = sketches.quantile('total_amount', [0.5], start, end, brands=['MSI', 'Dell', 'Unknown'])
+    assert result['count'] == len(window)
+    expected = _nearest_rank(window['total_amount'].to_numpy(), 0.5)
+    assert abs(result['quantiles'][0.5] - expected) <= sketches.accuracy * expected
+
+    assert sketches.quantile('total_amount', [0.5], brands=['Unknown']) == {'count': 0, 'quantiles': {0.5: None}}
+
+
+def test_distinct_counts_are_within_the_standard_error(sales):
+    sketches = SalesSketches.from_sales(sales)
+    for brands in (None, ['Asus']):
+        selected = sales if brands is None else sales[sales['brand'].isin(brands)]
+        exact = selected['product_name'].nunique()
+        estimate = sketches.distinct_count('product_name', brands=brands)
+        # Four standard errors, so the bound holds for practically any seed
+        assert abs(estimate - exact) <= 4 * sketches.distinct_error * exact
+
+    few = sales[sales['date'] == sales['date'].min()].head(50)
+    small = SalesSketches.from_sales(few).distinct_count('product_name')
+    assert abs(small - few['product_name'].nunique()) <= 1
+
+
+def test_merging_batches_equals_one_build(sales):
+    merged = SalesSketches.from_sales(sales.iloc[:7_000])
+    for start in (7_000, 15_000):
+        merged = merged.merge(sales.iloc[start:start + 8_000])
+    built = SalesSketches.from_sales(sales)
+
+    assert merged.quantile('profit_margin', QS) == built.quantile('profit_margin', QS)
+    assert merged.distinct_count('product_name') == built.distinct_count('product_name')
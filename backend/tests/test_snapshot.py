@@ -0,0 +1,42 @@
+import pandas as pd
+
+from app.db.snapshot import Snapshot, append_rows
+
+
+def _sales(dates, brands):
+    return pd.DataFrame({
+        'sale_date': pd.to_datetime(dates),
+        'brand': pd.Categorical(brands),
+        'quantity': range(len(dates)),
+    })
+
+
+def test_append_rows_keeps_codes_and_sorted_categories():
+    old = _sales(['2024-01-01', '2024-01-02'], ['Dell', 'MSI'])
+    same = append_rows(old, _sales(['2024-01-03'], ['Dell']))
+    assert list(same['brand'].cat.categories) == ['Dell', 'MSI']
+    assert list(same['brand']) == ['Dell', 'MSI', 'Dell']
+
+    grown = append_rows(old, _sales(['2024-01-03', '2024-01-04'], ['Asus', None]))
+    assert list(grown['brand'].cat.categories) == ['Asus', 'Dell', 'MSI']
+    assert list(grown['brand'].astype(object).fillna('-')) == ['Dell', 'MSI', 'Asus', '-']
+
+
+def test_with_sales_appends_in_order_and_sorts_backfill(make_database, sale_record):
+    snapshot = make_database().snapshot
+    last = snapshot.sales['sale_date'].iloc[-1]
+
+    def new_sales(sale_date):
+        df = pd.DataFrame([sale_record])
+        df['sale_date'] = pd.Timestamp(sale_date)
+        df['date'] = df['sale_date'].dt.normalize()
+        return df
+
+    later = snapshot.with_sales(new_sales(last + pd.Timedelta(hours=1)), snapshot.version + 1)
+    assert later.sales['sale_date'].iloc[-1] == last + pd.Timedelta(hours=1)
+    assert later.sales_index.between(start=last + pd.Timedelta(minutes=1)) == slice(len(snapshot.sales), len(later.sales))
+
+    earlier = later.with_sales(new_sales('2000-01-01'), later.version + 1)
+    assert earlier.sales['sale_date'].is_monotonic_increasing
+    assert earlier.sales['sale_date'].iloc[0] == pd.Timestamp('2000-01-01')
+    assert len(earlier.sales_index) == len(snapshot.sales) + 2
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.db.time_index import TimeIndex
+
+STAMPS = pd.to_datetime([
+    '2024-01-01 10:00', '2024-01-01 10:00', '2024-01-01 10:00', '2024-01-01 11:30',
+    '2024-01-02 09:00', '2024-01-02 09:00', '2024-01-03 18:45',
+]).to_numpy()
+
+
+def _pages(index: TimeIndex, limit: int):
+    """Positions page by page, newest first, the way get_sales_page walks them"""
+    pages, top = [], len(index)
+    while top > 0:
+        bottom = max(0, top - limit)
+        pages.append(list(range(top - 1, bottom - 1, -1)))
+        if bottom == 0:
+            break
+        top = index.position_of(index.cursor_at(bottom))
+    return pages
+
+
+def test_cursors_visit_every_row_once_across_equal_timestamps():
+    index = TimeIndex(STAMPS)
+    for limit in range(1, len(STAMPS) + 1):
+        visited = [position for page in _pages(index, limit) for position in page]
+        assert visited == list(range(len(STAMPS) - 1, -1, -1))
+
+
+def test_cursors_survive_appends():
+    old = TimeIndex(STAMPS)
+    cursors = [old.cursor_at(position) for position in range(len(STAMPS))]
+    grown = TimeIndex(np.concatenate([STAMPS, pd.to_datetime(['2024-01-03 18:45', '2024-01-04 08:00']).to_numpy()]))
+    assert [grown.position_of(cursor) for cursor in cursors] == list(range(len(STAMPS)))
+
+
+def test_invalid_cursor_is_a_value_error():
+    with pytest.raises(ValueError):
+        TimeIndex(STAMPS).position_of('not-a-cursor!')
+
+
+def test_between_resolves_ranges_by_binary_search():
+    index = TimeIndex(STAMPS)
+    assert index.between('2024-01-01 10:00', '2024-01-02 09:00') == slice(0, 6)
+    assert index.between('2024-01-01 10:00', '2024-01-02 09:00', end_inclusive=False) == slice(0, 4)
+    assert index.between(start='2024-01-03') == slice(6, 7)
+    assert index.between('2024-02-01', '2024-01-01') == slice(7, 7)
+    assert index.last(2) == slice(5, 7)
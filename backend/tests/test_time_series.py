@@ -0,0 +1,33 @@
+import pandas as pd
+
+from app.db.query import TimeSeriesQuery
+
+METRICS = ['sum:total_amount', 'sum:quantity', 'count', 'margin', 'mean:total_amount']
+
+
+def test_gaps_have_zero_sums_and_null_ratios(make_database):
+    snapshot = make_database().snapshot
+    result, _ = TimeSeriesQuery('hour', METRICS, start_date='2024-01-01', end_date='2024-01-01').execute(snapshot)
+
+    assert len(result) == 24
+    assert result['quantity'].dtype == 'int64'
+    assert result['sales_count'].dtype == 'int64'
+    gaps = result[result['sales_count'] == 0]
+    assert (gaps['total_amount'] == 0).all() and (gaps['quantity'] == 0).all()
+    assert gaps['margin'].isna().all() and gaps['avg_total_amount'].isna().all()
+
+    sales = snapshot.sales[snapshot.sales['sale_date'] < pd.Timestamp('2024-01-02')]
+    sold = result[result['sales_count'] > 0]
+    assert sold['sales_count'].sum() == len(sales)
+    assert sold['margin'].notna().all()
+
+
+def test_days_sum_to_the_sales_in_range(make_database):
+    snapshot = make_database().snapshot
+    result, plan = TimeSeriesQuery('day', METRICS, start_date='2023-12-30', end_date='2024-01-08').execute(snapshot)
+
+    assert plan['source'] == 'rollup'
+    assert list(result['period'])[:3] == ['2023-12-30', '2023-12-31', '2024-01-01']
+    assert result['sales_count'].sum() == len(snapshot.sales)
+    assert abs(result['total_amount'].sum() - snapshot.sales['total_amount'].sum()) < 1e-6
+    assert result.loc[result['period'] == '2023-12-31', 'margin'].isna().all()